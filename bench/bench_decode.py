@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# bench_decode.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Checks that the NumPy decode table (obd_decode) gives bit-identical
+# values to the scalar decoders in obd_sensors for every numeric PID,
+# then compares decoding speed.  Exits with status 1 on any difference.
+#
+#   python3 bench/bench_decode.py [samples]
+#
+############################################################################
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy
+
+from pyobd_beardedone55 import obd_sensors
+from pyobd_beardedone55 import obd_decode
+
+PIDS = [0x05, 0x0C, 0x10, 0x24, 0x32]
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    result = obd_decode.check()
+    failed = {pid: n for pid, n in result.items() if n != 0}
+    print('%d PIDs checked, %d differ' % (len(result), len(failed)))
+    for pid, n in sorted(failed.items()):
+        print('  $%02X  %s: %d payloads' % (pid, obd_sensors.SENSORS[pid].name.strip(), n))
+
+    rng = numpy.random.default_rng(0)
+    for pid in PIDS:
+        sensor = obd_sensors.SENSORS[pid]
+        size = obd_decode.DECODERS[pid].size
+        payload = rng.integers(0, 256, (samples, size), dtype = numpy.uint8)
+        hexdata = [row.tobytes().hex().upper() for row in payload[:samples // 10]]
+
+        start = time.perf_counter()
+        for code in hexdata:
+            sensor.value(code)
+        scalar = (time.perf_counter() - start) / len(hexdata)
+
+        start = time.perf_counter()
+        obd_decode.decode(pid, payload)
+        vector = (time.perf_counter() - start) / samples
+
+        print('$%02X %-28s scalar %7.3f us/sample  vector %7.4f us/sample  %6.0fx' %
+              (pid, sensor.name.strip(), scalar * 1e6, vector * 1e6, scalar / vector))
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
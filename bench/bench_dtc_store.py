@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# bench_dtc_store.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Times lookups in obd2_codes.DTCStore.  The built-in P/U codes are
+# padded with generated C, B, U and manufacturer specific codes to show
+# how the store behaves with tens of thousands of codes.
+#
+#   python3 bench/bench_dtc_store.py [extra codes]
+#
+############################################################################
+
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyobd_beardedone55.obd2_codes import DTCStore, pcodes
+
+WORDS = ['sensor', 'circuit', 'range', 'performance', 'low', 'high', 'module',
+         'valve', 'solenoid', 'pressure', 'switch', 'lamp', 'motor', 'control',
+         'communication', 'intermittent', 'brake', 'airbag', 'door', 'seat']
+
+def main():
+    extra = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    rand = random.Random(1)
+    codes = {}
+    while len(codes) < extra:
+        code = '%s%X%03X' % (rand.choice('CBUP'), rand.randrange(4), rand.randrange(0x1000))
+        codes[code] = ' '.join(rand.choice(WORDS) for i in range(5)).title()
+
+    store = DTCStore(pcodes)
+    store.add(codes)
+    t = timeit.timeit(store.build, number=1)
+    print('%d codes, index built in %.1f ms' % (len(store), t * 1000))
+
+    cases = [
+        ('describe known', lambda: store.describe('P0300')),
+        ('describe unknown', lambda: store.describe('B3FFF')),
+        ('prefix P03', lambda: store.prefix_range('P03')),
+        ('search "misfire"', lambda: store.search('misfire', 50)),
+        ('search "brake sol"', lambda: store.search('brake sol', 50)),
+        ('search code "C12"', lambda: store.search('C12', 50)),
+    ]
+    for name, fn in cases:
+        n = 2000
+        t = timeit.timeit(fn, number=n) / n
+        print('%-20s %8.2f us' % (name, t * 1e6))
+
+if __name__ == "__main__":
+    main()
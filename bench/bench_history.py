@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# bench_history.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Measures the cost of adding get_sensors() results to obd_history and
+# of reading windows back, with the buffers full (after wrap around).
+#
+#   python3 bench/bench_history.py [samples per PID]
+#
+############################################################################
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyobd_beardedone55 import obd_history
+
+PIDS = [0x04, 0x05, 0x0C, 0x0D, 0x0F, 0x11]
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 3 * obd_history.HISTORY_CAPACITY
+    history = obd_history.History()
+    results = {pid: ('', '%d' % pid, '') for pid in PIDS}
+
+    start = time.perf_counter()
+    for i in range(samples):
+        history.add_results('7E8', results, i * 0.05)
+    elapsed = time.perf_counter() - start
+    print('add_results   %7.3f us/sample  (%d samples, %.1f MB for %d PIDs)' %
+          (elapsed / (samples * len(PIDS)) * 1e6, samples * len(PIDS),
+           history.memory() / (1 << 20), len(PIDS)))
+
+    end = (samples - 1) * 0.05
+    for seconds in (10, 600, 3600):
+        runs = 1000
+        start = time.perf_counter()
+        for i in range(runs):
+            times, values = history.window('7E8', 0x0C, end - seconds, end)
+        elapsed = time.perf_counter() - start
+        print('window %5d s %7.3f us  (%d samples)' % (seconds, elapsed / runs * 1e6, len(times)))
+
+    try:
+        import numpy
+    except ImportError:
+        return
+    series = history.buffer('7E8', 0x0C)
+    runs = 1000
+    start = time.perf_counter()
+    for i in range(runs):
+        times, values = series.arrays()
+    elapsed = time.perf_counter() - start
+    print('arrays (all)  %7.3f us  (%d samples, shares storage: %s)' %
+          (elapsed / runs * 1e6, len(times), numpy.shares_memory(values, numpy.frombuffer(series.values))))
+
+if __name__ == "__main__":
+    main()
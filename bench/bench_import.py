@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# bench_import.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Measures import time of the pyOBD modules and the cost of the first
+# DTC description lookup.  Each measurement runs in a fresh interpreter.
+#
+#   python3 bench/bench_import.py [runs]
+#
+############################################################################
+
+import os
+import sys
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('import obd_io', 'import pyobd_beardedone55.obd_io'),
+    ('import obd_cli', 'import pyobd_beardedone55.obd_cli'),
+    ('import obd2_codes', 'import pyobd_beardedone55.obd2_codes'),
+    ('first DTC lookup', None),
+]
+
+TIMER = '''
+import time
+t = time.perf_counter()
+%s
+print(time.perf_counter() - t)
+'''
+
+LOOKUP = '''
+import time
+from pyobd_beardedone55.obd2_codes import pcodes
+t = time.perf_counter()
+pcodes.get('P0300')
+print(time.perf_counter() - t)
+'''
+
+def run(code):
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+    return float(out)
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for name, statement in CASES:
+        code = LOOKUP if statement is None else TIMER % statement
+        times = [run(code) for i in range(runs)]
+        print('%-20s median %7.2f ms   min %7.2f ms' %
+              (name, statistics.median(times) * 1000, min(times) * 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# bench_replay.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Runs the OBDPort stack (connect, supported PIDs, tests, VIN, DTCs and
+# sensor polling) against recorded serial transcripts, and reports
+# decoded results and CPU time per sensor sample.
+#
+#   python3 bench/bench_replay.py --record /dev/ttyUSB0 -o car.ptr
+#   python3 bench/bench_replay.py [--strict] [--speed N]
+#                                 [--save FILE | --check FILE] TRANSCRIPT...
+#
+# --record runs the same sequence on a real interface and records it, so
+# replaying that transcript with --strict checks every command sent.
+# --save writes the decoded results as a baseline, --check compares
+# against one and exits with status 1 on any difference.
+#
+############################################################################
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyobd_beardedone55 import obd_io
+from pyobd_beardedone55.obd_cli import ConsoleNotify, supported_pids
+from pyobd_beardedone55.obd_transcript import ReplaySerial
+
+def run_sequence(port, cycles, more = lambda: True):
+    """Returns (results, samples, cpu seconds spent polling)."""
+    results = {'ecus': list(port.ecu_addresses), 'supported': {}, 'tests': {}, 'vin': {}}
+    pids = {}
+    for ecu in port.ecu_addresses:
+        results['supported'][ecu] = port.get_supported(ecu)
+        pids[ecu] = supported_pids(port, ecu)
+    for ecu in port.ecu_addresses:
+        results['tests'][ecu] = port.get_tests(ecu)
+        results['vin'][ecu] = port.get_vin(ecu)
+    results['dtc'] = port.get_dtc()
+
+    digest = hashlib.sha1()
+    samples = 0
+    cycle = 0
+    start = time.process_time()
+    while cycle < cycles and more():
+        for ecu in port.ecu_addresses:
+            for pid, (name, value, unit) in sorted(port.get_sensors(pids[ecu], ecu).items()):
+                digest.update(('%s %02X %s\n' % (ecu, pid, value)).encode())
+                samples += 1
+        cycle += 1
+    cpu = time.process_time() - start
+    results['samples'] = samples
+    results['samples_sha1'] = digest.hexdigest()
+    return results, samples, cpu
+
+def replay(filename, args, notify):
+    transport = ReplaySerial(filename, speed = args.speed, strict = args.strict)
+    port = obd_io.OBDPort(filename, 0, notify, 1, 0, transport = transport)
+    if port.State == 0:
+        return None, transport, 0, 0.0
+    #The recording ends with the ATZ sent by close()
+    results, samples, cpu = run_sequence(port, args.cycles,
+                                         lambda: transport.next < len(transport.exchanges) - 1)
+    port.close()
+    return results, transport, samples, cpu
+
+def record(args, notify):
+    port = obd_io.OBDPort(args.record, args.baud, notify, args.timeout, 0, transcript = args.output)
+    if port.State == 0:
+        print('Unable to connect to %s' % args.record, file=sys.stderr)
+        sys.exit(1)
+    results, samples, cpu = run_sequence(port, args.cycles)
+    port.close()
+    print('%s: %d samples recorded' % (args.output, samples))
+
+def compare(name, results, baseline):
+    """Returns list of differences from baseline."""
+    if name not in baseline:
+        return ['not in baseline']
+    expected = baseline[name]
+    return ['%s differs' % key for key in sorted(set(results) | set(expected))
+            if results.get(key) != expected.get(key)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay serial transcripts through OBDPort.')
+    parser.add_argument('transcripts', nargs='*', help='transcript files to replay')
+    parser.add_argument('--strict', action='store_true', help='require commands to match the recording')
+    parser.add_argument('--speed', type=float, help='replay at N times recorded speed (default: as fast as possible)')
+    parser.add_argument('--cycles', type=int, default=1000, help='maximum sensor polling cycles')
+    parser.add_argument('--save', help='write decoded results to baseline file')
+    parser.add_argument('--check', help='compare decoded results with baseline file')
+    parser.add_argument('--record', metavar='PORT', help='record a transcript from a serial port')
+    parser.add_argument('-o', '--output', default='replay.ptr', help='transcript file for --record')
+    parser.add_argument('-b', '--baud', default='38400', help='baud rate for --record')
+    parser.add_argument('-t', '--timeout', type=int, default=5, help='serial timeout for --record')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, format='%(levelname)s:\t%(message)s')
+    notify = ConsoleNotify(logging.getLogger('PyOBD'))
+
+    if args.record is not None:
+        record(args, notify)
+        return
+
+    baseline = {}
+    if args.check is not None:
+        with open(args.check) as f:
+            baseline = json.load(f)
+
+    saved = {}
+    failed = 0
+    total_samples = 0
+    total_cpu = 0.0
+    wall = time.perf_counter()
+    for filename in args.transcripts:
+        name = os.path.basename(filename)
+        try:
+            results, transport, samples, cpu = replay(filename, args, notify)
+        except Exception as e:
+            print('%-30s ERROR %s: %s' % (name, type(e).__name__, e))
+            failed += 1
+            continue
+        status = []
+        if results is None:
+            status.append('connect failed')
+        else:
+            saved[name] = results
+            if args.check is not None:
+                status += compare(name, results, baseline)
+        if args.strict and not transport.finished():
+            status.append('%d command mismatches' % len(transport.mismatches))
+        if status:
+            failed += 1
+        total_samples += samples
+        total_cpu += cpu
+        print('%-30s %6d samples %8.1f us/sample %5d lookups  %s' %
+              (name, samples, cpu / samples * 1e6 if samples else 0.0,
+               transport.lookups, ', '.join(status) or 'ok'))
+
+    print('%d transcripts, %d failed, %d samples, %.1f us CPU/sample, %.2f s' %
+          (len(args.transcripts), failed, total_samples,
+           total_cpu / total_samples * 1e6 if total_samples else 0.0,
+           time.perf_counter() - wall))
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(saved, f, indent=1, sort_keys=True)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
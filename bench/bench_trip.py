@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# bench_trip.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Writes a synthetic trip in each codec and measures file size, open
+# time, and the time to load a whole column and a 10 s range with
+# TripReader and MappedTripReader (NumPy).
+#
+#   python3 bench/bench_trip.py [samples per PID] [directory]
+#
+# TripWriter.add() runs on the sensor producer thread, so writing must
+# stay close to the cost of appending the samples to arrays.  The exit
+# status is 1 if writing uncompressed takes more than WRITE_LIMIT times
+# as long as the same loop appending to arrays.
+#
+############################################################################
+
+import os
+import sys
+import time
+import tempfile
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pyobd_beardedone55 import obd_trip
+
+PIDS = [0x04, 0x05, 0x0C, 0x0D, 0x0F, 0x11]
+WRITE_LIMIT = 5.0
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+def write_trip(filename, codec, samples):
+    writer = obd_trip.TripWriter(filename, codec)
+    for i in range(samples):
+        t = writer.start + i * 0.01
+        for pid in PIDS:
+            writer.add('7E8', pid, float((i * pid) % 4000), t)
+    writer.close()
+
+def append_samples(samples):
+    """The write_trip() loop appending to arrays, for comparison."""
+    times = {pid: array('d') for pid in PIDS}
+    values = {pid: array('d') for pid in PIDS}
+    def add(ecu, pid, value, t):
+        times[pid].append(t)
+        values[pid].append(value)
+    start = time.monotonic()
+    for i in range(samples):
+        t = start + i * 0.01
+        for pid in PIDS:
+            add('7E8', pid, float((i * pid) % 4000), t)
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp()
+    files = []
+    for codec in ('none', 'zlib', 'lzma'):
+        filename = os.path.join(directory, 'bench_%s.trip' % codec)
+        ms, result = timed(lambda: write_trip(filename, codec, samples))
+        files.append((codec, filename))
+        print('%-14s write %8.1f ms  %10d bytes' % (codec, ms, os.path.getsize(filename)))
+        if codec == 'none':
+            write_ms = ms
+    append_ms, result = timed(lambda: append_samples(samples))
+    print('%-14s       %8.1f ms  (write none is %.1f times this, limit %.1f)' %
+          ('arrays', append_ms, write_ms / append_ms, WRITE_LIMIT))
+    unpacked = os.path.join(directory, 'bench_unpacked.trip')
+    obd_trip.unpack_trip(files[1][1], unpacked)
+    files.append(('unpacked', unpacked))
+
+    middle = samples * 0.01 / 2
+    readers = [('TripReader', obd_trip.TripReader, 'read')]
+    try:
+        import numpy
+    except ImportError:
+        pass
+    else:
+        readers.append(('MappedTripReader', obd_trip.MappedTripReader, 'arrays'))
+    for name, cls, method in readers:
+        print(name)
+        for codec, filename in files:
+            open_ms, reader = timed(lambda: cls(filename))
+            full_ms, result = timed(lambda: getattr(reader, method)('7E8', 0x0C))
+            range_ms, result = timed(lambda: getattr(reader, method)('7E8', 0x0C, middle, middle + 10))
+            print('  %-12s open %7.3f ms  column %8.3f ms  10 s range %7.3f ms' %
+                  (codec, open_ms, full_ms, range_ms))
+    if write_ms > WRITE_LIMIT * append_ms:
+        print('writing is too slow', file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# vim: shiftwidth=4:tabstop=4:expandtab
+############################################################################
+#
+# obd2_tests.py
+#
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)
+# Copyright 2009 Secons Ltd. (www.obdtester.com)
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+#Mode $01 PID $01 (monitor status) test descriptions.  Kept apart from
+#the DTC descriptions in obd2_codes, which are much larger.
+ptest= [
+    "DTCs:",
+    "MIL:",
+    #A
+    "Misfire:",
+    "Fuel system:",
+    "Components:",
+    #B,D
+    "Catalyst:",
+    "Heated Catalyst:",
+    "Evaporative system:",
+    "Secondary Air System:",
+    "A/C Refrigerant:" ,
+    "Oxygen Sensor:",
+    "Oxygen Sensor Heater:",
+    "EGR SystemC7:" ,
+]
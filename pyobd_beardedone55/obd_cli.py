@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_cli.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Console front end for pyOBD.  This module must not import PyQt5, so
+# that it can run on machines without a display.  Modules only some
+# commands need are imported by those commands, to keep start-up fast.
+#
+############################################################################
+
+import os
+import sys
+import time
+import argparse
+import logging
+import configparser
+
+from . import obd_io
+from . import obd_sensors
+from .obd_transcript import ReplaySerial
+
+class ConsoleNotify:
+    """Stands in for the GUI application as OBDPort's notify window."""
+    def __init__(self, logger):
+        self.logger = logger
+
+def config_path():
+    if "OS" in os.environ.keys(): #running under windows
+        return "pyobd.ini"
+    return os.environ.get('HOME', '') + '/.pyobdrc'
+
+def read_config():
+    """Returns connection defaults from the GUI's configuration file."""
+    config = configparser.RawConfigParser()
+    config.read(config_path())
+    return {
+        'port': config.get('pyOBD', 'COMPORT', fallback='/dev/ttyACM0'),
+        'baud': config.get('pyOBD', 'BAUDRATE', fallback='9600'),
+        'timeout': config.getint('pyOBD', 'SERTIMEOUT', fallback=5),
+        'attempts': config.getint('pyOBD', 'RECONNATTEMPTS', fallback=5),
+        'transcript': config.get('pyOBD', 'TRANSCRIPT', fallback='') or None,
+    }
+
+def parse_pids(text):
+    """Parses comma separated list of hex PIDs, e.g. '0C,0D,05'."""
+    pids = []
+    for item in text.split(','):
+        item = item.strip().upper()
+        if item.startswith('$'):
+            item = item[1:]
+        if item.startswith('01') and len(item) == 4:
+            item = item[2:]
+        pid = int(item, 16)
+        if pid < 0 or pid >= len(obd_sensors.SENSORS):
+            raise argparse.ArgumentTypeError('unknown PID: %s' % item)
+        pids.append(pid)
+    return pids
+
+def parse_trigger(text):
+    from . import obd_trigger
+    try:
+        return obd_trigger.parse_trigger(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def connect(args):
+    logger = logging.getLogger('PyOBD')
+    transport = None
+    if args.replay is not None:
+        try:
+            transport = ReplaySerial(args.replay, speed = args.replay_speed or None)
+        except (OSError, ValueError) as e:
+            print('Unable to replay %s: %s' % (args.replay, e), file=sys.stderr)
+            sys.exit(1)
+    port = obd_io.OBDPort(args.port, args.baud, ConsoleNotify(logger), args.timeout, args.attempts,
+                          transcript = args.transcript, transport = transport)
+    if port.State == 0:
+        print('Unable to connect to %s' % (args.replay or args.port), file=sys.stderr)
+        sys.exit(1)
+    return port
+
+def select_ecus(port, args):
+    if args.ecu is None:
+        return port.ecu_addresses
+    ecus = [ecu.upper() for ecu in args.ecu.split(',')]
+    for ecu in ecus:
+        if ecu not in port.ecu_addresses:
+            print('ECU %s did not respond' % ecu, file=sys.stderr)
+            sys.exit(1)
+    return ecus
+
+def supported_pids(port, ecu):
+    supp = port.get_supported(ecu)
+    #PID $01 is decoded by the 'tests' command, and the supported PID
+    #bitmaps are not interesting to print.
+    return [i for i, supported in enumerate(supp[1:], 2)
+            if supported == '1' and i not in obd_sensors.SUPPORTED_PIDS]
+
+def select_pids(port, ecu, args):
+    if args.pids is not None:
+        return args.pids
+    return supported_pids(port, ecu)
+
+def cmd_connect(port, args):
+    print('Interface:  %s' % port.ELMver)
+    print('Protocol:   %s' % port.protocol)
+    for ecu in port.ecu_addresses:
+        print('ECU%d:       %s' % (port.getEcuNum(ecu), ecu))
+
+def cmd_discover(port, args):
+    for ecu in select_ecus(port, args):
+        print('ECU%d (%s):' % (port.getEcuNum(ecu), ecu))
+        for pid in supported_pids(port, ecu):
+            sensor = obd_sensors.SENSORS[pid]
+            print('  $%02X  %s' % (pid, sensor.name.strip()))
+
+def cmd_tests(port, args):
+    for ecu in select_ecus(port, args):
+        print('ECU%d (%s):' % (port.getEcuNum(ecu), ecu))
+        res = port.get_tests(ecu)
+        if not isinstance(res, dict):
+            print('  %s' % res)
+            continue
+        for test, result in res.items():
+            print('  %-24s %s' % (test, result))
+
+def cmd_live(port, args):
+    from .obd_stats import Stats
+    sensors = {ecu: select_pids(port, ecu, args) for ecu in select_ecus(port, args)}
+    stats = Stats()
+    count = 0
+    start = time.monotonic()
+    try:
+        while args.count is None or count < args.count:
+            for ecu, pids in sensors.items():
+                results = port.get_sensors(pids, ecu)
+                stats.add_results(ecu, results)
+                t = time.monotonic() - start
+                for pid, (name, value, unit) in sorted(results.items()):
+                    print('%9.3f %s $%02X %s: %s %s' % (t, ecu, pid, name.strip(), value, unit))
+            sys.stdout.flush()
+            count += 1
+            if args.interval > 0:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    if args.stats:
+        print_stats(stats)
+
+def cmd_log(port, args):
+    from .obd_datalog import DataLogger
+    sensors = {ecu: select_pids(port, ecu, args) for ecu in select_ecus(port, args)}
+    logger = DataLogger(port, sensors, args.output, flush_interval = args.flush)
+    print('Logging to %s, press Ctrl-C to stop' % args.output, file=sys.stderr)
+    try:
+        logger.run(args.duration)
+    except KeyboardInterrupt:
+        logger.close()
+    print('%d samples, %.1f samples/s' % (logger.samples, logger.rate()), file=sys.stderr)
+    if args.stats:
+        print_stats(logger.stats)
+    if args.maps is not None:
+        save_maps(logger.maps, args.maps)
+
+def cmd_capture(port, args):
+    from . import obd_trigger
+    from .obd_history import History
+    sensors = {ecu: select_pids(port, ecu, args) for ecu in select_ecus(port, args)}
+    ecus = [ecu for ecu in sensors if len(sensors[ecu]) > 0]
+    if len(ecus) == 0:
+        print('No PIDs to poll', file=sys.stderr)
+        sys.exit(1)
+    history = History()
+    pre = obd_trigger.TRIGGER_PRE if args.pre is None else args.pre
+    post = obd_trigger.TRIGGER_POST if args.post is None else args.post
+    triggers = obd_trigger.Triggers(history, args.trigger, args.output, pre, post,
+                                    args.capture_pids or ())
+    print('Waiting for %s, press Ctrl-C to stop' % ', '.join(str(t) for t in triggers.triggers),
+          file=sys.stderr)
+    start = time.monotonic()
+    n = 0
+    try:
+        while args.duration is None or time.monotonic() - start < args.duration:
+            request = triggers.request(ecus, time.monotonic())
+            if args.count is not None and triggers.captured >= args.count:
+                break
+            if request is None:
+                ecu = ecus[n % len(ecus)]
+                request = ecu, sensors[ecu]
+                n += 1
+            ecu, pids = request
+            results = port.get_sensors(pids, ecu)
+            now = time.monotonic()
+            history.add_results(ecu, results, now)
+            triggers.check(ecu, results, now)
+    except KeyboardInterrupt:
+        pass
+    triggers.close(wait = True)
+    for filename in triggers.written:
+        print(filename)
+
+def cmd_dtc(port, args):
+    from .obd2_codes import dtc_store  #Only load descriptions when needed
+    codes = port.get_dtc()
+    if codes is None:
+        print('Connection lost', file=sys.stderr)
+        sys.exit(1)
+    for ecu, ecuCodes in codes.items():
+        print('DTCs from ECU%d (%s):' % (port.getEcuNum(ecu), ecu))
+        if len(ecuCodes) == 0:
+            print('  No DTC codes (codes cleared)')
+        for status, code in ecuCodes:
+            print('  %s  %-7s %s' % (code, status, dtc_store.describe(code)))
+
+def cmd_clear(port, args):
+    if not args.yes:
+        answer = input('Clear all DTC codes and freeze frame data? [y/N] ')
+        if answer.strip().lower() not in ('y', 'yes'):
+            return
+    print(port.clear_dtc())
+
+def cmd_vin(port, args):
+    for ecu in select_ecus(port, args):
+        vin = port.get_vin(ecu)
+        if vin != '':
+            print('%s: %s' % (ecu, vin))
+
+def format_stats(ecu, pid, name, unit, stats):
+    """Returns one line describing a RunningStats.summary().  Trip file
+    footers may have no percentiles."""
+    p = stats.get('percentiles', {})
+    return '%s $%02X %-28s %7d  min %9.6g  max %9.6g  mean %9.6g  sd %9.6g  %s  %s' % \
+        (ecu, pid, name, stats['count'], stats['min'], stats['max'], stats['mean'], stats['stddev'],
+         ' '.join('p%d %.6g' % (n, p[n]) for n in sorted(p)), unit)
+
+def print_stats(stats):
+    """Prints an obd_stats.Stats to stderr, one line per PID."""
+    for ecu, pid in sorted(stats.keys()):
+        sensor = obd_sensors.SENSORS[pid]
+        print(format_stats(ecu, pid, sensor.name.strip(), sensor.unit.strip(),
+                           stats.get(ecu, pid).summary()), file=sys.stderr)
+
+def format_summary(summary):
+    """Returns lines of text describing one trip summary."""
+    name = os.path.basename(summary['file'])
+    if 'error' in summary:
+        return ['%s: %s' % (name, summary['error'])]
+    start = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(summary['start']))
+    lines = ['%s (%s) %s, %.1f s, %d samples' %
+             (name, summary['type'], start, summary['duration'], summary['samples'])]
+    for ecu, vin in sorted(summary['vin'].items()):
+        if vin != '':
+            lines.append('  VIN %s: %s' % (ecu, vin))
+    for ecu, codes in sorted(summary['dtc'].items()):
+        lines.append('  DTC %s: %s' % (ecu, ', '.join('%s (%s)' % (code, status)
+                                                    for status, code in codes) or 'none'))
+    if summary['errors'] > 0:
+        lines.append('  %d responses could not be decoded' % summary['errors'])
+    for s in summary['pids']:
+        if s['count'] > 0:
+            lines.append('  ' + format_stats(s['ecu'], s['pid'], s['name'], s['unit'], s))
+    return lines
+
+SHADES = ' .:-=+*#%@'
+
+def format_map(histogram):
+    """Returns lines of text drawing a Histogram2D, highest y first,
+    each cell shaded by its share of the busiest cell."""
+    xpid, xmin, xmax, xcells = histogram.x
+    ypid, ymin, ymax, ycells = histogram.y
+    counts = histogram.counts
+    busiest = max(counts) or 1
+    names = []
+    for pid in (xpid, ypid):
+        sensor = obd_sensors.SENSORS[pid]
+        unit = sensor.unit.strip()
+        names.append('$%02X %s%s' % (pid, sensor.name.strip(), ' (%s)' % unit if unit else ''))
+    lines = ['%s %s: %.1f s, x %s, y %s' %
+             (histogram.ecu, histogram.name, histogram.total() / 1000.0, names[0], names[1])]
+    edges = histogram.edges(histogram.y)
+    for j in reversed(range(ycells)):
+        row = counts[j * xcells:(j + 1) * xcells]
+        lines.append('%8.6g |%s|' % (edges[j], ''.join(
+            SHADES[-1 if ms == busiest else (len(SHADES) - 1) * ms // busiest] if ms else ' ' for ms in row)))
+    lines.append('%8s  %-*.6g%.6g' % ('', xcells - 1, xmin, xmax))
+    return lines
+
+def save_maps(maps, filename):
+    """Saves OperatingMaps as JSON, or as CSV if filename ends in .csv."""
+    try:
+        if filename.lower().endswith('.csv'):
+            maps.write_csv(filename)
+        else:
+            maps.save(filename)
+    except OSError as e:
+        print('Error writing %s: %s' % (filename, e), file=sys.stderr)
+        sys.exit(1)
+
+def cmd_maps(port, args):
+    from .obd_histogram import OperatingMaps
+    from .obd_summary import file_type, TRIP
+    maps = OperatingMaps()
+    for filename in args.files:
+        try:
+            if filename.lower().endswith('.json'):
+                maps.merge(OperatingMaps.load(filename))
+            elif file_type(filename) == TRIP:
+                maps.add_trip(filename)
+            else:
+                raise ValueError('operating maps are built from trip files')
+        except (OSError, ValueError, KeyError) as e:
+            print('%s: %s' % (filename, e), file=sys.stderr)
+            sys.exit(1)
+    for key in sorted(maps.keys()):
+        print('\n'.join(format_map(maps.get(*key))))
+    if args.output is not None:
+        save_maps(maps, args.output)
+
+def cmd_summary(port, args):
+    import json
+    from . import obd_summary   #Loads obd_io's parsers and concurrent.futures
+    files = 0
+    samples = 0
+    failed = 0
+    start = time.monotonic()
+    for summary in obd_summary.summarize_files(args.files, args.jobs):
+        files += 1
+        if 'error' in summary:
+            failed += 1
+        else:
+            samples += summary['samples']
+        if args.json:
+            print(json.dumps(summary, sort_keys=True))
+        else:
+            print('\n'.join(format_summary(summary)))
+        sys.stdout.flush()
+    elapsed = time.monotonic() - start
+    print('%d files, %d failed, %d samples in %.2f s (%.0f samples/s)' %
+          (files, failed, samples, elapsed, samples / elapsed if elapsed > 0 else 0.0), file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+def build_parser():
+    defaults = read_config()
+    parser = argparse.ArgumentParser(prog='pyobd-cli',
+                description='Command line OBD-II diagnostic tool for ELM32x interfaces.')
+    parser.add_argument('-p', '--port', default=defaults['port'], help='serial port (default %(default)s)')
+    parser.add_argument('-b', '--baud', default=defaults['baud'], help='baud rate (default %(default)s)')
+    parser.add_argument('-t', '--timeout', type=int, default=defaults['timeout'], help='serial timeout in seconds')
+    parser.add_argument('-r', '--attempts', type=int, default=defaults['attempts'], help='reconnect attempts')
+    parser.add_argument('-e', '--ecu', help='comma separated ECU addresses (default: all)')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='more log output (repeat for debug)')
+    parser.add_argument('--transcript', default=defaults['transcript'],
+                        help='record raw serial traffic to this file')
+    parser.add_argument('--replay', metavar='TRANSCRIPT',
+                        help='answer commands from a recorded transcript instead of the serial port')
+    parser.add_argument('--replay-speed', type=float, default=0.0, metavar='N',
+                        help='replay at N times recorded speed (default: as fast as possible)')
+    parser.add_argument('--log-file', help='also write log output to this file')
+    parser.add_argument('--log-rotate', default='never', metavar='MODE',
+                        help='log file rotation: never, size, hourly or daily (default %(default)s)')
+    parser.add_argument('--log-size', type=int, default=10, help='log file size in MB for size rotation')
+    parser.add_argument('--log-backups', type=int, default=5, help='rotated log files to keep')
+    parser.add_argument('--log-compress', action='store_true', help='gzip rotated log files')
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    sub = commands.add_parser('connect', help='connect and show interface, protocol and ECUs')
+    sub.set_defaults(func=cmd_connect)
+
+    sub = commands.add_parser('discover', help='list supported PIDs of each ECU')
+    sub.set_defaults(func=cmd_discover)
+
+    sub = commands.add_parser('tests', help='show readiness test results')
+    sub.set_defaults(func=cmd_tests)
+
+    sub = commands.add_parser('live', help='print live sensor values')
+    sub.add_argument('pids', nargs='?', type=parse_pids, help='comma separated hex PIDs (default: all supported)')
+    sub.add_argument('-n', '--count', type=int, help='number of polling cycles (default: until Ctrl-C)')
+    sub.add_argument('-i', '--interval', type=float, default=0.0, help='seconds between polling cycles')
+    sub.add_argument('-s', '--stats', action='store_true', help='print statistics of each PID when done')
+    sub.set_defaults(func=cmd_live)
+
+    sub = commands.add_parser('log', help='record live sensor values to a CSV or .trip file')
+    sub.add_argument('pids', nargs='?', type=parse_pids, help='comma separated hex PIDs (default: all supported)')
+    sub.add_argument('-o', '--output', required=True, help='output file (a .trip name selects the trip format)')
+    sub.add_argument('-d', '--duration', type=float, help='seconds to log (default: until Ctrl-C)')
+    sub.add_argument('-f', '--flush', type=float, default=1.0, help='seconds between flushes to disk')
+    sub.add_argument('-s', '--stats', action='store_true', help='print statistics of each PID when done')
+    sub.add_argument('-m', '--maps', help='save operating maps to this file when done (.json, or .csv)')
+    sub.set_defaults(func=cmd_log)
+
+    sub = commands.add_parser('capture', help='record the seconds around trigger events to .trip files')
+    sub.add_argument('pids', nargs='?', type=parse_pids, help='comma separated hex PIDs (default: all supported)')
+    sub.add_argument('-T', '--trigger', action='append', type=parse_trigger, required=True,
+                     help='trigger, e.g. 0C>4000, 7E8:05<70, rate:0D<-5 or dtc (may be repeated)')
+    sub.add_argument('--pre', type=float,
+                     help='seconds kept from before a trigger (default 10)')
+    sub.add_argument('--post', type=float,
+                     help='seconds captured at full rate after it (default 10)')
+    sub.add_argument('--capture-pids', type=parse_pids,
+                     help='comma separated hex PIDs to capture (default: the PID of the trigger)')
+    sub.add_argument('-o', '--output', default='.', help='directory for capture files (default: current)')
+    sub.add_argument('-n', '--count', type=int, help='stop after this many captures')
+    sub.add_argument('-d', '--duration', type=float, help='seconds to watch (default: until Ctrl-C)')
+    sub.set_defaults(func=cmd_capture)
+
+    sub = commands.add_parser('dtc', help='read stored and pending trouble codes')
+    sub.set_defaults(func=cmd_dtc)
+
+    sub = commands.add_parser('clear', help='clear trouble codes and freeze frame data')
+    sub.add_argument('-y', '--yes', action='store_true', help='do not ask for confirmation')
+    sub.set_defaults(func=cmd_clear)
+
+    sub = commands.add_parser('vin', help='read vehicle identification number')
+    sub.set_defaults(func=cmd_vin)
+
+    sub = commands.add_parser('summary', help='summarize trip and transcript files (no interface needed)')
+    sub.add_argument('files', nargs='+', help='.trip files and serial transcripts')
+    sub.add_argument('-j', '--jobs', type=int, help='worker processes (default: one per CPU)')
+    sub.add_argument('--json', action='store_true', help='print one JSON object per file')
+    sub.set_defaults(func=cmd_summary, offline=True)
+
+    sub = commands.add_parser('maps', help='draw and merge operating maps (no interface needed)')
+    sub.add_argument('files', nargs='+', help='.trip files and saved maps (.json)')
+    sub.add_argument('-o', '--output', help='save merged maps to this file (.json, or .csv)')
+    sub.set_defaults(func=cmd_maps, offline=True)
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    levels = [logging.WARNING, logging.INFO, logging.DEBUG]
+    logging.basicConfig(level=levels[min(args.verbose, 2)], format='%(levelname)s:\t%(message)s')
+
+    fileLog = None
+    if args.log_file is not None:
+        from . import obd_logging
+        if args.log_rotate not in obd_logging.ROTATE_MODES:
+            parser.error('--log-rotate must be one of %s' % ', '.join(obd_logging.ROTATE_MODES))
+        try:
+            fileLog = obd_logging.FileLog(args.log_file, args.log_rotate, args.log_size << 20,
+                                          args.log_backups, args.log_compress)
+        except OSError as e:
+            print('Error opening log file: %s' % e, file=sys.stderr)
+            sys.exit(1)
+        fileLog.start(logging.getLogger('PyOBD'))
+
+    try:
+        if getattr(args, 'offline', False):
+            args.func(None, args)
+        else:
+            port = connect(args)
+            try:
+                args.func(port, args)
+            finally:
+                port.close()
+    finally:
+        if fileLog is not None:
+            fileLog.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_datalog.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import csv
+import time
+from datetime import datetime, timezone
+
+from .obd_trip import TripWriter, TRIP_EXTENSION
+from .obd_stats import Stats
+from .obd_histogram import OperatingMaps
+
+LOG_BUFFER_SIZE = 1 << 16   #bytes buffered before the OS sees a write
+LOG_FLUSH_INTERVAL = 1.0    #seconds between forced flushes
+
+class DataLogger:
+    """ DataLogger records live sensor data from one or more ECUs to a
+    CSV file without any GUI.  Each row holds the time in seconds since
+    logging started (monotonic clock), the ECU, the PID, and the decoded
+    value.  The wall-clock time at which logging started is written to
+    the file header so rows can be placed in absolute time.
+
+    If filename ends in '.trip', numeric values are recorded to a
+    columnar trip file instead (see obd_trip), together with the VIN
+    and trouble codes read when logging starts.
+
+    Running statistics of each PID are kept in stats, and operating
+    maps (see obd_histogram) in maps, either way."""
+
+    COLUMNS = ['time', 'ecu', 'pid', 'sensor', 'value', 'unit']
+
+    def __init__(self, port, sensors, filename, flush_interval = LOG_FLUSH_INTERVAL,
+                 buffer_size = LOG_BUFFER_SIZE):
+        """sensors is a dictionary of ECU address -> list of PIDs to record."""
+        self.port = port
+        self.sensors = {ecu: list(pids) for ecu, pids in sensors.items() if len(pids) > 0}
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.file = None
+        self.writer = None
+        self.trip = None
+        self.running = False
+        self.start_monotonic = None
+        self.start_wall = None
+        self.samples = 0
+        self.requests = 0
+        self.stats = Stats()
+        self.maps = OperatingMaps()
+
+    def open(self):
+        if self.filename.endswith(TRIP_EXTENSION):
+            self.trip = TripWriter(self.filename)
+            self.trip.add_vehicle_info(self.port, list(self.sensors))
+            self.trip.quantiles = self.stats    #percentiles for the footer
+            self.start_wall = self.trip.wall_start
+            self.start_monotonic = self.trip.start
+            return
+        self.file = open(self.filename, 'w', buffering = self.buffer_size, newline = '')
+        self.writer = csv.writer(self.file)
+        self.start_wall = time.time()
+        self.start_monotonic = time.monotonic()
+        self.last_flush = self.start_monotonic
+        start = datetime.fromtimestamp(self.start_wall, timezone.utc)
+        self.file.write('# pyOBD data log\n')
+        self.file.write('# wall_clock_start: %s (unix %.6f)\n' % (start.isoformat(), self.start_wall))
+        self.file.write('# monotonic_start: %.6f\n' % self.start_monotonic)
+        self.writer.writerow(self.COLUMNS)
+
+    def close(self):
+        if self.trip is not None:
+            self.trip.close()
+            self.trip = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
+
+    def poll_once(self):
+        """Request every logged PID once from every ECU and write the
+        results.  Returns the number of samples recorded."""
+        count = 0
+        for ecu, pids in self.sensors.items():
+            results = self.port.get_sensors(pids, ecu)
+            now = time.monotonic()
+            self.requests += 1
+            self.maps.add_results(ecu, results, now)
+            self.stats.add_results(ecu, results)
+            if self.trip is not None:
+                count += self.trip.add_results(ecu, results, now)
+                continue
+            t = '%.6f' % (now - self.start_monotonic)
+            rows = []
+            for pid, (name, value, unit) in results.items():
+                if value == 'NODATA' or value == 'NORESPONSE':
+                    continue
+                rows.append((t, ecu, '%02X' % pid, name.strip(), value, unit))
+            self.writer.writerows(rows)
+            count += len(rows)
+
+        self.samples += count
+        now = time.monotonic()
+        if self.file is not None and now - self.last_flush >= self.flush_interval:
+            self.file.flush()
+            self.last_flush = now
+        return count
+
+    def run(self, duration = None):
+        """Log until stop() is called, or for duration seconds."""
+        if self.file is None and self.trip is None:
+            self.open()
+        self.running = True
+        end = None if duration is None else time.monotonic() + duration
+        try:
+            while self.running and len(self.sensors) > 0:
+                self.poll_once()
+                if end is not None and time.monotonic() >= end:
+                    break
+        finally:
+            self.running = False
+            self.close()
+
+    def stop(self):
+        self.running = False
+
+    def rate(self):
+        """Returns average samples per second since logging started."""
+        elapsed = time.monotonic() - self.start_monotonic
+        return self.samples / elapsed if elapsed > 0 else 0.0
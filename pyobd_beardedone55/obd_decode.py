@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_decode.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Batch decoding of mode $01 payloads with NumPy.  The table is built
+# from the Scaling decoders in obd_sensors, so every numeric PID uses the
+# same arithmetic as the scalar decoder.  This module requires NumPy.
+#
+############################################################################
+
+import numpy
+
+from . import obd_sensors
+from .obd_sensors import Scaling, hex_to_int
+
+class VectorDecoder:
+    """Decodes a 2-D uint8 array of payloads (one row per sample, data
+    bytes after the PID) to a float64 array.  Rows hold the sensor's
+    length bytes, of which value() takes the integer formed by the
+    first used, as the scalar decoder does with the hex data string."""
+    def __init__(self, sensor, used, value):
+        self.sensor = sensor
+        self.used = used
+        self.value = value
+
+    @property
+    def size(self):
+        #Not copied: obd_io widens some fuel trims after the table is built
+        return self.sensor.length
+
+    def raw(self, payload):
+        payload = numpy.asarray(payload, dtype = numpy.uint8)
+        if payload.ndim != 2 or payload.shape[1] != self.size:
+            raise ValueError('expected 2-D array with %d bytes per row' % self.size)
+        n = payload[:, 0].astype(numpy.int64)
+        for i in range(1, self.used):
+            n = (n << 8) | payload[:, i]
+        return n
+
+    def __call__(self, payload):
+        return numpy.asarray(self.value(self.raw(payload)), dtype = numpy.float64)
+
+def _identity(code):
+    return code
+
+def build_table(sensors = obd_sensors.SENSORS):
+    """Returns dictionary of PID -> VectorDecoder for every numeric PID."""
+    table = {}
+    for pid, sensor in enumerate(sensors):
+        if isinstance(sensor.value, Scaling):
+            table[pid] = VectorDecoder(sensor, sensor.value.size, sensor.value.value)
+        elif sensor.value is hex_to_int:
+            table[pid] = VectorDecoder(sensor, sensor.length, _identity)
+    return table
+
+DECODERS = build_table()
+
+def decode(pid, payload):
+    """Decodes payloads of one PID; see VectorDecoder."""
+    return DECODERS[pid](payload)
+
+def payload_array(hexdata, size):
+    """Converts a sequence of hex data strings (as passed to the scalar
+    decoders) to a 2-D uint8 array with size bytes per row."""
+    out = numpy.zeros((len(hexdata), size), dtype = numpy.uint8)
+    for i, code in enumerate(hexdata):
+        row = bytes.fromhex(code[:size * 2])
+        out[i, :len(row)] = numpy.frombuffer(row, dtype = numpy.uint8)
+    return out
+
+def scalar_values(pid, payload, sensors = obd_sensors.SENSORS):
+    """Decodes payloads one at a time with the scalar decoder, from the
+    hex data string as obd_io passes it, for comparison with decode()."""
+    decoder = sensors[pid].value
+    number = decoder.number if isinstance(decoder, Scaling) else decoder
+    out = numpy.empty(len(payload), dtype = numpy.float64)
+    for i, row in enumerate(payload):
+        out[i] = number(bytes(row).hex().upper())
+    return out
+
+def test_payloads(size, count = 20000, seed = 1):
+    """Every possible payload for sizes up to 2 bytes, otherwise count
+    random payloads plus the extremes."""
+    if size <= 2:
+        n = numpy.arange(1 << (8 * size), dtype = numpy.uint32)
+        return n.astype('>u4').view(numpy.uint8).reshape(-1, 4)[:, 4 - size:]
+    rng = numpy.random.default_rng(seed)
+    payload = rng.integers(0, 256, (count, size), dtype = numpy.uint8)
+    payload[0] = 0
+    payload[1] = 255
+    return payload
+
+def check(pids = None, sensors = obd_sensors.SENSORS):
+    """Compares decode() with the scalar decoders bit for bit, on payloads
+    of each sensor's length.  Returns dictionary of PID -> number of
+    payloads that differ."""
+    result = {}
+    for pid in (sorted(DECODERS) if pids is None else pids):
+        payload = test_payloads(sensors[pid].length)
+        vector = decode(pid, payload)
+        scalar = scalar_values(pid, payload, sensors)
+        result[pid] = int(numpy.count_nonzero(vector.view(numpy.uint64) != scalar.view(numpy.uint64)))
+    return result
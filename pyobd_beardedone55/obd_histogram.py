@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_histogram.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Operating maps: 2-D histograms of the time an engine spends at each
+# combination of two sensor values, e.g. RPM against calculated load.
+# Each map is a fixed grid of cells holding milliseconds (array 'Q'),
+# so memory does not grow however long the maps are fed, and maps of
+# several trips or vehicles are merged by adding the cells.
+#
+# Time is credited to the cell of the last known pair of values, for
+# the time until the next value of either arrives, so PIDs polled at
+# different rates are weighted correctly.  Gaps longer than MAP_GAP
+# seconds (e.g. a lost connection) are not credited.  Values outside a
+# map's range are counted in its edge cells.
+#
+# Maps are saved as JSON (MAP_EXTENSION) and exported as CSV with one
+# row per cell that holds any time.
+#
+############################################################################
+
+import csv
+import json
+import heapq
+import threading
+from array import array
+
+from . import obd_trip
+
+MAP_EXTENSION = '.json'
+MAP_GAP = 2.0       #seconds without new values that are not credited
+
+#name -> (x PID, x min, x max, x cells, y PID, y min, y max, y cells)
+MAPS = {
+    'rpm_load':       (0x0C, 0.0, 8000.0, 32, 0x04, 0.0, 100.0, 20),
+    'speed_throttle': (0x0D, 0.0, 160.0, 32, 0x11, 0.0, 100.0, 20),
+}
+
+class Histogram2D:
+    """ Histogram2D holds the milliseconds spent in each cell of an x by y
+    grid.  Cell (i, j) is counts[j * xcells + i]."""
+
+    def __init__(self, name, ecu, xpid, xmin, xmax, xcells, ypid, ymin, ymax, ycells):
+        self.name = name
+        self.ecu = ecu
+        self.x = (xpid, xmin, xmax, xcells)
+        self.y = (ypid, ymin, ymax, ycells)
+        self.counts = array('Q', bytes(8 * xcells * ycells))
+
+    @staticmethod
+    def cell(value, axis):
+        pid, low, high, cells = axis
+        i = int((value - low) * cells / (high - low))
+        return 0 if i < 0 else cells - 1 if i >= cells else i
+
+    def add(self, x, y, ms):
+        """Credits ms milliseconds to the cell of (x, y)."""
+        self.counts[self.cell(y, self.y) * self.x[3] + self.cell(x, self.x)] += ms
+
+    def total(self):
+        """Returns milliseconds in all cells."""
+        return sum(self.counts)
+
+    def merge(self, other):
+        """Adds the cells of other, which must have the same grid."""
+        if other.x != self.x or other.y != self.y:
+            raise ValueError('%s: maps have different cells' % self.name)
+        counts = self.counts
+        for i, ms in enumerate(other.counts):
+            if ms:
+                counts[i] += ms
+
+    def edges(self, axis):
+        """Returns list of cell boundaries of self.x or self.y."""
+        pid, low, high, cells = axis
+        return [low + (high - low) * i / cells for i in range(cells + 1)]
+
+    def to_dict(self):
+        return {'name': self.name, 'ecu': self.ecu, 'x': list(self.x), 'y': list(self.y),
+                'ms': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, d):
+        histogram = cls(d['name'], d['ecu'], *d['x'], *d['y'])
+        if len(d['ms']) != len(histogram.counts):
+            raise ValueError('%s: wrong number of cells' % d['name'])
+        histogram.counts = array('Q', d['ms'])
+        return histogram
+
+class OperatingMaps:
+    """ OperatingMaps keeps a Histogram2D per ECU and map in maps (see
+    MAPS), created when both values of a map first arrive from an ECU.
+    add_results() takes get_sensors() results, so the sensor producer
+    can feed it directly."""
+
+    def __init__(self, maps = MAPS, gap = MAP_GAP):
+        self.definitions = dict(maps)
+        self.gap = gap
+        self.maps = {}      #(ecu, name) -> Histogram2D
+        self.state = {}     #(ecu, name) -> [x, y, time of last value]
+        self.lock = threading.Lock()    #Guards creation of maps
+        self.pids = set()
+        for xpid, xmin, xmax, xcells, ypid, ymin, ymax, ycells in self.definitions.values():
+            self.pids.update((xpid, ypid))
+
+    def keys(self):
+        """Returns list of (ecu, name) with maps."""
+        with self.lock:
+            return list(self.maps)
+
+    def get(self, ecu, name):
+        return self.maps.get((ecu, name))
+
+    def update(self, ecu, values, t):
+        """Takes values (PID -> number) from ecu received at time t
+        (seconds)."""
+        for name, definition in self.definitions.items():
+            x = values.get(definition[0])
+            y = values.get(definition[4])
+            if x is None and y is None:
+                continue
+            key = (ecu, name)
+            state = self.state.get(key)
+            if state is None:
+                state = self.state[key] = [None, None, t]
+            elif state[0] is not None and state[1] is not None and 0 < t - state[2] <= self.gap:
+                histogram = self.maps.get(key)
+                if histogram is None:
+                    with self.lock:
+                        histogram = self.maps[key] = Histogram2D(name, ecu, *definition)
+                histogram.add(state[0], state[1], int(round((t - state[2]) * 1000)))
+            if x is not None:
+                state[0] = x
+            if y is not None:
+                state[1] = y
+            state[2] = t
+
+    def add_results(self, ecu, results, t):
+        """Takes a get_sensors() result received at time t
+        (time.monotonic())."""
+        values = {}
+        for pid, (name, value, unit) in results.items():
+            if pid in self.pids:
+                value = obd_trip.to_number(value)
+                if value is not None:
+                    values[pid] = value
+        if len(values) > 0:
+            self.update(ecu, values, t)
+
+    def add_trip(self, filename):
+        """Feeds the samples of the map PIDs in trip file filename, in
+        time order, one ECU at a time."""
+        reader = obd_trip.TripReader(filename)
+        ecus = sorted(set(ecu for ecu, pid in reader.pids()))
+        for ecu in ecus:
+            columns = []
+            for pid in sorted(self.pids):
+                if (ecu, pid) in reader.columnOf:
+                    times, values = reader.read(ecu, pid)
+                    columns.append(zip(times, [pid] * len(times), values))
+            #Values polled together share a timestamp; feed them together
+            t = None
+            values = {}
+            for sample in heapq.merge(*columns):
+                if sample[0] != t and len(values) > 0:
+                    self.update(ecu, values, t)
+                    values = {}
+                t = sample[0]
+                values[sample[1]] = sample[2]
+            if len(values) > 0:
+                self.update(ecu, values, t)
+            #Trips are separate; do not credit time across them
+            for key in list(self.state):
+                if key[0] == ecu:
+                    del self.state[key]
+
+    def merge(self, other):
+        """Adds the maps of other to these maps."""
+        for key, histogram in other.maps.items():
+            mine = self.maps.get(key)
+            if mine is None:
+                mine = Histogram2D(histogram.name, histogram.ecu, *histogram.x, *histogram.y)
+                with self.lock:
+                    self.maps[key] = mine
+            mine.merge(histogram)
+
+    def clear(self):
+        with self.lock:
+            self.maps = {}
+            self.state = {}
+
+    def to_dict(self):
+        return {'maps': [self.maps[key].to_dict() for key in sorted(self.keys())]}
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, filename):
+        """Returns OperatingMaps read from a file written by save()."""
+        with open(filename) as f:
+            d = json.load(f)
+        maps = cls()
+        for m in d['maps']:
+            histogram = Histogram2D.from_dict(m)
+            maps.maps[(histogram.ecu, histogram.name)] = histogram
+        return maps
+
+    def write_csv(self, filename):
+        """Writes one row per cell holding any time."""
+        with open(filename, 'w', newline = '') as f:
+            writer = csv.writer(f)
+            writer.writerow(['map', 'ecu', 'x_pid', 'x_low', 'x_high', 'y_pid', 'y_low', 'y_high', 'seconds'])
+            for key in sorted(self.keys()):
+                histogram = self.maps[key]
+                xedges = histogram.edges(histogram.x)
+                yedges = histogram.edges(histogram.y)
+                xcells = histogram.x[3]
+                for n, ms in enumerate(histogram.counts):
+                    if ms:
+                        i = n % xcells
+                        j = n // xcells
+                        writer.writerow([histogram.name, histogram.ecu,
+                                         '%02X' % histogram.x[0], xedges[i], xedges[i + 1],
+                                         '%02X' % histogram.y[0], yedges[j], yedges[j + 1],
+                                         '%.3f' % (ms / 1000.0)])
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_history.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# In-memory history of live sensor values.  Each ECU and PID has a ring
+# buffer of the most recent samples (time.monotonic() timestamp and
+# value, both f64), so memory stays fixed however long pyOBD runs.
+#
+# Every sample is written twice, at i and i + size, so the newest
+# samples are always one contiguous slice of the storage.  window()
+# returns memoryviews of that slice without copying, and arrays()
+# wraps them as NumPy arrays, also without copying.
+#
+# Decimator reduces a series to the min and max of each time bucket
+# (e.g. one bucket per pixel column of a plot) and keeps the buckets up
+# to date incrementally, so redrawing a plot costs the same for a
+# minute or an hour of samples.
+#
+# The views are of live storage: a slot is overwritten once SLACK more
+# samples than the capacity have been appended after it.  Readers in
+# another thread (e.g. the GUI reading what the sensor producer
+# appends) should use a view promptly, or copy it.
+#
+############################################################################
+
+import math
+import threading
+import collections
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .obd_trip import to_number
+
+numpy = None    #Imported by arrays() on first use; it is slow to load
+
+HISTORY_CAPACITY = 72000    #samples per PID: an hour at 20 samples/s
+SLACK = 1024                #samples appended before a view is overwritten
+
+class RingBuffer:
+    """ RingBuffer holds the last capacity (time, value) samples of one
+    series.  Times must not decrease."""
+
+    __slots__ = ('capacity', 'size', 'times', 'values', 'head', 'count', 'total')
+
+    def __init__(self, capacity = HISTORY_CAPACITY):
+        self.capacity = capacity
+        self.size = capacity + SLACK
+        self.times = array('d', bytes(16 * self.size))
+        self.values = array('d', bytes(16 * self.size))
+        self.head = 0       #next slot written, 0 <= head < size
+        self.count = 0      #samples held, up to size
+        self.total = 0      #samples ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, t, value):
+        i = self.head
+        j = i + self.size
+        self.times[i] = self.times[j] = t
+        self.values[i] = self.values[j] = value
+        self.head = i + 1 if i + 1 < self.size else 0
+        if self.count < self.size:
+            self.count += 1
+        self.total += 1
+
+    def last(self):
+        """Returns newest (time, value), or None if empty."""
+        if self.count == 0:
+            return None
+        i = self.head + self.size - 1
+        return self.times[i], self.values[i]
+
+    def window(self, start = None, end = None):
+        """Returns (times, values) memoryviews of the samples with
+        start <= time <= end (None is open ended), oldest first."""
+        hi = self.head + self.size
+        lo = hi - len(self)
+        times = memoryview(self.times)[lo:hi]
+        first = 0 if start is None else bisect_left(times, start)
+        last = len(times) if end is None else bisect_right(times, end)
+        return times[first:last], memoryview(self.values)[lo + first:lo + last]
+
+    def arrays(self, start = None, end = None):
+        """As window(), but returns NumPy arrays (views, not copies)."""
+        global numpy
+        if numpy is None:
+            import numpy
+        times, values = self.window(start, end)
+        return numpy.frombuffer(times, numpy.float64), numpy.frombuffer(values, numpy.float64)
+
+    def clear(self):
+        self.head = self.count = 0
+
+class History:
+    """ History keeps a RingBuffer per (ECU, PID), created when the first
+    sample arrives.  add_results() takes get_sensors() results, so the
+    sensor producer can feed it directly."""
+
+    def __init__(self, capacity = HISTORY_CAPACITY):
+        self.capacity = capacity
+        self.series = {}
+        self.lock = threading.Lock()    #Guards creation of series
+
+    def buffer(self, ecu, pid):
+        """Returns RingBuffer of ecu and pid, or None if no samples yet."""
+        return self.series.get((ecu, pid))
+
+    def keys(self):
+        """Returns list of (ecu, pid) with history."""
+        with self.lock:
+            return list(self.series)
+
+    def add(self, ecu, pid, value, t):
+        series = self.series.get((ecu, pid))
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault((ecu, pid), RingBuffer(self.capacity))
+        series.append(t, value)
+
+    def add_results(self, ecu, results, t):
+        """Adds the numeric values of a get_sensors() result, all with
+        time t (time.monotonic()).  Returns the number of values added."""
+        count = 0
+        for pid, (name, value, unit) in results.items():
+            value = to_number(value)
+            if value is not None:
+                self.add(ecu, pid, value, t)
+                count += 1
+        return count
+
+    def window(self, ecu, pid, start = None, end = None):
+        """Returns (times, values) memoryviews, see RingBuffer.window()."""
+        series = self.series.get((ecu, pid))
+        if series is None:
+            return memoryview(array('d')), memoryview(array('d'))
+        return series.window(start, end)
+
+    def memory(self):
+        """Returns bytes of sample storage allocated."""
+        return sum(16 * 2 * s.size for s in self.series.values())
+
+class Decimator:
+    """ Decimator keeps the min, max, first and last value of a RingBuffer
+    in buckets of width seconds, as lists [bucket, min, max, first, last]
+    where bucket is the time divided by width, rounded down.  Buckets are
+    aligned to multiples of width, so update() only needs to fold in the
+    samples newer than those seen by the last call."""
+
+    def __init__(self, series, width):
+        self.series = series
+        self.width = width
+        self.buckets = collections.deque()
+        self.last = None    #time of the newest sample folded in
+
+    def update(self, start):
+        """Folds in new samples and drops buckets that end before start
+        (seconds).  Returns the buckets."""
+        buckets = self.buckets
+        #Found by time, as the sensor producer may append meanwhile
+        if self.last is None:
+            times, values = self.series.window(start)
+        else:
+            times, values = self.series.window(self.last)
+            i = bisect_right(times, self.last)
+            times = times[i:]
+            values = values[i:]
+        if len(times) > 0:
+            self.last = times[-1]
+
+        width = self.width
+        for t, v in zip(times, values):
+            i = math.floor(t / width)
+            if len(buckets) > 0 and buckets[-1][0] == i:
+                bucket = buckets[-1]
+                if v < bucket[1]:
+                    bucket[1] = v
+                elif v > bucket[2]:
+                    bucket[2] = v
+                bucket[4] = v
+            else:
+                buckets.append([i, v, v, v, v])
+
+        first = math.floor(start / width)
+        while len(buckets) > 0 and buckets[0][0] < first:
+            buckets.popleft()
+        return buckets
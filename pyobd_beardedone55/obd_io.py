@@ -41,12 +41,12 @@
 #   May 11, 2019
 #   May 23, 2019
 #   May 26, 2019
+#   October 19, 2026
 #
 # For a complete history, see https://github.com/beardedone55/pyobd
 ############################################################################
 
 import serial
-import string
 import time
 from math import ceil
 import logging
@@ -54,18 +54,168 @@ import logging
 from . import obd_sensors
 
 from .obd_sensors import hex_to_int
-from .obd2_codes import ptest
+from .obd2_tests import ptest
+from .obd_transcript import TranscriptWriter, TranscriptSerial
 
 GET_DTC_COMMAND   = "03"
 CLEAR_DTC_COMMAND = "04"
 GET_PENDING_DTC_COMMAND = "07"
 GET_DTC_RESPONSE = "43"
 GET_PENDING_DTC_RESPONSE = "47"
+VEHICLE_INFO_MODE = "09"
+VEHICLE_INFO_MODE_RESPONSE = "49"
+VIN_PID = "02"
+VIN_SUPPORTED_INDEX = 1
+GET_VIN_CMD = VEHICLE_INFO_MODE + VIN_PID
+
+def data_bytes(lines, prot_is_CAN):
+    """Returns dictionary of ECU address -> list of data bytes (hex
+    strings) from the response lines to one request, joining the frames
+    of multiframe CAN responses."""
+    retVal = {}
+    byteCount = {}
+
+    for line in lines:
+        if line[:7] == 'NO DATA': #No ECU responded
+            continue
+        line = line.split(' ') #Turn data into list of bytes
+        if not prot_is_CAN:
+            line = line[2:]
+        ecu = line[0]
+        if ecu not in retVal:
+            retVal[ecu] = []
+        if prot_is_CAN:
+            if line[1][0] == '0':  #PCI Byte indicates single line response
+                byteCount[ecu] = int(line[1][1]) #Second half of PCI byte is data length
+                line = line[2:]  #Remove ecu address and byte count
+                retVal[ecu] += line[0:byteCount[ecu]] #Get the data
+
+            elif line[1][0] == '1':   #PCI Byte indicates 1st frame of multiframe response
+                byteCount[ecu] = hex_to_int(line[1][1] + line[2]) #PCI Byte extended 1 byte for byte count
+                retVal[ecu] += ['00'] * (byteCount[ecu]-len(retVal[ecu])) #Fill out data with zeroes
+                retVal[ecu] = retVal[ecu][0:byteCount[ecu]]               #Truncate list to byte count
+                line = line[3:]                                           #Remove ECU Address and Byte Count
+                i = 0
+                for byte in line:
+                    retVal[ecu][i] = byte
+                    i += 1
+            elif line[1][0] == '2':            #PCI Byte indicates Next frame of multiframe response
+                i = hex_to_int(line[1][1])  #Indicates frame # of multiframe response
+                i = i*7 - 1
+                line = line[2:]
+                if ecu not in byteCount:
+                    retVal[ecu] += ['00'] * (i+7 - len(retVal[ecu])) #Next Frame came before 1st frame.
+                        #Fill through this frame with zeroes.
+                for data in line:
+                    if i < len(retVal[ecu]):
+                        retVal[ecu][i] = data
+                    else:
+                        break
+                    i += 1
+
+        else:
+            retVal[ecu] += line[1:]
+
+    return retVal
+
+def parse_dtc_data(res, DTCCodes, DTCType, prot_is_CAN, logger, dtcNumber=None):
+    """Adds the [DTCType, code] pairs in a mode $03 or $07 response (as
+    returned by data_bytes) to dictionary DTCCodes of ECU -> list."""
+    dtcLetters = ["P", "C", "B", "U"]
+    for ecu in res:
+        i=0
+        dataList = res[ecu]
+        if ecu not in DTCCodes:
+            DTCCodes[ecu] = []
+
+        while i < len(dataList):
+            #check Mode Response byte (Should be GET_DTC_RESPONSE(0x43))
+            if (prot_is_CAN and i == 0) or (not prot_is_CAN and (i % 7) == 0):
+                if dataList[i] != GET_DTC_RESPONSE and dataList[i] != GET_PENDING_DTC_RESPONSE:
+                    logger.warning('Unexpected Response to GET_DTC (%s)', dataList[i])
+                    break
+                i += 1
+
+            #For CAN, 1st byte is Number of DTCs
+            if prot_is_CAN and i == 1:
+                NumCodes = hex_to_int(dataList[i])
+                i += 1
+                if dtcNumber is not None and (NumCodes != dtcNumber[ecu]):
+                    logger.warning('Expected Codes (%d) != Received Codes (%d)', dtcNumber[ecu], NumCodes)
+
+            if i >= len(dataList):
+                break
+
+            val1 = hex_to_int(dataList[i])
+            val2 = hex_to_int(dataList[i+1]) #get DTC codes from response (3 DTC each 2 bytes)
+            val  = (val1<<8)+val2 #DTC val as int
+
+            i += 2
+
+            if val==0: #skip fill of last packet
+                continue
+
+            DTCStr=dtcLetters[(val&0xC000)>>14]+'%X%03X' % ((val&0x3000)>>12, val&0x0fff)
+            DTCCodes[ecu].append([DTCType, DTCStr])
+
+    return DTCCodes
+
+def decode_vin(res, prot_is_CAN, logger):
+    """Returns the VIN in a mode $09 PID $02 response from one ECU (list
+    of data bytes, see data_bytes), or '' if the response is not valid."""
+    if prot_is_CAN:
+        if len(res) < 20 or res[:3] != [VEHICLE_INFO_MODE_RESPONSE, VIN_PID, '01']:
+            code = ''.join(res[:3])
+            logger.warning('Unexpected Response to GET_VIN (%s)', code)
+            return ''
+
+        #Convert returned ascii byte codes to a string
+        return bytes.fromhex(''.join(res[3:])).decode()
+
+    else:
+        #I can't test this path.  I think it's right based on the spec....
+        #I also took a shortcut, assuming mode $09 PID $01 would return '05' (it should).
+        if len(res) < 35:
+            logger.warning('Unexpected Response Length to GET_VIN (%d)', len(res))
+        i = 0
+        retVal = ''
+        while len(res) > 0:
+            i += 1
+            message_count = '%02X' % i
+            code = res[:7]
+            if code[:3] != [VEHICLE_INFO_MODE_RESPONSE, VIN_PID, message_count]:
+                code = ''.join(code[:3])
+                logger.warning('Unexpected Response to GET_VIN (%s)', code)
+                return ''
+
+            if i == 1:
+                if code[3:6] != ['00','00','00']:
+                    code = ''.join(code[3:6])
+                    logger.warning('Unexpected Pad Bytes to GET_VIN (%s)', code)
+                    return ''
+                #strip pad bytes
+                code = code[6:]
+            else:
+                code = code[3:]
+            #Convert returned ascii byte codes to a string
+            retVal += bytes.fromhex(''.join(code)).decode()
+            res = res[7:]
+
+        return retVal
 
 class OBDPort:
     """ OBDPort abstracts all communication with OBD-II device."""
-    def __init__(self,portnum,baudrate,_notify_window,SERTIMEOUT,RECONNATTEMPTS):
-        """Initializes port by resetting device and gettings supported PIDs. """
+    def __init__(self,portnum,baudrate,_notify_window,SERTIMEOUT,RECONNATTEMPTS,progress=None,
+                 transcript=None,transport=None,stop=None):
+        """Initializes port by resetting device and gettings supported PIDs.
+        If given, progress(event, value) is called as the connection is
+        brought up; event is one of 'port', 'attempt', 'elm', 'protocol'
+        or 'ecu'.  If transcript is a file name, all serial traffic is
+        recorded to it (see obd_transcript).  If transport is given, it
+        is used instead of opening the serial port portnum; it must
+        behave like serial.Serial (e.g. obd_transcript.ReplaySerial).  If
+        stop (a threading.Event) is given, no further connection attempts
+        are made once it is set, and the wait between attempts ends. """
         # These should really be set by the user.
         #baud     = 9600
         baud = int(baudrate)
@@ -77,30 +227,51 @@ class OBDPort:
         self.State = 1 #state SERIAL is 1 connected, 0 disconnected (connection failed)
 
         self._notify_window=_notify_window
-        self._notify_window.logger.info('Opening interface (serial port)')
+        self.logger = _notify_window.logger
+        self._trace = None  #(command, start time) while a traced request is outstanding
+        self.logger.info('Opening interface (serial port)')
         self.port = None
         self.protocol = None
         self.prot_is_CAN = False
         self.ecu_addresses = []
+        self.vehicle_info_supported = {}
+        self.progress = progress
 
-        try:
-            self.port = serial.Serial(portnum,baud, parity = par, stopbits = sb, \
-                bytesize = databits,timeout = to)
+        if transport is not None:
+            self.port = transport
+        else:
+            try:
+                self.port = serial.Serial(portnum,baud, parity = par, stopbits = sb, \
+                    bytesize = databits,timeout = to)
 
-        except serial.SerialException as e:
-            self._notify_window.logger.error("Error connecting to serial port %s: %s", portnum, str(e))
-            self.State = 0
-            return None
+            except serial.SerialException as e:
+                self.logger.error("Error connecting to serial port %s: %s", portnum, str(e))
+                self.State = 0
+                return None
+
+        self.logger.info("Interface %s successfully opened", self.port.portstr)
 
-        self._notify_window.logger.info("Interface %s successfully opened", self.port.portstr)
-        self._notify_window.logger.info("Connecting to ECU...")
+        if transcript:
+            try:
+                self.port = TranscriptSerial(self.port, TranscriptWriter(transcript))
+            except OSError as e:
+                self.logger.error("Error opening transcript file %s: %s", transcript, str(e))
+            else:
+                self.logger.info("Recording serial transcript to %s", transcript)
+        self.notify('port', self.port.portstr)
+        self.logger.info("Connecting to ECU...")
 
         def ConnectionError(count, msg = ''):
-            self._notify_window.logger.error("Connection attempt failed: %s", msg)
+            self.logger.error("Connection attempt failed: %s", msg)
             count += 1
             if count <= RECONNATTEMPTS:
-                time.sleep(5)
-                self._notify_window.logger.info("Reconnection attempt: %d", count)
+                if stop is None:
+                    time.sleep(5)
+                elif stop.wait(5):
+                    self.logger.info("Connection attempts stopped")
+                    return RECONNATTEMPTS + 1
+                self.logger.info("Reconnection attempt: %d", count)
+                self.notify('attempt', count)
             return count
 
         count=0
@@ -108,7 +279,7 @@ class OBDPort:
             try:
                 self.send_command("atz")   # initialize
             except serial.SerialException as e:
-                self._notify_window.logger.error("Error connecting to serial port: %s", str(e))
+                self.logger.error("Error connecting to serial port: %s", str(e))
                 self.State = 0
                 return None
 
@@ -118,23 +289,25 @@ class OBDPort:
                 continue
 
             self.ELMver = res[-1]  #Last Non-Blank Line Returned is ELM Version
-            self._notify_window.logger.debug("atz response: %s", self.ELMver)
+            self.logger.debug("atz response: %s", self.ELMver)
+            self.notify('elm', self.ELMver)
             self.send_command("ate0")  # echo off
             res = self.get_result() # ATE0 command should echo command and return OK
             if res == None:
-                count = ConnectionError(count, res[0])
+                count = ConnectionError(count)
                 continue
 
-            self._notify_window.logger.debug("ate0 response: %s", res[-1])
+            self.logger.debug("ate0 response: %s", res[-1])
 
             self.send_command('atdp') #Send Display Protocol Command
             res = self.get_result()
             if res == None:
-                count = ConnectionError(count, res[0])
+                count = ConnectionError(count)
                 continue
 
             self.protocol = res[0]
             self.prot_is_CAN = self.protocol.upper().find('CAN') != -1
+            self.notify('protocol', self.protocol)
 
             self.send_command('ath1') #Turn on headers
             self.get_result()
@@ -163,7 +336,7 @@ class OBDPort:
             #         ----------ECU Address
 
             for ready in res:
-                self._notify_window.logger.debug("0100 response1: %s", ready)
+                self.logger.debug("0100 response1: %s", ready)
                 ready = ready.split(' ')
                 if not self.prot_is_CAN:
                     ecu = ready[2]
@@ -176,6 +349,8 @@ class OBDPort:
                     self.ecu_addresses.append(ecu)
 
             self.ecu_addresses = sorted(self.ecu_addresses)
+            for ecu in self.ecu_addresses:
+                self.notify('ecu', ecu)
 
             if len(self.ecu_addresses) > 0:
                 return None
@@ -186,6 +361,11 @@ class OBDPort:
         self.State = 0
         return None
 
+    def notify(self, event, value):
+        """Internal use only: not a public interface"""
+        if self.progress is not None:
+            self.progress(event, value)
+
     def getEcuNum(self, ecuAddress):
         if ecuAddress in self.ecu_addresses:
             return self.ecu_addresses.index(ecuAddress)
@@ -205,15 +385,40 @@ class OBDPort:
     def send_command(self, cmd):
         """Internal use only: not a public interface"""
         if self.port:
+            #Decide once per request whether the exchange is traced;
+            #get_result emits the trace record.
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self._trace = (cmd, time.monotonic())
+            else:
+                self._trace = None
             try:
                 self.port.flushOutput()
                 self.port.flushInput()
-                cmd += '\r\n'
-                self.port.write(cmd.encode('ascii', 'ignore'))
+                self.port.write((cmd + '\r\n').encode('ascii', 'ignore'))
                 self.port.flush()
-                self._notify_window.logger.debug("Send command: %s", cmd.strip())
             except:
-                self._notify_window.logger.error("Error Sending command: %s", cmd)
+                self.logger.error("Error Sending command: %s", cmd)
+
+    def trace_exchange(self, result):
+        """Internal use only: not a public interface"""
+        cmd, start = self._trace
+        self._trace = None
+        elapsed = time.monotonic() - start
+        if result is None:
+            result = []
+        #Responding ECU is the first header byte on CAN, the third
+        #otherwise.  AT commands are answered by the interface itself.
+        ecus = []
+        if not cmd.upper().startswith('AT'):
+            n = 0 if self.prot_is_CAN else 2
+            for line in result:
+                fields = line.split(' ')
+                if len(fields) > n + 1 and fields[n] not in ecus:
+                    ecus.append(fields[n])
+        self.logger.debug("Exchange %s -> [%s] %.1f ms ECU: %s", cmd, ' | '.join(result),
+                          elapsed * 1000, ','.join(ecus),
+                          extra = {'obd_command': cmd, 'obd_response': result,
+                                   'obd_elapsed': elapsed, 'obd_ecus': ecus})
 
 
     def interpret_result(self,data,ecu):
@@ -234,7 +439,7 @@ class OBDPort:
                 raise "BogusCode"
 
             #cables can behave differently
-            if code[:6] == "NODATA": # there is no such sensor
+            if code[:6] == "NODATA" or code[:7] == "NO DATA": # there is no such sensor
                 return "NODATA"
 
             code = code.split(' ')
@@ -277,7 +482,7 @@ class OBDPort:
                 try:
                     c = self.port.read(1).decode('utf8', 'ignore')
                 except Exception as e:
-                    self._notify_window.logger.error("Get Result Failed: %s", str(e))
+                    self.logger.error("Get Result Failed: %s", str(e))
                     break
 
                 if len(c) == 0 or c == '>': #Loop until SOI or buffer is empty
@@ -288,65 +493,23 @@ class OBDPort:
                     result.append(buffer) #add line to return result
                     buffer = ''
 
-            for line in result:
-                self._notify_window.logger.debug("Get result: %s", line)
-
             if len(result) == 0:
                 result = None
 
+            if self._trace is not None:
+                self.trace_exchange(result)
+
             return result
         else:
-            self._notify_window.logger.error("NO self.port! %s", buffer)
+            self.logger.error("NO self.port!")
         return None
 
     def get_obd_data_bytes(self):
         """Internal use only: not a public interface"""
-        retVal = {}
-        byteCount = {}
         data = self.get_result()
         if data is None:
             return None
-
-        for line in data:
-            line = line.split(' ') #Turn data into list of bytes
-            if not self.prot_is_CAN:
-                line = line[2:]
-            ecu = line[0]
-            if ecu not in retVal:
-                retVal[ecu] = []
-            if self.prot_is_CAN:
-                if line[1][0] == '0':  #PCI Byte indicates single line response
-                    byteCount[ecu] = int(line[1][1]) #Second half of PCI byte is data length
-                    line = line[2:]  #Remove ecu address and byte count
-                    retVal[ecu] += line[0:byteCount[ecu]] #Get the data
-
-                elif line[1][0] == '1':   #PCI Byte indicates 1st frame of multiframe response
-                    byteCount[ecu] = hex_to_int(line[1][1] + line[2]) #PCI Byte extended 1 byte for byte count
-                    retVal[ecu] += ['00'] * (byteCount[ecu]-len(retVal[ecu])) #Fill out data with zeroes
-                    retVal[ecu] = retVal[ecu][0:byteCount[ecu]]               #Truncate list to byte count
-                    line = line[3:]                                           #Remove ECU Address and Byte Count
-                    i = 0
-                    for byte in line:
-                        retVal[ecu][i] = byte
-                        i += 1
-                elif line[1][0] == '2':            #PCI Byte indicates Next frame of multiframe response
-                    i = hex_to_int(line[1][1])  #Indicates frame # of multiframe response
-                    i = i*7 - 1
-                    line = line[2:]
-                    if ecu not in byteCount:
-                        retVal[ecu] += ['00'] * (i+7 - len(retVal[ecu])) #Next Frame came before 1st frame.
-                            #Fill through this frame with zeroes.
-                    for data in line:
-                        if i < len(retVal[ecu]):
-                            retVal[ecu][i] = data
-                        else:
-                            break
-                        i += 1
-
-            else:
-                retVal[ecu] += line[1:]
-
-        return retVal
+        return data_bytes(data, self.prot_is_CAN)
 
     # get sensor value from command
     def get_sensor_value(self,sensor,ecu):
@@ -448,15 +611,15 @@ class OBDPort:
     def get_tests(self, ecu, test_pid = 0x01):
         return self.sensor(test_pid, ecu)[1]
 
+    def get_vehicle_info_supported(self, ecu):
+        """Returns bit string of mode $09 PIDs supported by ecu.
+        The result is cached, since every mode $09 request needs it."""
+        if ecu not in self.vehicle_info_supported:
+            self.vehicle_info_supported[ecu] = self.get_supported(ecu, VEHICLE_INFO_MODE, [0])
+        return self.vehicle_info_supported[ecu]
+
     def get_vin(self, ecu):
-        VEHICLE_INFO_MODE = '09'
-        VEHICLE_INFO_MODE_RESPONSE = '49'
-        VEHICLE_INFO_SUPPORTED_PIDS = [0]
-        VIN_PID = '02'
-        VIN_SUPPORTED_INDEX = 1
-        GET_VIN_CMD = VEHICLE_INFO_MODE + VIN_PID
-
-        supp = self.get_supported(ecu, VEHICLE_INFO_MODE, VEHICLE_INFO_SUPPORTED_PIDS)
+        supp = self.get_vehicle_info_supported(ecu)
         if supp[VIN_SUPPORTED_INDEX] == '0':
             return ''
 
@@ -466,47 +629,7 @@ class OBDPort:
         if res is None or ecu not in res:
             return '' #Connection Lost
 
-        res = res[ecu]
-
-        if self.prot_is_CAN:
-            if len(res) < 20 or res[:3] != [VEHICLE_INFO_MODE_RESPONSE, VIN_PID, '01']:
-                code = ''.join(res[:3])
-                self._notify_window.logger.warning('Unexpected Response to GET_VIN (%s)', code)
-                return ''
-
-            #Convert returned ascii byte codes to a string
-            return bytes.fromhex(''.join(res[3:])).decode()
-
-        else:
-            #I can't test this path.  I think it's right based on the spec....
-            #I also took a shortcut, assuming mode $09 PID $01 would return '05' (it should).
-            if len(res) < 35:
-                self._notify_window.logger.warning('Unexpected Response Length to GET_VIN (%d)', len(res))
-            i = 0
-            retVal = ''
-            while len(res) > 0:
-                i += 1
-                message_count = '%02X' % i
-                code = res[:7]
-                if code[:3] != [VEHICLE_INFO_MODE_RESPONSE, VIN_PID, message_count]:
-                    code = ''.join(code[:3])
-                    self._notify_window.logger.warning('Unexpected Response to GET_VIN (%s)', code)
-                    return ''
-
-                if i == 1:
-                    if code[3:6] != ['00','00','00']:
-                        code = ''.join(code[3:6])
-                        self._notify_window.warning('Unexpected Pad Bytes to GET_VIN (%s)', code)
-                        return ''
-                    #strip pad bytes
-                    code = code[6:]
-                else:
-                    code = code[3:]
-                #Convert returned ascii byte codes to a string
-                retVal += bytes.fromhex(''.join(code)).decode()
-                res = res[7:]
-
-            return retVal
+        return decode_vin(res[ecu], self.prot_is_CAN, self.logger)
 
     def sensor_names(self):
         """Internal use only: not a public interface"""
@@ -536,47 +659,6 @@ class OBDPort:
     def get_dtc(self):
         """Returns a list of all pending DTC codes. Each element consists of
         a 2-tuple: (DTC code (string), Code description (string) )"""
-        #Separate Data received into codes for each ECU.
-        def parse_get_dtc_data(res, DTCCodes, DTCType, dtcNumber=None):
-            dtcLetters = ["P", "C", "B", "U"]
-            for ecu in res:
-                i=0
-                dataList = res[ecu]
-                if ecu not in DTCCodes:
-                    DTCCodes[ecu] = []
-
-                while i < len(dataList):
-                    #check Mode Response byte (Should be GET_DTC_RESPONSE(0x43))
-                    if (self.prot_is_CAN and i == 0) or (not self.prot_is_CAN and (i % 7) == 0):
-                        if dataList[i] != GET_DTC_RESPONSE and dataList[i] != GET_PENDING_DTC_RESPONSE:
-                            self._notify_window.logger.warning('Unexpected Response to GET_DTC (%s)', dataList[i])
-                            break
-                        i += 1
-
-                    #For CAN, 1st byte is Number of DTCs
-                    if self.prot_is_CAN and i == 1:
-                        NumCodes = hex_to_int(dataList[i])
-                        i += 1
-                        if dtcNumber is not None and (NumCodes != dtcNumber[ecu]):
-                            self._notify_window.logger.warning('Expected Codes (%d) != Received Codes (%d)', dtcNumber[ecu], NumCodes)
-
-                    if i >= len(dataList):
-                        break
-
-                    val1 = hex_to_int(dataList[i])
-                    val2 = hex_to_int(dataList[i+1]) #get DTC codes from response (3 DTC each 2 bytes)
-                    val  = (val1<<8)+val2 #DTC val as int
-
-                    i += 2
-
-                    if val==0: #skip fill of last packet
-                        continue
-
-                    DTCStr=dtcLetters[(val&0xC000)>>14]+str((val&0x3000)>>12)+str(val&0x0fff)
-                    DTCCodes[ecu].append([DTCType, DTCStr])
-
-            return DTCCodes
-
         DTCCodes = {}
         r = self.sensor(1)[1] #data
         dtcNumber = {}
@@ -586,7 +668,7 @@ class OBDPort:
             for ecu in r:
                 dtcNumber[ecu] = r[ecu][ptest[0]]
                 mil[ecu] = r[ecu][ptest[1]]
-                self._notify_window.logger.info('Number of stored DTC: %d', dtcNumber[ecu])
+                self.logger.info('Number of stored DTC: %d', dtcNumber[ecu])
 
             # Get Active DTCs
             self.send_command(GET_DTC_COMMAND)
@@ -595,7 +677,7 @@ class OBDPort:
             if res is None:
                 return None #Connection Lost
 
-            DTCCodes = parse_get_dtc_data(res, DTCCodes, 'Active', dtcNumber)
+            DTCCodes = parse_dtc_data(res, DTCCodes, 'Active', self.prot_is_CAN, self.logger, dtcNumber)
         else:
             return None #Connection Lost
 
@@ -604,7 +686,7 @@ class OBDPort:
         res = self.get_obd_data_bytes()
 
         if res != None: #Pending Trouble Codes Returned
-            DTCCodes = parse_get_dtc_data(res, DTCCodes, 'Passive')
+            DTCCodes = parse_dtc_data(res, DTCCodes, 'Passive', self.prot_is_CAN, self.logger)
 
         return DTCCodes
 
@@ -616,17 +698,16 @@ class OBDPort:
             r = r[0]
         return r
 
-    def log(self, sensor_index, filename):
-        file = open(filename, "w")
-        start_time = time.time()
-        if file:
-            data = self.sensor(sensor_index)
-            file.write("%s     \t%s(%s)\n" % \
-                         ("Time", string.strip(data[0]), data[2]))
-            while 1:
-                now = time.time()
-                data = self.sensor(sensor_index)
-                line = "%.6f,\t%s\n" % (now - start_time, data[1])
-                file.write(line)
-                file.flush()
-
+    def log(self, sensor_index, filename, ecu = None, duration = None):
+        """Logs a sensor from ecu (first ECU found if None) to filename until
+        interrupted, or for duration seconds.  See obd_datalog.DataLogger
+        for logging several sensors or ECUs at once."""
+        from .obd_datalog import DataLogger  #Loads the trip and statistics modules
+        if ecu is None:
+            ecu = self.ecu_addresses[0]
+        logger = DataLogger(self, {ecu: [sensor_index]}, filename)
+        try:
+            logger.run(duration)
+        except KeyboardInterrupt:
+            pass
+        return logger
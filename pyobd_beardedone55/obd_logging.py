@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_logging.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Log file support shared by the GUI and the console front end.  Records
+# are put on a queue by the thread that logs them and written to disk by
+# a background thread, so serial I/O never waits on the file system.
+#
+############################################################################
+
+import os
+import gzip
+import queue
+import shutil
+import logging
+import logging.handlers
+
+LOG_FILE_FORMAT = '%(asctime)s %(levelname)s:\t%(message)s'
+
+#Rotation modes
+ROTATE_NEVER = 'never'
+ROTATE_SIZE = 'size'
+ROTATE_HOURLY = 'hourly'
+ROTATE_DAILY = 'daily'
+ROTATE_MODES = [ROTATE_NEVER, ROTATE_SIZE, ROTATE_HOURLY, ROTATE_DAILY]
+
+_ROTATE_WHEN = {ROTATE_HOURLY: 'H', ROTATE_DAILY: 'midnight'}
+
+def _gzip_namer(name):
+    return name + '.gz'
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+def file_handler(filename, rotate = ROTATE_NEVER, max_bytes = 10 << 20,
+                 backups = 5, compress = False):
+    """Returns a logging handler writing to filename.  rotate is one of
+    ROTATE_MODES; rotated files are gzip compressed if compress is set."""
+    if rotate == ROTATE_NEVER:
+        return logging.FileHandler(filename, 'w')
+    if rotate == ROTATE_SIZE:
+        handler = logging.handlers.RotatingFileHandler(filename,
+                    maxBytes = max_bytes, backupCount = backups)
+    elif rotate in _ROTATE_WHEN:
+        handler = logging.handlers.TimedRotatingFileHandler(filename,
+                    when = _ROTATE_WHEN[rotate], backupCount = backups)
+    else:
+        raise ValueError('Unknown log rotation: %s' % rotate)
+    if compress:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    return handler
+
+class FileLog:
+    """ FileLog attaches a QueueHandler to a logger and runs a
+    QueueListener thread that passes the records on to a file handler.
+    The file is opened by the constructor, so an error is raised to the
+    caller; writing, rotating and compressing happen on the listener
+    thread."""
+
+    def __init__(self, filename, rotate = ROTATE_NEVER, max_bytes = 10 << 20,
+                 backups = 5, compress = False, fmt = LOG_FILE_FORMAT):
+        #Raises OSError if the file cannot be opened
+        self.handler = file_handler(filename, rotate, max_bytes, backups, compress)
+        self.handler.setFormatter(logging.Formatter(fmt))
+        self.filename = filename
+        self.queue = queue.SimpleQueue()
+        self.queueHandler = logging.handlers.QueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, self.handler)
+        self.logger = None
+
+    def start(self, logger):
+        self.logger = logger
+        self.listener.start()
+        logger.addHandler(self.queueHandler)
+
+    def stop(self):
+        """Detach from the logger, write out queued records and close the file."""
+        if self.logger is None:
+            return
+        self.logger.removeHandler(self.queueHandler)
+        self.logger = None
+        self.listener.stop()
+        self.handler.close()
@@ -33,79 +33,106 @@
 #   February 27, 2019
 #   March 31, 2019
 #   April 6, 2019
+#   October 19, 2026
 #
 # For a complete history, see https://github.com/beardedone55/pyobd
 ############################################################################
 
-from .obd2_codes import ptest
+from .obd2_tests import ptest
 
 def hex_to_int(hexstr):
     return int(hexstr,16)
 
+class Scaling:
+    """Decoder for a numeric PID.  value(n) converts the integer formed by
+    the first size data bytes.  It uses plain arithmetic only, so it
+    gives the same result for a Python int and element-wise for a NumPy
+    integer array (see obd_decode).  Calling the decoder with the hex
+    data string returns the formatted value; number() returns it
+    unformatted."""
+    def __init__(self, size, fmt, value):
+        self.size = size
+        self.fmt = fmt
+        self.value = value
+        self.__name__ = value.__name__
+
+    def number(self, code):
+        return self.value(hex_to_int(code[:self.size * 2]))
+
+    def __call__(self, code):
+        v = self.number(code)
+        return str(v) if self.fmt is None else self.fmt % v
+
+def scaling(size, fmt = None):
+    """Decorator making a Scaling from a function of the raw integer.
+    fmt of None formats with str()."""
+    def make(value):
+        return Scaling(size, fmt, value)
+    return make
+
+@scaling(2, '%4.3f')
 def maf(code):
-    code = hex_to_int(code[:4])
-    return '%4.3f' % (code * 0.00132276)
+    return code * 0.00132276
 
+@scaling(1, '%3.1f')
 def throttle_pos(code):
-    code = hex_to_int(code[:2])
-    return '%3.1f' % (code * 100.0 / 255.0)
+    return code * 100.0 / 255.0
 
+@scaling(1, '%4.3f')
 def intake_m_pres(code): # in kPa
-    code = hex_to_int(code[:2])
-    return '%4.3f' % (code * 0.14504)
+    return code * 0.14504
 
+@scaling(1, '%4.3f')
 def fuel_pres(code): # in 3kPa
-    code = hex_to_int(code[:2])
-    return '%4.3f' % (code * 0.43511)
+    return code * 0.43511
 
+@scaling(2, '%4.3f')
 def fuel_pres_10(code): # in 10kPa
-    code = hex_to_int(code[:4])
-    return '%4.3f' % (code * 1.4504)
+    return code * 1.4504
 
+@scaling(2, '%4.3f')
 def rel_fuel_pres(code): #in 0.079 kPa
-    code = hex_to_int(code[:4])
-    return '%4.3f' % (code * 0.14504 * 0.079)
+    return code * 0.14504 * 0.079
 
+@scaling(2)
 def rpm(code):
-    code = hex_to_int(code[:4])
-    return str(code / 4)
+    return code / 4
 
+@scaling(1, '%3.1f')
 def speed(code):
-    code = hex_to_int(code[:2])
-    return '%3.1f' % (code / 1.609)
+    return code / 1.609
 
+@scaling(1, '%3.1f')
 def percent_scale(code):
-    code = hex_to_int(code[:2])
-    return '%3.1f' % (code * 100.0 / 255.0)
+    return code * 100.0 / 255.0
 
+@scaling(2, '%3.1f')
 def abs_load_percent(code):
-    code = hex_to_int(code[:4])
-    return '%3.1f' % (code * 100.0 / 255.0)
+    return code * 100.0 / 255.0
 
+@scaling(1, '%3.1f')
 def timing_advance(code):
-    code = hex_to_int(code[:4])
-    return '%3.1f' % ((code - 128) / 2.0)
+    return (code - 128) / 2.0
 
+@scaling(2, '%3.3f')
 def injection_timing(code):
-    code = hex_to_int(code[:4])
-    code = (code - 38665) / 128.0
-    return '%3.3f' % (code)
+    return (code - 38665) / 128.0
 
+@scaling(2)
 def sec_to_min(code):
-    code = hex_to_int(code[:4])
-    return str(code / 60)
+    return code / 60
 
+@scaling(1)
 def temp(code):
-    code = hex_to_int(code[:2])
-    return str(code - 40)
+    return code - 40
 
 def cpass(code):
     #fixme
     return code
 
+@scaling(1, '%3.1f')
 def fuel_trim_percent(code):
-    code = hex_to_int(code[:2])
-    return '%3.1f' % ((code - 128.0) * 100.0 / 128.0)
+    return (code - 128.0) * 100.0 / 128.0
 
 def dtc_decrypt(code):
     #first byte is byte after PID and without spaces
@@ -159,54 +186,56 @@ def ol_cl(code):
     codeB = ol_cl_convert(code[2:4])
     return 'Fuel System 1: %s; Fuel System 2: %s' % (codeA, codeB)
 
+@scaling(1, '%1.3f')
 def sensor_voltage(code):
-    code = hex_to_int (code[0:2])
-    return '%1.3f' % (code * 0.005)
+    return code * 0.005
 
+@scaling(2, '%2.3f')
 def cm_voltage(code):
-    code = hex_to_int (code[0:4])
-    return '%2.3f' % (code * 0.001)
+    return code * 0.001
 
-def eq_ratio(code):
-    code = hex_to_int(code[0:4]) #Bytes A/B contain Equivalence Ratio
-    return '%1.4f' % (code * 0.0000305)
+@scaling(2, '%1.4f')
+def eq_ratio(code): #Bytes A/B contain Equivalence Ratio
+    return code * 0.0000305
 
+#Signed 16 bit values: the comparison is 0 or 1 for ints and arrays alike
+@scaling(2, '%4.2f')
 def evap_pres(code):
-    code = hex_to_int(code[0:4])
-    code = code if (code < 32768) else (code - 65535)
-    return '%4.2f' % (code / 4.0)
+    return (code - 65535 * (code >= 32768)) / 4.0
 
+@scaling(2)
 def evap_pres2(code):
-    code = hex_to_int(code[0:4])
-    code = code if (code < 32768) else (code - 65535)
-    return str(code)
+    return code - 65535 * (code >= 32768)
 
+@scaling(2, '%4.5f')
 def abs_vapor_pres(code):
-    code = hex_to_int(code[0:4])
-    return '%4.5f' % (code * 0.005 * 0.14504)
+    return code * 0.005 * 0.14504
 
 def hex_to_bitstring(hexstr):
     retVal = bin(int(hexstr,16))[2:]
     return retVal.zfill(len(hexstr)*4)
 
+@scaling(2, '%6.1f')
 def km_to_mi(code):
-    return '%6.1f' % (hex_to_int(code[:4]) * 0.6)
+    return code * 0.6
 
+@scaling(2, '%4.2f')
 def fuel_rate(code):
-    code = hex_to_int(code[:4])
-    code = code * 0.05 *0.264172
-    return '%4.2f' % (code)
+    return code * 0.05 *0.264172
 
+@scaling(1)
 def req_torque(code):
-    code = hex_to_int(code[:2])
-    return str(code - 125)
+    return code - 125
 
+@scaling(2, '%5.1f')
 def ref_torque(code):
-    code = hex_to_int(code[:4])
-    return '%5.1f' % (code * 0.737562)
+    return code * 0.737562
 
 class Sensor:
     def __init__(self,sensorName, sensorcommand, sensorValueFunction, u, length):
+        if isinstance(sensorValueFunction, Scaling) and sensorValueFunction.size > length:
+            raise ValueError('%s: %s reads %d bytes of %d' % (sensorcommand,
+                             sensorValueFunction.__name__, sensorValueFunction.size, length))
         self.name = sensorName
         self.cmd  = sensorcommand
         self.value= sensorValueFunction
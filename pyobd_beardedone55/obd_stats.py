@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_stats.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Running statistics of sensor values, updated one sample at a time in
+# constant time and memory, so they can be kept for every PID of a live
+# session or a trip without keeping the samples.
+#
+# Count, min, max, mean and variance are exact (Welford's method).
+# Percentiles are estimated with the P-square algorithm (Jain and
+# Chlamtac, 1985), which tracks five markers per percentile and adjusts
+# their heights with a parabolic fit as samples arrive.  Estimates are
+# exact up to five samples and usually within a few percent of the
+# range for smooth distributions after that.
+#
+############################################################################
+
+import math
+import threading
+from bisect import insort
+
+from . import obd_trip    #Not 'from': obd_trip imports this module too
+
+QUANTILES = (50, 95, 99)    #percentiles estimated by RunningStats
+
+class P2Quantile:
+    """ P2Quantile estimates the p'th percentile of the values added."""
+
+    __slots__ = ('p', 'heights', 'positions', 'increments')
+
+    def __init__(self, p):
+        f = p / 100.0
+        self.p = p
+        self.heights = []   #marker heights; the first five values until full
+        self.positions = [0, 1, 2, 3, 4]
+        #Desired positions of the middle markers are these times the
+        #position of the last one
+        self.increments = (f / 2, f, (1 + f) / 2)
+
+    def add(self, x):
+        q = self.heights
+        if len(q) < 5:
+            insort(q, x)
+            return
+        n = self.positions
+        #Move the markers above x up one place
+        if x < q[2]:
+            if x < q[0]:
+                q[0] = x
+            if x < q[1]:
+                n[1] += 1
+            n[2] += 1
+            n[3] += 1
+        elif x < q[3]:
+            n[3] += 1
+        elif x > q[4]:
+            q[4] = x
+        last = n[4] = n[4] + 1
+        for i in (1, 2, 3):
+            d = self.increments[i - 1] * last - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                #Parabolic prediction, or linear if it would not stay between neighbours
+                h = q[i] + d / (n[i + 1] - n[i - 1]) * \
+                    ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                     (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < h < q[i + 1]:
+                    h = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = h
+                n[i] += d
+
+    def value(self):
+        """Returns the estimate, or None if no values were added."""
+        q = self.heights
+        if len(q) == 0:
+            return None
+        if self.positions[4] > 4:
+            return q[2]
+        #Up to five values: interpolate between the closest ranks
+        k = (len(q) - 1) * self.p / 100.0
+        i = int(k)
+        if i + 1 >= len(q):
+            return q[-1]
+        return q[i] + (q[i + 1] - q[i]) * (k - i)
+
+class RunningStats:
+    """ RunningStats keeps count, min, max, mean and variance of the
+    values added, and estimates of the percentiles in quantiles."""
+
+    __slots__ = ('count', 'min', 'max', 'mean', 'm2', 'quantiles')
+
+    def __init__(self, quantiles = QUANTILES):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0       #sum of squared differences from the mean
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+
+    def add(self, x):
+        #count is stored last, so a thread reading the statistics while
+        #values are added never sees a count without min, max and
+        #percentiles
+        count = self.count + 1
+        if count == 1:
+            self.min = self.max = x
+        elif x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+        delta = x - self.mean
+        self.mean += delta / count
+        self.m2 += delta * (x - self.mean)
+        for q in self.quantiles:
+            q.add(x)
+        self.count = count
+
+    def extend(self, values):
+        """Adds a sequence of values, e.g. an array read from a trip file."""
+        n = len(values)
+        if n == 0:
+            return
+        #Combine with the mean and spread of the batch (Chan et al.)
+        mean = math.fsum(values) / n
+        m2 = math.fsum([(x - mean) * (x - mean) for x in values])
+        count = self.count + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * n / count
+        self.mean += delta * n / count
+        low = min(values)
+        high = max(values)
+        if self.count == 0 or low < self.min:
+            self.min = low
+        if self.count == 0 or high > self.max:
+            self.max = high
+        for q in self.quantiles:
+            add = q.add
+            for x in values:
+                add(x)
+        self.count = count
+
+    def variance(self):
+        """Returns the sample variance, 0 for fewer than two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def stddev(self):
+        return math.sqrt(self.variance())
+
+    def percentiles(self):
+        """Returns dictionary of percentile -> estimate."""
+        return {q.p: q.value() for q in self.quantiles}
+
+    def summary(self):
+        """Returns the statistics as a dictionary (count only if empty)."""
+        if self.count == 0:
+            return {'count': 0}
+        return {'count': self.count, 'min': self.min, 'max': self.max, 'mean': self.mean,
+                'variance': self.variance(), 'stddev': self.stddev(),
+                'percentiles': self.percentiles()}
+
+class Stats:
+    """ Stats keeps a RunningStats per (ECU, PID), created when the first
+    value arrives and visible to get() and keys() once it holds that
+    value.  add_results() takes get_sensors() results, so the sensor
+    producer can feed it directly while the GUI reads it."""
+
+    def __init__(self, quantiles = QUANTILES):
+        self.quantiles = quantiles
+        self.series = {}
+        self.lock = threading.Lock()    #Guards creation of series
+
+    def get(self, ecu, pid):
+        """Returns RunningStats of ecu and pid, or None if no values yet."""
+        return self.series.get((ecu, pid))
+
+    def keys(self):
+        """Returns list of (ecu, pid) with statistics."""
+        with self.lock:
+            return list(self.series)
+
+    def publish(self, ecu, pid, stats):
+        """Stores a new, non-empty RunningStats.  Returns the one stored
+        first if another thread got there before."""
+        with self.lock:
+            return self.series.setdefault((ecu, pid), stats)
+
+    def add(self, ecu, pid, value):
+        stats = self.series.get((ecu, pid))
+        if stats is None:
+            stats = RunningStats(self.quantiles)
+            stats.add(value)
+            first = self.publish(ecu, pid, stats)
+            if first is not stats:
+                first.add(value)
+        else:
+            stats.add(value)
+
+    def extend(self, ecu, pid, values):
+        """Adds a sequence of values of ecu and pid."""
+        if len(values) == 0:
+            return
+        stats = self.series.get((ecu, pid))
+        if stats is None:
+            stats = RunningStats(self.quantiles)
+            stats.extend(values)
+            first = self.publish(ecu, pid, stats)
+            if first is not stats:
+                first.extend(values)
+        else:
+            stats.extend(values)
+
+    def add_results(self, ecu, results):
+        """Adds the numeric values of a get_sensors() result.  Returns the
+        number of values added."""
+        count = 0
+        for pid, (name, value, unit) in results.items():
+            value = obd_trip.to_number(value)
+            if value is not None:
+                self.add(ecu, pid, value)
+                count += 1
+        return count
+
+    def clear(self):
+        with self.lock:
+            self.series = {}
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_summary.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Summaries of recorded trips: per PID count, min, max, mean, standard
+# deviation and percentiles (see obd_stats), the trouble codes seen and
+# the VIN.  Trip files (see obd_trip) hold decoded values; transcripts
+# (see obd_transcript) are decoded here with the obd_sensors table.
+#
+# Trip files carry the statistics of each column in their footer, and
+# are summarized from it without reading any samples.  Footer
+# percentiles are only present if the recorder kept live statistics.  Other files are
+# summarized by summarize_files() with a pool of processes.  Older trip
+# files are split into tasks of about TASK_SAMPLES samples, whole
+# columns at a time; samples are streamed through RunningStats a chunk
+# at a time, so a worker needs memory for one chunk, not a column.  A
+# transcript is one task.
+#
+############################################################################
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from . import obd_sensors
+from . import obd_trip
+from . import obd_stats
+from . import obd_transcript
+from .obd_io import data_bytes, parse_dtc_data, decode_vin
+from .obd_io import GET_DTC_COMMAND, GET_PENDING_DTC_COMMAND, GET_VIN_CMD
+
+TASK_SAMPLES = 1 << 20      #trip samples per worker task
+
+TRIP = 'trip'
+TRANSCRIPT = 'transcript'
+
+def file_type(filename):
+    """Returns TRIP or TRANSCRIPT from the magic number of filename."""
+    with open(filename, 'rb') as f:
+        magic = f.read(8)
+    if magic == obd_trip.MAGIC:
+        return TRIP
+    if magic == obd_transcript.MAGIC:
+        return TRANSCRIPT
+    raise ValueError('%s: not a trip or transcript file' % filename)
+
+def summarize_stats(ecu, pid, name, unit, stats):
+    """Returns the summary of one column from its RunningStats.summary()."""
+    summary = {'ecu': ecu, 'pid': pid, 'name': name, 'unit': unit}
+    summary.update(stats)
+    return summary
+
+def trip_tasks(reader, task_samples = TASK_SAMPLES):
+    """Returns lists of column numbers of reader, each list holding about
+    task_samples samples (or one larger column)."""
+    tasks = []
+    columns = []
+    samples = 0
+    for n, chunks in enumerate(reader.chunksOf):
+        columns.append(n)
+        samples += sum(chunk.count for chunk in chunks)
+        if samples >= task_samples:
+            tasks.append(columns)
+            columns = []
+            samples = 0
+    if len(columns) > 0:
+        tasks.append(columns)
+    return tasks
+
+def summarize_trip_columns(filename, columns):
+    """Returns summaries of the given columns of a trip file."""
+    reader = obd_trip.TripReader(filename)
+    summaries = []
+    with open(filename, 'rb') as f:
+        for n in columns:
+            stats = obd_stats.RunningStats()
+            for chunk in reader.chunksOf[n]:
+                stats.extend(reader.read_chunk(f, chunk)[1])
+            summaries.append(summarize_stats(*reader.columns[n], stats.summary()))
+    return summaries
+
+def response_lines(data):
+    """Splits a recorded response into lines, as OBDPort.get_result does."""
+    text = data.decode('utf8', 'ignore').split('>', 1)[0]
+    return [line for line in text.replace('\n', '\r').split('\r') if len(line) > 0]
+
+def add_sensor_values(values, res, pids, sensors):
+    """Decodes a mode $01 response (see data_bytes) to the PIDs requested
+    and adds the numeric values to the RunningStats values[(ecu, pid)]."""
+    for ecu, data in res.items():
+        if data[:1] != ['41']:
+            continue
+        i = 1
+        while i < len(data):
+            pid = int(data[i], 16)
+            if pid not in pids:     #Checksum or padding
+                break
+            sensor = sensors[pid]
+            code = data[i + 1:i + 1 + sensor.length]
+            i += 1 + sensor.length
+            if len(code) < sensor.length or pid in obd_sensors.SUPPORTED_PIDS:
+                continue
+            value = obd_trip.to_number(sensor.value(''.join(code)))
+            if value is not None:
+                if (ecu, pid) not in values:
+                    values[(ecu, pid)] = obd_stats.RunningStats()
+                values[(ecu, pid)].add(value)
+
+def summarize_transcript(filename, sensors = obd_sensors.SENSORS):
+    """Returns the summary of a transcript file, decoding the sensor
+    values, trouble codes and VIN in the recorded responses."""
+    logger = logging.getLogger('PyOBD')
+    reader = obd_transcript.TranscriptReader(filename)
+    prot_is_CAN = False
+    values = {}
+    dtc = {}
+    vin = {}
+    errors = 0
+    duration = 0.0
+    for t, cmd, response_time, response in reader.exchanges():
+        duration = response_time
+        cmd = obd_transcript.ReplaySerial.normalize(cmd).decode('ascii', 'replace')
+        lines = response_lines(response)
+        if len(lines) == 0:
+            continue
+        if cmd.startswith('AT'):
+            if cmd == 'ATDP':
+                prot_is_CAN = lines[0].upper().find('CAN') != -1
+            continue
+        try:
+            res = data_bytes(lines, prot_is_CAN)
+            if cmd[:2] == '01' and len(cmd) > 2:
+                pids = [int(cmd[i:i + 2], 16) for i in range(2, len(cmd), 2)]
+                add_sensor_values(values, res, pids, sensors)
+            elif cmd == GET_DTC_COMMAND or cmd == GET_PENDING_DTC_COMMAND:
+                status = 'Active' if cmd == GET_DTC_COMMAND else 'Passive'
+                for ecu, codes in parse_dtc_data(res, {}, status, prot_is_CAN, logger).items():
+                    seen = dtc.setdefault(ecu, [])
+                    seen += [code for code in codes if code not in seen]
+            elif cmd == GET_VIN_CMD:
+                for ecu in res:
+                    code = decode_vin(res[ecu], prot_is_CAN, logger)
+                    if code != '':
+                        vin[ecu] = code
+        except (IndexError, KeyError, ValueError):
+            errors += 1     #Garbled response
+
+    pids = []
+    for (ecu, pid), stats in sorted(values.items()):
+        sensor = sensors[pid]
+        pids.append(summarize_stats(ecu, pid, sensor.name.strip(), sensor.unit.strip(), stats.summary()))
+    return {'file': filename, 'type': TRANSCRIPT, 'start': reader.wall_start,
+            'duration': duration, 'samples': sum(s.count for s in values.values()),
+            'pids': pids, 'dtc': dtc, 'vin': vin, 'errors': errors}
+
+def summarize_files(filenames, jobs = None, task_samples = TASK_SAMPLES):
+    """Summarizes trip and transcript files in jobs worker processes
+    (one per CPU if None).  Yields one summary dictionary per file, in
+    the order given; a file that cannot be read gets a summary holding
+    only 'file', 'type' and 'error'."""
+    with ProcessPoolExecutor(jobs) as executor:
+        #Submit everything first so the workers stay busy while results
+        #are collected in order.
+        pending = []
+        for filename in filenames:
+            kind = reader = None
+            futures = []
+            error = None
+            try:
+                kind = file_type(filename)
+                if kind == TRIP:
+                    reader = obd_trip.TripReader(filename)
+                    if reader.columnStats is None:
+                        futures = [executor.submit(summarize_trip_columns, filename, columns)
+                                   for columns in trip_tasks(reader, task_samples)]
+                else:
+                    futures = [executor.submit(summarize_transcript, filename)]
+            except (OSError, ValueError) as e:
+                error = e
+            pending.append((filename, kind, reader, futures, error))
+
+        for filename, kind, reader, futures, error in pending:
+            try:
+                if error is not None:
+                    raise error
+                results = [future.result() for future in futures]
+            except Exception as e:  #Includes exceptions raised in the workers
+                yield {'file': filename, 'type': kind, 'error': '%s: %s' % (type(e).__name__, e)}
+                continue
+            if kind == TRANSCRIPT:
+                yield results[0]
+                continue
+            if reader.columnStats is not None:
+                results = [[summarize_stats(*column, stats)
+                            for column, stats in zip(reader.columns, reader.columnStats)]]
+            pids = sorted((s for result in results for s in result),
+                          key = lambda s: (s['ecu'], s['pid']))
+            yield {'file': filename, 'type': TRIP, 'start': reader.wall_start,
+                   'duration': max((c.t_last for c in reader.chunks), default = 0.0),
+                   'samples': sum(s['count'] for s in pids), 'pids': pids,
+                   'dtc': reader.info.get('dtc', {}), 'vin': reader.info.get('vin', {}),
+                   'errors': 0}
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_transcript.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Raw serial transcripts.  Every byte written to and read from the ELM
+# interface is recorded with a timestamp in a compact binary file.
+#
+# File layout (all integers little endian):
+#
+#   header:  magic 'PYOBDTR\0', version (u16), index interval (u16),
+#            wall clock start time (f64, unix seconds)
+#   records: type (u8), time since start in us (u64), length (u16), data
+#
+# Record types are TX (bytes sent), RX (bytes received, coalesced up to
+# the ELM prompt), INDEX and END.  An INDEX record is written after every
+# 'index interval' TX/RX records; its data holds the time and file offset
+# of the first record it covers and the offset of the previous INDEX
+# record.  END is written on close and holds the offset of the last
+# INDEX record, so a reader can seek by time without scanning the file.
+# Files without END (e.g. after a crash) are read by scanning.
+#
+# ReplaySerial plays a transcript back in place of a serial port, so
+# OBDPort can run offline against recorded vehicles.
+#
+############################################################################
+
+import sys
+import time
+import struct
+from bisect import bisect_right
+
+MAGIC = b'PYOBDTR\0'
+VERSION = 1
+
+TX = 1
+RX = 2
+INDEX = 3
+END = 4
+
+RECORD_NAMES = {TX: 'TX', RX: 'RX', INDEX: 'INDEX', END: 'END'}
+
+HEADER = struct.Struct('<8sHHd')
+RECORD = struct.Struct('<BQH')
+INDEX_DATA = struct.Struct('<QQQ')
+END_DATA = struct.Struct('<Q')
+
+INDEX_INTERVAL = 256    #TX/RX records between index blocks
+RX_CHUNK = 4096         #largest RX record
+TRANSCRIPT_BUFFER_SIZE = 1 << 16
+
+class TranscriptWriter:
+    """Appends timestamped records to a transcript file.  Records are
+    buffered; the file is flushed each time an index block is written."""
+
+    def __init__(self, filename, index_interval = INDEX_INTERVAL,
+                 buffer_size = TRANSCRIPT_BUFFER_SIZE):
+        self.file = open(filename, 'wb', buffering = buffer_size)
+        self.filename = filename
+        self.index_interval = index_interval
+        self.start = time.monotonic()
+        self.file.write(HEADER.pack(MAGIC, VERSION, index_interval, time.time()))
+        self.offset = HEADER.size
+        self.count = 0          #records since last index block
+        self.block_time = 0
+        self.block_offset = self.offset
+        self.last_index = 0
+
+    def record(self, kind, data, t = None):
+        if t is None:
+            t = time.monotonic()
+        us = int((t - self.start) * 1000000)
+        if self.count == 0:
+            self.block_time = us
+            self.block_offset = self.offset
+        self.file.write(RECORD.pack(kind, us, len(data)))
+        self.file.write(data)
+        self.offset += RECORD.size + len(data)
+        self.count += 1
+        if self.count >= self.index_interval:
+            self.write_index(us)
+
+    def write_index(self, us):
+        index_offset = self.offset
+        self.file.write(RECORD.pack(INDEX, us, INDEX_DATA.size))
+        self.file.write(INDEX_DATA.pack(self.block_time, self.block_offset, self.last_index))
+        self.offset += RECORD.size + INDEX_DATA.size
+        self.last_index = index_offset
+        self.count = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file is None:
+            return
+        us = int((time.monotonic() - self.start) * 1000000)
+        if self.count > 0:
+            self.write_index(us)
+        self.file.write(RECORD.pack(END, us, END_DATA.size))
+        self.file.write(END_DATA.pack(self.last_index))
+        self.file.close()
+        self.file = None
+
+class TranscriptSerial:
+    """Wraps a serial port and records everything written to and read
+    from it.  Received bytes are coalesced into one RX record per
+    response (up to the '>' prompt) so the per-byte reads done by
+    OBDPort.get_result cost little more than a buffer append."""
+
+    def __init__(self, port, writer):
+        self.port = port
+        self.writer = writer
+        self.rx = bytearray()
+
+    def __getattr__(self, name):
+        return getattr(self.port, name)
+
+    def flush_rx(self):
+        self.writer.record(RX, bytes(self.rx))
+        self.rx.clear()
+
+    def write(self, data):
+        if len(self.rx) > 0:
+            self.flush_rx()
+        self.writer.record(TX, bytes(data))
+        return self.port.write(data)
+
+    def read(self, size = 1):
+        data = self.port.read(size)
+        if len(data) > 0:
+            self.rx += data
+            if data[-1:] == b'>' or len(self.rx) >= RX_CHUNK:
+                self.flush_rx()
+        elif len(self.rx) > 0:  #Timed out part way through a response
+            self.flush_rx()
+        return data
+
+    def close(self):
+        if len(self.rx) > 0:
+            self.flush_rx()
+        self.writer.close()
+        self.port.close()
+
+class TranscriptReader:
+    """Reads a transcript file.  Times are returned in seconds since the
+    recording started; wall_start is the unix time it started."""
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.data = f.read()
+        if len(self.data) < HEADER.size:
+            raise ValueError('%s: not a transcript file' % filename)
+        magic, version, self.index_interval, self.wall_start = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s: not a transcript file' % filename)
+        self.filename = filename
+        self._blocks = None
+
+    def _records(self, offset):
+        data = self.data
+        end = len(data)
+        while offset + RECORD.size <= end:
+            kind, us, length = RECORD.unpack_from(data, offset)
+            start = offset + RECORD.size
+            if start + length > end:  #Truncated record
+                break
+            yield offset, kind, us, data[start:start + length]
+            offset = start + length
+
+    def blocks(self):
+        """Returns list of (time in us, file offset) of the start of each
+        index block, in file order."""
+        if self._blocks is not None:
+            return self._blocks
+        blocks = []
+        tail = len(self.data) - RECORD.size - END_DATA.size
+        kind = None
+        if tail >= HEADER.size:
+            kind, us, length = RECORD.unpack_from(self.data, tail)
+        if kind == END and length == END_DATA.size:
+            index = END_DATA.unpack_from(self.data, tail + RECORD.size)[0]
+            while index != 0:
+                block_time, block_offset, index = INDEX_DATA.unpack_from(self.data,
+                                                        index + RECORD.size)
+                blocks.append((block_time, block_offset))
+            blocks.reverse()
+        else:
+            for offset, kind, us, payload in self._records(HEADER.size):
+                if kind == INDEX:
+                    block_time, block_offset, prev = INDEX_DATA.unpack(payload)
+                    blocks.append((block_time, block_offset))
+        self._blocks = blocks
+        return blocks
+
+    def records(self, start = 0.0):
+        """Yields (type, time, data) for each TX and RX record at or after
+        start seconds."""
+        offset = HEADER.size
+        if start > 0:
+            blocks = self.blocks()
+            i = bisect_right(blocks, (int(start * 1000000), len(self.data))) - 1
+            if i >= 0:
+                offset = blocks[i][1]
+        start_us = start * 1000000
+        for offset, kind, us, payload in self._records(offset):
+            if (kind == TX or kind == RX) and us >= start_us:
+                yield kind, us / 1000000, payload
+
+    def exchanges(self):
+        """Yields (time, command, response time, response) for each TX
+        record and the RX data that followed it."""
+        command = None
+        for kind, t, data in self.records():
+            if kind == TX:
+                if command is not None:
+                    yield command_time, command, response_time, bytes(response)
+                command, command_time = data, t
+                response, response_time = bytearray(), t
+            elif command is not None:
+                response += data
+                response_time = t
+        if command is not None:
+            yield command_time, command, response_time, bytes(response)
+
+class ReplaySerial:
+    """ ReplaySerial stands in for a serial port and answers commands
+    from a recorded transcript.
+
+    In strict mode each command must be the next one in the recording;
+    a command that is not is recorded in mismatches and gets no response
+    (it times out as an unplugged interface would).  Otherwise the next
+    recorded exchange is used when the command matches it, and any other
+    command is answered by looking it up: repeated commands cycle
+    through the responses recorded for them, and unknown commands get
+    'NO DATA'.
+
+    speed None answers immediately.  Otherwise each response is delayed
+    by the recorded response time divided by speed, e.g. speed 1 replays
+    the interface at its real pace and speed 10 ten times faster."""
+
+    NO_DATA = b'NO DATA\r\r>'
+
+    def __init__(self, reader, speed = None, strict = False):
+        if not isinstance(reader, TranscriptReader):
+            reader = TranscriptReader(reader)
+        self.portstr = reader.filename
+        self.speed = speed
+        self.strict = strict
+        self.exchanges = []
+        self.lookup = {}
+        for t, cmd, rt, response in reader.exchanges():
+            cmd = self.normalize(cmd)
+            self.exchanges.append((cmd, rt - t, response))
+            self.lookup.setdefault(cmd, []).append(len(self.exchanges) - 1)
+        self.next = 0           #next exchange in recorded order
+        self.cycle = {}         #command -> times answered by lookup
+        self.mismatches = []    #(position, expected command, command)
+        self.lookups = 0
+        self.response = memoryview(b'')
+        self.ready = 0.0
+        self.is_open = True
+
+    @staticmethod
+    def normalize(cmd):
+        return bytes(cmd).strip().upper().replace(b' ', b'')
+
+    def answer(self, cmd):
+        if self.next < len(self.exchanges) and self.exchanges[self.next][0] == cmd:
+            self.next += 1
+            return self.exchanges[self.next - 1]
+        expected = self.exchanges[self.next][0] if self.next < len(self.exchanges) else None
+        self.mismatches.append((self.next, expected, cmd))
+        if self.strict:
+            return None
+        self.lookups += 1
+        found = self.lookup.get(cmd)
+        if found is None:
+            return (cmd, 0.0, self.NO_DATA)
+        n = self.cycle.get(cmd, 0)
+        self.cycle[cmd] = n + 1
+        return self.exchanges[found[n % len(found)]]
+
+    def write(self, data):
+        exchange = self.answer(self.normalize(data))
+        if exchange is None:
+            self.response = memoryview(b'')
+            return len(data)
+        self.response = memoryview(exchange[2])
+        if self.speed:
+            self.ready = time.monotonic() + exchange[1] / self.speed
+        return len(data)
+
+    def read(self, size = 1):
+        if self.speed and len(self.response) > 0:
+            delay = self.ready - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        data = self.response[:size]
+        self.response = self.response[size:]
+        return bytes(data)
+
+    def flush(self):
+        pass
+
+    def flushInput(self):
+        self.response = memoryview(b'')
+
+    def flushOutput(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    def finished(self):
+        """True if every recorded exchange was replayed in order."""
+        return self.next == len(self.exchanges) and len(self.mismatches) == 0
+
+def main(argv = None):
+    """Prints a transcript file in readable form."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) != 1:
+        print('usage: python3 -m pyobd_beardedone55.obd_transcript FILE', file=sys.stderr)
+        sys.exit(2)
+    reader = TranscriptReader(argv[0])
+    for kind, t, data in reader.records():
+        text = data.decode('ascii', 'replace').replace('\r', '\\r').replace('\n', '\\n')
+        print('%10.6f %s %s' % (t, RECORD_NAMES[kind], text))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_trigger.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Triggers watch live sensor results for an event and capture the
+# samples around it.  When a trigger fires, the last 'pre' seconds of
+# the involved PIDs are copied from the live history (obd_history), the
+# poller requests only those PIDs for 'post' seconds, and then both
+# parts are written to a trip file (see obd_trip) in the capture
+# directory, with the trigger described in the file's info.  Files are
+# compressed and written on a thread of their own, so polling goes on
+# while a capture is saved.
+#
+# Triggers are given as text, one per trigger:
+#
+#   [ECU:]PID>LEVEL       value rises above LEVEL, e.g. 0C>4000
+#   [ECU:]PID<LEVEL       value falls below LEVEL, e.g. 7E8:05<70
+#   rate:[ECU:]PID>RATE   value changes faster than RATE per second,
+#   rate:[ECU:]PID<RATE   or slower (e.g. rate:0D<-5 for hard braking)
+#   dtc[:ECU]             MIL or number of stored DTCs changes
+#
+# PIDs are hex, as on the Live Data tab; no ECU means any ECU.  Level
+# triggers fire when the value crosses the level, not while it stays
+# beyond it.  dtc triggers request PID $01 every DTC_INTERVAL seconds.
+#
+############################################################################
+
+import os
+import time
+import logging
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from .obd_trip import TripWriter, to_number, TRIP_EXTENSION
+from .obd_sensors import SENSORS
+from .obd2_tests import ptest
+
+TRIGGER_PRE = 10.0      #seconds of history kept from before a trigger
+TRIGGER_POST = 10.0     #seconds captured at full rate after it
+DTC_INTERVAL = 1.0      #seconds between PID $01 requests for dtc triggers
+MONITOR_STATUS_PID = 0x01
+
+class LevelTrigger:
+    """Fires when the value of pid crosses level, upwards if rising is
+    True, otherwise downwards.  With rate True the rate of change per
+    second between consecutive samples is compared instead."""
+
+    def __init__(self, ecu, pid, level, rising = True, rate = False):
+        self.ecu = ecu
+        self.pid = pid
+        self.level = level
+        self.rising = rising
+        self.rate = rate
+        self.beyond = {}    #ECU -> was last value beyond level
+        self.previous = {}  #ECU -> (time, value) for rate triggers
+
+    def __str__(self):
+        return '%s%s%02X%s%g' % ('rate:' if self.rate else '', '' if self.ecu is None else self.ecu + ':',
+                                 self.pid, '>' if self.rising else '<', self.level)
+
+    def check(self, ecu, value, t):
+        """Returns description of the event if the trigger fires."""
+        value = to_number(value)
+        if value is None:
+            return None
+        if self.rate:
+            previous = self.previous.get(ecu)
+            self.previous[ecu] = (t, value)
+            if previous is None or t <= previous[0]:
+                return None
+            value = (value - previous[1]) / (t - previous[0])
+        beyond = value > self.level if self.rising else value < self.level
+        was = self.beyond.get(ecu)
+        self.beyond[ecu] = beyond
+        if beyond and was is False:
+            return '%s: %g' % (self, value)
+        return None
+
+class DtcTrigger:
+    """Fires when the MIL or the number of stored DTCs reported in PID
+    $01 changes."""
+
+    pid = MONITOR_STATUS_PID
+    rate = False
+
+    def __init__(self, ecu = None):
+        self.ecu = ecu
+        self.status = {}    #ECU -> (DTC count, MIL)
+
+    def __str__(self):
+        return 'dtc' if self.ecu is None else 'dtc:' + self.ecu
+
+    def check(self, ecu, value, t):
+        if not isinstance(value, dict):
+            return None
+        status = (value[ptest[0]], value[ptest[1]])
+        was = self.status.get(ecu)
+        self.status[ecu] = status
+        if was is not None and status != was:
+            return '%s: %s DTCs %d -> %d, MIL %s -> %s' % (self, ecu, was[0], status[0],
+                        'on' if was[1] else 'off', 'on' if status[1] else 'off')
+        return None
+
+def parse_trigger(text):
+    """Returns trigger described by text (see above).  Raises ValueError
+    if it is not understood."""
+    spec = text.strip()
+    if spec.lower() == 'dtc':
+        return DtcTrigger()
+    if spec.lower().startswith('dtc:'):
+        return DtcTrigger(spec[4:].strip().upper())
+    rate = spec.lower().startswith('rate:')
+    if rate:
+        spec = spec[5:]
+    for op in '<>':
+        if op in spec:
+            key, level = spec.split(op, 1)
+            break
+    else:
+        raise ValueError('trigger needs < or >: %s' % text)
+    key = key.strip().upper().split(':')
+    if len(key) > 2:
+        raise ValueError('bad trigger: %s' % text)
+    ecu = key[0] if len(key) == 2 else None
+    try:
+        pid = int(key[-1].lstrip('$'), 16)
+        level = float(level)
+    except ValueError:
+        raise ValueError('bad trigger: %s' % text)
+    return LevelTrigger(ecu, pid, level, op == '>', rate)
+
+class Capture:
+    """A fired trigger: the pre-trigger samples, frozen when it fired,
+    and the PIDs polled at full rate until end."""
+
+    def __init__(self, description, ecu, pids, t, pre, post, history):
+        self.description = description
+        self.ecu = ecu
+        self.pids = tuple(pids)
+        self.time = t
+        self.wall = time.time() - (time.monotonic() - t)
+        self.pre = pre
+        self.end = t + post
+        self.samples = {}
+        for pid in self.pids:
+            times, values = history.window(ecu, pid, t - pre, t)
+            self.samples[pid] = (array('d', times), array('d', values))
+
+    def collect(self, history):
+        """Adds the samples recorded since the trigger fired to the frozen
+        ones, so the capture no longer needs history."""
+        for pid in self.pids:
+            times, values = self.samples[pid]
+            postTimes, postValues = history.window(self.ecu, pid, self.time, self.end)
+            #A sample at the trigger time is already in the frozen part
+            skip = 1 if len(postTimes) > 0 and len(times) > 0 and postTimes[0] <= times[-1] else 0
+            times.extend(postTimes[skip:])
+            values.extend(postValues[skip:])
+
+    def write(self, filename):
+        """Writes the collected samples to trip file filename.  Times in
+        the file start pre seconds before the trigger."""
+        start = self.time - self.pre
+        writer = TripWriter(filename, wall_start = self.wall - self.pre)
+        writer.info = {'trigger': self.description, 'ecu': self.ecu,
+                       'trigger_time': self.pre, 'post': self.end - self.time}
+        count = 0
+        for pid in self.pids:
+            times, values = self.samples[pid]
+            if len(times) > 0:
+                sensor = SENSORS[pid]
+                writer.add_column(self.ecu, pid, [t - start for t in times], values,
+                                  sensor.name, sensor.unit)
+                count += len(times)
+        writer.close()
+        return count
+
+class Triggers:
+    """ Triggers checks sensor results against a list of triggers and
+    runs one capture at a time.  The poller calls check() with every
+    get_sensors() result after adding it to history, and asks request()
+    what to poll: while a capture runs it returns the capture's ECU and
+    PIDs, which should be polled instead of the normal schedule.
+
+    The PIDs captured are capture_pids if given, otherwise the PID of
+    the trigger; a dtc trigger with no capture_pids captures every PID
+    of the ECU that has history.
+
+    Finished captures are written by a worker thread; written lists the
+    files as they are completed."""
+
+    def __init__(self, history, triggers, directory = '.', pre = TRIGGER_PRE,
+                 post = TRIGGER_POST, capture_pids = ()):
+        self.history = history
+        self.triggers = list(triggers)
+        self.directory = directory
+        self.pre = pre
+        self.post = post
+        self.capture_pids = list(capture_pids)
+        self.capture = None
+        self.captured = 0       #captures finished, written or not
+        self.written = []       #file names of captures written
+        self.writer = ThreadPoolExecutor(max_workers = 1)
+        self.lastStatus = {}    #ECU -> time PID $01 was last requested
+        self.logger = logging.getLogger('PyOBD')
+
+    def check(self, ecu, results, t):
+        """Checks a get_sensors() result from ecu, received at time t
+        (time.monotonic()).  Returns the capture started, if any."""
+        started = None
+        for trigger in self.triggers:
+            if trigger.ecu is not None and trigger.ecu != ecu:
+                continue
+            result = results.get(trigger.pid)
+            if result is None:
+                continue
+            if trigger.pid == MONITOR_STATUS_PID:
+                self.lastStatus[ecu] = t
+            fired = trigger.check(ecu, result[1], t)
+            if fired is not None and self.capture is None:
+                started = self.start(fired, trigger, ecu, t)
+        return started
+
+    def start(self, description, trigger, ecu, t):
+        pids = self.capture_pids
+        if len(pids) == 0:
+            if trigger.pid != MONITOR_STATUS_PID:
+                pids = [trigger.pid]
+            else:
+                pids = sorted(pid for e, pid in self.history.keys() if e == ecu)
+        self.capture = Capture(description, ecu, pids, t, self.pre, self.post, self.history)
+        self.logger.info('Trigger %s, capturing %s $%s', description, ecu,
+                         ',$'.join('%02X' % pid for pid in pids))
+        return self.capture
+
+    def request(self, ecus, t):
+        """Returns (ecu, pids) to poll now instead of the normal schedule,
+        or None.  Finishes a capture whose time is up."""
+        capture = self.capture
+        if capture is not None:
+            if t < capture.end and len(capture.pids) > 0:
+                return capture.ecu, capture.pids
+            self.finish()
+        #PID $01 for dtc triggers, at most every DTC_INTERVAL seconds
+        for trigger in self.triggers:
+            if trigger.pid != MONITOR_STATUS_PID:
+                continue
+            for ecu in ecus:
+                if (trigger.ecu is None or trigger.ecu == ecu) and \
+                        t - self.lastStatus.get(ecu, 0.0) >= DTC_INTERVAL:
+                    self.lastStatus[ecu] = t
+                    return ecu, (MONITOR_STATUS_PID,)
+        return None
+
+    def timeout(self, ecus, t):
+        """Returns seconds from time t until request() has PID $01 of one
+        of ecus to poll for a dtc trigger, or None without dtc triggers.
+        A poller with nothing else to do should sleep no longer."""
+        due = None
+        for trigger in self.triggers:
+            if trigger.pid != MONITOR_STATUS_PID:
+                continue
+            for ecu in ecus:
+                if trigger.ecu is None or trigger.ecu == ecu:
+                    wait = self.lastStatus.get(ecu, 0.0) + DTC_INTERVAL - t
+                    if due is None or wait < due:
+                        due = wait
+        return None if due is None else max(due, 0.0)
+
+    def capturing(self):
+        return self.capture is not None
+
+    def finish(self):
+        """Ends the capture in progress, if any, and queues it to be
+        written.  Returns the file name it will be written to."""
+        capture = self.capture
+        if capture is None:
+            return None
+        self.capture = None
+        self.captured += 1
+        capture.collect(self.history)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(capture.wall))
+        filename = os.path.join(self.directory, 'capture-%s-%s%s' % (stamp, capture.ecu, TRIP_EXTENSION))
+        self.writer.submit(self.write, capture, filename)
+        return filename
+
+    def write(self, capture, filename):
+        """Writes a finished capture; runs on the writer thread."""
+        try:
+            count = capture.write(filename)
+        except OSError as e:
+            self.logger.error('Error writing capture %s: %s', filename, str(e))
+            return
+        self.written.append(filename)
+        self.logger.info('Capture of %s written to %s (%d samples)', capture.description, filename, count)
+
+    def close(self, wait = False):
+        """Ends the capture in progress.  Unless wait is True, captures
+        still being written are finished in the background."""
+        self.finish()
+        self.writer.shutdown(wait = wait)
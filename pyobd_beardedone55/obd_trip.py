@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# obd_trip.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+#
+# Trip files hold numeric sensor values in columns, one column per ECU
+# and PID.  Each column is cut into chunks of up to chunk_size samples;
+# a chunk stores the timestamps (f64 seconds since the trip started)
+# followed by the values (f64), optionally compressed with zlib or lzma.
+#
+# File layout (all integers little endian):
+#
+#   header:  magic 'PYOBDTRP', version (u16), chunk size (u32),
+#            wall clock start time (f64, unix seconds)
+#   chunks:  each starts on an 8 byte boundary
+#   footer:  length of column table (u32), column table, per column
+#            statistics (see obd_stats) and trip information such as
+#            VIN and DTCs (JSON), one index entry per chunk (see
+#            CHUNK_ENTRY)
+#   trailer: footer offset (u64), number of chunks (u32), 'PYOBDEND'
+#
+# An index entry holds the column number, codec, sample count, offset,
+# stored and raw length, first and last timestamp, and min, max and sum
+# of the values, so time ranges and simple statistics are found from the
+# footer alone.
+#
+# MappedTripReader (requires NumPy) memory-maps a trip file and returns
+# columns as NumPy arrays; chunks that are not compressed are returned as
+# views of the mapping without copying.  unpack_trip() rewrites a trip
+# uncompressed with one chunk per column, so whole columns map directly.
+#
+############################################################################
+
+import json
+import lzma
+import mmap
+import time
+import zlib
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from . import obd_stats
+
+numpy = None    #Imported by MappedTripReader on first use; it is slow to load
+
+MAGIC = b'PYOBDTRP'
+END_MAGIC = b'PYOBDEND'
+VERSION = 1
+TRIP_EXTENSION = '.trip'
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODECS = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'lzma': CODEC_LZMA}
+
+HEADER = struct.Struct('<8sHxxId')
+CHUNK_ENTRY = struct.Struct('<HBxIQIIddddd')
+TRAILER = struct.Struct('<QI8s')
+
+CHUNK_SIZE = 4096   #samples per chunk
+#Largest chunk, so counts and sizes (16 bytes a sample) fit the u32
+#fields of CHUNK_ENTRY whatever the codec
+MAX_CHUNK_SIZE = 1 << 24
+
+def compress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data)
+    if codec == CODEC_LZMA:
+        return lzma.compress(data)
+    return data
+
+def decompress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_LZMA:
+        return lzma.decompress(data)
+    return bytes(data)
+
+def to_number(value):
+    """Returns value as float, or None if it is not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class Chunk:
+    """Index entry of one chunk."""
+    __slots__ = ('column', 'codec', 'count', 'offset', 'stored', 'raw',
+                 't_first', 't_last', 'v_min', 'v_max', 'v_sum')
+
+    def __init__(self, *fields):
+        (self.column, self.codec, self.count, self.offset, self.stored, self.raw,
+         self.t_first, self.t_last, self.v_min, self.v_max, self.v_sum) = fields
+
+    def pack(self):
+        return CHUNK_ENTRY.pack(self.column, self.codec, self.count, self.offset,
+                                self.stored, self.raw, self.t_first, self.t_last,
+                                self.v_min, self.v_max, self.v_sum)
+
+class TripWriter:
+    """ TripWriter records numeric sensor values to a trip file.  Values
+    are buffered per column and written a chunk at a time; close() must
+    be called to write the footer."""
+
+    def __init__(self, filename, codec = 'zlib', chunk_size = CHUNK_SIZE, wall_start = None):
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError('chunk size must be 1 to %d samples' % MAX_CHUNK_SIZE)
+        self.codec = CODECS[codec]
+        self.chunk_size = chunk_size
+        self.file = open(filename, 'wb')
+        self.filename = filename
+        self.start = time.monotonic()
+        self.wall_start = time.time() if wall_start is None else wall_start
+        self.file.write(HEADER.pack(MAGIC, VERSION, chunk_size, self.wall_start))
+        self.offset = HEADER.size
+        self.columns = []       #[ecu, pid, name, unit]
+        self.columnOf = {}      #(ecu, pid) -> column number
+        self.times = []         #per column array of pending timestamps
+        self.values = []        #per column array of pending values
+        self.chunks = []
+        self.samples = 0
+        #Exact count, min, max, mean and variance per column, merged as
+        #chunks are written.  Percentiles are too costly to estimate for
+        #every sample here; close() takes them from quantiles, if set.
+        self.stats = obd_stats.Stats(quantiles = ())
+        self.quantiles = None   #obd_stats.Stats kept by the caller, or None
+        self.info = {}          #written to the footer, e.g. by add_vehicle_info()
+
+    def column(self, ecu, pid, name = '', unit = ''):
+        key = (ecu, pid)
+        n = self.columnOf.get(key)
+        if n is None:
+            n = len(self.columns)
+            self.columns.append([ecu, pid, name.strip(), unit.strip()])
+            self.columnOf[key] = n
+            self.times.append(array('d'))
+            self.values.append(array('d'))
+        return n
+
+    def add(self, ecu, pid, value, t = None, name = '', unit = ''):
+        """Adds one value.  t is a time.monotonic() reading (now if None)."""
+        if t is None:
+            t = time.monotonic()
+        n = self.column(ecu, pid, name, unit)
+        times = self.times[n]
+        times.append(t - self.start)
+        self.values[n].append(value)
+        self.samples += 1
+        if len(times) >= self.chunk_size:
+            self.write_chunk(n)
+
+    def add_column(self, ecu, pid, times, values, name = '', unit = ''):
+        """Adds a whole column, written as chunks of up to chunk_size
+        samples.  times are seconds since the trip started."""
+        n = self.column(ecu, pid, name, unit)
+        self.times[n].extend(times)
+        self.values[n].extend(values)
+        self.samples += len(times)
+        while len(self.times[n]) > 0:
+            self.write_chunk(n)
+
+    def add_results(self, ecu, results, t = None):
+        """Adds the numeric values of a get_sensors() result.  Returns the
+        number of values added."""
+        if t is None:
+            t = time.monotonic()
+        count = 0
+        for pid, (name, value, unit) in results.items():
+            value = to_number(value)
+            if value is not None:
+                self.add(ecu, pid, value, t, name, unit)
+                count += 1
+        return count
+
+    def add_vehicle_info(self, port, ecus = None):
+        """Reads the VIN of each ECU (all ECUs if None) and the stored
+        and pending trouble codes from port, and stores them in info."""
+        if ecus is None:
+            ecus = port.ecu_addresses
+        self.info['vin'] = {ecu: port.get_vin(ecu) for ecu in ecus}
+        dtc = port.get_dtc()
+        if dtc is not None:
+            self.info['dtc'] = dtc
+
+    def write_chunk(self, n):
+        """Writes up to chunk_size pending samples of column n."""
+        times = self.times[n]
+        values = self.values[n]
+        if len(times) > self.chunk_size:
+            self.times[n] = times[self.chunk_size:]
+            self.values[n] = values[self.chunk_size:]
+            times = times[:self.chunk_size]
+            values = values[:self.chunk_size]
+        else:
+            self.times[n] = array('d')
+            self.values[n] = array('d')
+        self.stats.extend(*self.columns[n][:2], values)
+        raw = times.tobytes() + values.tobytes()
+        data = compress(self.codec, raw)
+        pad = -self.offset % 8
+        if pad:
+            self.file.write(bytes(pad))
+            self.offset += pad
+        self.chunks.append(Chunk(n, self.codec, len(times), self.offset, len(data), len(raw),
+                                 times[0], times[-1], min(values), max(values), sum(values)))
+        self.file.write(data)
+        self.offset += len(data)
+
+    def close(self):
+        if self.file is None:
+            return
+        for n in range(len(self.columns)):
+            if len(self.times[n]) > 0:
+                self.write_chunk(n)
+        stats = []
+        for ecu, pid, name, unit in self.columns:
+            column = self.stats.get(ecu, pid)
+            if column is None:
+                stats.append({'count': 0})
+                continue
+            summary = column.summary()
+            del summary['percentiles']
+            live = None if self.quantiles is None else self.quantiles.get(ecu, pid)
+            if live is not None and live.count > 0:
+                summary['percentiles'] = live.percentiles()
+            stats.append(summary)
+        table = json.dumps({'columns': self.columns, 'stats': stats, 'info': self.info}).encode()
+        footer = self.offset
+        self.file.write(struct.pack('<I', len(table)))
+        self.file.write(table)
+        for chunk in self.chunks:
+            self.file.write(chunk.pack())
+        self.file.write(TRAILER.pack(footer, len(self.chunks), END_MAGIC))
+        self.file.close()
+        self.file = None
+
+class TripReader:
+    """ TripReader reads the footer of a trip file and returns columns,
+    or parts of them, as arrays of timestamps and values.  Only the
+    chunks overlapping the requested time range are read."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError('%s: not a trip file' % filename)
+            magic, version, self.chunk_size, self.wall_start = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('%s: not a trip file' % filename)
+            f.seek(-TRAILER.size, 2)
+            footer, count, end = TRAILER.unpack(f.read(TRAILER.size))
+            if end != END_MAGIC:
+                raise ValueError('%s: trip file was not closed' % filename)
+            f.seek(footer)
+            length = struct.unpack('<I', f.read(4))[0]
+            table = json.loads(f.read(length).decode())
+            entries = f.read(CHUNK_ENTRY.size * count)
+        self.columns = [tuple(c) for c in table['columns']]
+        self.info = table.get('info', {})
+        #Per column summaries (see RunningStats.summary()), None if the
+        #file was written before they were kept.  'percentiles' is only
+        #present if the writer was given live statistics (quantiles).
+        self.columnStats = table.get('stats')
+        if self.columnStats is not None:
+            for stats in self.columnStats:
+                if 'percentiles' in stats:  #JSON keys are strings
+                    stats['percentiles'] = {int(p): v for p, v in stats['percentiles'].items()}
+        self.columnOf = {(c[0], c[1]): n for n, c in enumerate(self.columns)}
+        self.chunks = [Chunk(*CHUNK_ENTRY.unpack_from(entries, i * CHUNK_ENTRY.size))
+                       for i in range(count)]
+        self.chunksOf = [[] for c in self.columns]
+        for chunk in self.chunks:
+            self.chunksOf[chunk.column].append(chunk)
+
+    def pids(self, ecu = None):
+        """Returns list of (ecu, pid) recorded."""
+        return [(c[0], c[1]) for c in self.columns if ecu is None or c[0] == ecu]
+
+    def select(self, ecu, pid, start = None, end = None):
+        """Returns index entries of the chunks of a column that overlap
+        start..end (seconds since trip start, None is open ended)."""
+        n = self.columnOf.get((ecu, pid))
+        if n is None:
+            return []
+        return [chunk for chunk in self.chunksOf[n]
+                if (start is None or chunk.t_last >= start) and
+                   (end is None or chunk.t_first <= end)]
+
+    def read_chunk(self, f, chunk):
+        """Returns (times, values) arrays of one chunk."""
+        f.seek(chunk.offset)
+        raw = decompress(chunk.codec, f.read(chunk.stored))
+        times = array('d')
+        times.frombytes(raw[:chunk.count * 8])
+        values = array('d')
+        values.frombytes(raw[chunk.count * 8:])
+        return times, values
+
+    def read(self, ecu, pid, start = None, end = None):
+        """Returns (times, values) arrays for a column, limited to
+        start..end seconds since the trip started."""
+        times = array('d')
+        values = array('d')
+        with open(self.filename, 'rb') as f:
+            for chunk in self.select(ecu, pid, start, end):
+                t, v = self.read_chunk(f, chunk)
+                #Timestamps are in order within a chunk
+                first = 0 if start is None else bisect_left(t, start)
+                last = len(t) if end is None else bisect_right(t, end)
+                times.extend(t[first:last])
+                values.extend(v[first:last])
+        return times, values
+
+    def stats(self, ecu, pid):
+        """Returns (count, min, max, mean) of a column from the index."""
+        chunks = self.select(ecu, pid)
+        count = sum(c.count for c in chunks)
+        if count == 0:
+            return (0, None, None, None)
+        return (count, min(c.v_min for c in chunks), max(c.v_max for c in chunks),
+                sum(c.v_sum for c in chunks) / count)
+
+class MappedTripReader(TripReader):
+    """ MappedTripReader returns columns of a trip file as NumPy arrays.
+    Opening reads only the footer.  Uncompressed chunks are views into a
+    read-only memory map of the file; compressed chunks are decompressed
+    when read and the arrays are views of the decompressed data."""
+
+    def __init__(self, filename):
+        global numpy
+        if numpy is None:
+            import numpy
+        super().__init__(filename)
+        self.file = open(filename, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+    def close(self):
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass    #Arrays still refer to it; unmapped when they are freed
+            self.file.close()
+            self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def chunk_arrays(self, chunk):
+        """Returns (times, values) NumPy arrays of one chunk."""
+        if chunk.codec == CODEC_NONE:
+            buf, offset = self.map, chunk.offset
+        else:
+            buf, offset = decompress(chunk.codec, self.map[chunk.offset:chunk.offset + chunk.stored]), 0
+        times = numpy.frombuffer(buf, '<f8', chunk.count, offset)
+        values = numpy.frombuffer(buf, '<f8', chunk.count, offset + chunk.count * 8)
+        return times, values
+
+    def arrays(self, ecu, pid, start = None, end = None):
+        """Returns (times, values) NumPy arrays for a column, limited to
+        start..end seconds since the trip started.  The arrays are views
+        when the range lies within one uncompressed chunk; otherwise the
+        chunks are joined into new arrays."""
+        times = []
+        values = []
+        for chunk in self.select(ecu, pid, start, end):
+            t, v = self.chunk_arrays(chunk)
+            first = 0 if start is None else numpy.searchsorted(t, start, 'left')
+            last = len(t) if end is None else numpy.searchsorted(t, end, 'right')
+            times.append(t[first:last])
+            values.append(v[first:last])
+        if len(times) == 0:
+            return numpy.empty(0), numpy.empty(0)
+        if len(times) == 1:
+            return times[0], values[0]
+        return numpy.concatenate(times), numpy.concatenate(values)
+
+def unpack_trip(source, dest):
+    """Rewrites trip file source to dest uncompressed, with each column
+    stored as a single chunk (of up to MAX_CHUNK_SIZE samples) so
+    MappedTripReader can map it whole."""
+    reader = TripReader(source)
+    writer = TripWriter(dest, 'none', MAX_CHUNK_SIZE, reader.wall_start)
+    writer.info = reader.info
+    for ecu, pid, name, unit in reader.columns:
+        times, values = reader.read(ecu, pid)
+        writer.add_column(ecu, pid, times, values, name, unit)
+    writer.close()
@@ -44,6 +44,7 @@
 #   May 11, 2019
 #   May 23, 2019
 #   May 26, 2019
+#   October 19, 2026
 #
 # For a complete history, see https://github.com/beardedone55/pyobd
 ############################################################################
@@ -60,12 +61,23 @@ import serial
 from serial.tools import list_ports
 import platform
 import time
+import math
 import configparser #safe application configuration
 import webbrowser #open browser from python
 import logging
-
-from .obd2_codes import pcodes
-from .obd2_codes import ptest
+import collections
+import functools
+import threading
+from array import array
+
+from .obd2_codes import dtc_store
+from .obd2_tests import ptest
+from . import obd_logging
+from . import obd_trip
+from . import obd_history
+from . import obd_trigger
+from . import obd_stats
+from . import obd_histogram
 
 ID_ABOUT  = 101
 ID_EXIT   = 110
@@ -82,14 +94,22 @@ ID_HELP_ABOUT = 508
 ID_HELP_VISIT = 509
 ID_HELP_ORDER = 510
 
+DISPLAY_REFRESH_HZ = 30 #Rate at which live sensor values are drawn
+PLOT_REFRESH_HZ = 5 #Rate at which the plot is redrawn while it is shown
+STATS_REFRESH_HZ = 2 #Rate at which statistics are redrawn while they are shown
+MAP_REFRESH_HZ = 1 #Rate at which operating maps are redrawn while they are shown
+BACKGROUND_JOB_INTERVAL = 10 #Sensor requests between background jobs
+
 class MyApp(QApplication):
 
     StatusEvent = pyqtSignal(list)
-    ResultEvent = pyqtSignal(str,int, int, str)
-    TestEvent = pyqtSignal(list)
+    TestEvent = pyqtSignal(dict)
     DTCEvent = pyqtSignal(list)
     DTCClearEvent = pyqtSignal(int)
+    DTCReadEvent = pyqtSignal(object)
+    DTCClearedEvent = pyqtSignal()
     SensorProducerReady = pyqtSignal()
+    EcuSupportedEvent = pyqtSignal(str, str)
 
     def __init__(self, myArgs):
         super().__init__(myArgs)
@@ -134,69 +154,132 @@ class MyApp(QApplication):
 
             self.sortItems(column, header.sortIndicatorOrder())
 
-    class SensorList(MyListCtrl):
+    class SensorTableModel(QAbstractTableModel):
+        """Table model for the live data of one ECU.  Rows are kept in
+        compact per-ECU arrays; sensor metadata is looked up in
+        obd_sensors.SENSORS by PID."""
+
+        ACTIVE_COLUMN = 0
+        PID_COLUMN = 1
+        SENSOR_COLUMN = 2
+        VALUE_COLUMN = 3
+        HEADERS = ['Active', 'PID', 'Sensor', 'Value']
+
+        def __init__(self, pids, checkBoxClear, checkBoxFull):
+            super().__init__()
+            self.pids = array('B', pids)
+            self.values = [''] * len(self.pids)
+            self.active = bytearray(len(self.pids))
+            self.rowOf = array('h', [-1] * 256)
+            self.updateRowLookup()
+            self.checkBoxes = (checkBoxClear, checkBoxFull)
+
+        def updateRowLookup(self):
+            for row, pid in enumerate(self.pids):
+                self.rowOf[pid] = row
+
+        def rowCount(self, parent=QModelIndex()):
+            return 0 if parent.isValid() else len(self.pids)
+
+        def columnCount(self, parent=QModelIndex()):
+            return 0 if parent.isValid() else len(self.HEADERS)
+
+        def headerData(self, section, orientation, role=Qt.DisplayRole):
+            if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+                return self.HEADERS[section]
+            return None
 
-        SENSOR_OFF = '1'
-        SENSOR_ON = '0'
+        def data(self, index, role=Qt.DisplayRole):
+            row = index.row()
+            column = index.column()
+            if role == Qt.DisplayRole:
+                if column == self.PID_COLUMN:
+                    return '$%02X' % self.pids[row]
+                elif column == self.SENSOR_COLUMN:
+                    return obd_io.obd_sensors.SENSORS[self.pids[row]].name
+                elif column == self.VALUE_COLUMN:
+                    return self.values[row]
+            elif role == Qt.DecorationRole:
+                if column == self.ACTIVE_COLUMN:
+                    return self.checkBoxes[self.active[row]]
+            elif role == Qt.TextAlignmentRole:
+                if column == self.SENSOR_COLUMN:
+                    return Qt.AlignRight | Qt.AlignVCenter
+                return Qt.AlignHCenter | Qt.AlignVCenter
+            return None
 
-        def __init__(self, ecu):
+        def sort(self, column, order=Qt.AscendingOrder):
+            if column == self.ACTIVE_COLUMN:
+                key = lambda row: (not self.active[row], self.pids[row])
+            elif column == self.SENSOR_COLUMN:
+                #By the displayed text, as the list sorted before the model
+                key = lambda row: obd_io.obd_sensors.SENSORS[self.pids[row]].name
+            elif column == self.VALUE_COLUMN:
+                key = lambda row: self.values[row]
+            else:
+                key = lambda row: self.pids[row]
+
+            self.layoutAboutToBeChanged.emit()
+            rows = sorted(range(len(self.pids)), key=key, reverse=(order == Qt.DescendingOrder))
+            self.pids = array('B', (self.pids[row] for row in rows))
+            self.values = [self.values[row] for row in rows]
+            self.active = bytearray(self.active[row] for row in rows)
+            self.updateRowLookup()
+            self.layoutChanged.emit()
+
+        def toggleActive(self, row):
+            self.active[row] ^= 1
+            index = self.index(row, self.ACTIVE_COLUMN)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+            return self.active[row]
+
+        def setValues(self, values):
+            """Update values from dictionary keyed by PID.  One ranged
+            dataChanged signal is emitted for the whole batch."""
+            firstRow = len(self.pids)
+            lastRow = -1
+            for pid, value in values.items():
+                row = self.rowOf[pid]
+                if row < 0:
+                    continue
+                self.values[row] = value
+                firstRow = min(firstRow, row)
+                lastRow = max(lastRow, row)
+
+            if lastRow >= 0:
+                self.dataChanged.emit(self.index(firstRow, self.VALUE_COLUMN),
+                                      self.index(lastRow, self.VALUE_COLUMN),
+                                      [Qt.DisplayRole])
+
+    class SensorList(QTableView):
+        def __init__(self, ecu, pids):
             super().__init__()
-            self.pid_lookup = {}
             self.senprod = None
             self.ecu = ecu
             icon_path = os.path.dirname(__file__) + '/icons_gpl'
-            self.checkBoxClear = QPixmap(icon_path + '/Checkbox-Empty-icon.png')
-            self.checkBoxFull = QPixmap(icon_path + '/Checkbox-Full-icon.png')
-            self.checkBoxes = {}
-
-        def addTableRow(self, rowSize, data):
-            super().addTableRow(rowSize, data, alignment=Qt.AlignHCenter)
-            pid = data[self.pid_column]
-            newRowNum = self.rowCount() - 1
-            self.pid_lookup[pid] = newRowNum
-            checkbox = QLabel()
-            checkbox.setAlignment(Qt.AlignCenter)
-            self.setCellWidget(newRowNum,self.active_column,checkbox)
-            checkbox.setPixmap(self.checkBoxClear)
-            self.item(newRowNum,self.last_column).setText(str(self.SENSOR_OFF))
-            self.checkBoxes[int(pid)] = checkbox
-
-        def setColumnCount(self, columns, pid_column, active_column = 0):
-            super().setColumnCount(columns+1)
-            self.pid_column = pid_column
-            self.active_column = active_column
-            self.last_column = columns
-            self.setColumnHidden(pid_column, True)
-            #last column will be used to sort by 'Active'
-            self.setColumnHidden(self.last_column, True)
-
-        def sortMyList(self, column):
-            if column == self.active_column:
-                column = self.last_column
-            super().sortMyList(column)
-            for i in range(self.rowCount()):
-                pid = self.item(i, self.pid_column).text()
-                self.pid_lookup[pid] = i
-
-        def getPid(self, row):
-            return self.item(row, self.pid_column).text()
+            checkBoxClear = QPixmap(icon_path + '/Checkbox-Empty-icon.png')
+            checkBoxFull = QPixmap(icon_path + '/Checkbox-Full-icon.png')
+            self.sensorModel = MyApp.SensorTableModel(pids, checkBoxClear, checkBoxFull)
+            self.setModel(self.sensorModel)
+            self.horizontalHeader().setStretchLastSection(True)
+            self.verticalHeader().hide()
+            self.setSelectionBehavior(QAbstractItemView.SelectRows)
+            self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            self.horizontalHeader().setSortIndicator(MyApp.SensorTableModel.PID_COLUMN, Qt.AscendingOrder)
+            self.setSortingEnabled(True)
 
         def setSensorThread(self,senprod):
             self.senprod = senprod
 
-        def sensor_toggle(self, row, col):
-            pid = int(self.getPid(row))
+        def sensor_toggle(self, index):
+            row = index.row()
+            pid = self.sensorModel.pids[row]
             ecu = self.ecu
-            checkbox = self.checkBoxes[pid]
 
-            if self.item(row,self.last_column).text() != self.SENSOR_ON:
-                self.item(row,self.last_column).setText(self.SENSOR_ON)
+            if self.sensorModel.toggleActive(row):
                 self.senprod.signals.sensorOnEvent.emit(pid,ecu)
-                checkbox.setPixmap(self.checkBoxFull)
             else:
                 self.senprod.signals.sensorOffEvent.emit(pid,ecu)
-                self.item(row,self.last_column).setText(self.SENSOR_OFF)
-                checkbox.setPixmap(self.checkBoxClear)
 
     class TestList(MyListCtrl):
         def __init__(self):
@@ -263,120 +346,755 @@ class MyApp(QApplication):
             sensorOnEvent = pyqtSignal(int,str)
             sensorOffEvent = pyqtSignal(int,str)
             sensorAllOffEvent = pyqtSignal(str)
+            sensorTestsEvent = pyqtSignal()
 
             def __init__(self):
                 super().__init__()
 
             def connectSlots(self, parent):
-                self.sensorOnEvent.connect(parent.on)
-                self.sensorOffEvent.connect(parent.off)
-                self.sensorAllOffEvent.connect(parent.all_off)
-                self.sensorTabEvent.connect(parent.selectEcu)
+                #Slots run directly in the emitting (GUI) thread, so the
+                #polling loop never has to service an event queue.
+                self.sensorOnEvent.connect(parent.on, Qt.DirectConnection)
+                self.sensorOffEvent.connect(parent.off, Qt.DirectConnection)
+                self.sensorAllOffEvent.connect(parent.all_off, Qt.DirectConnection)
+                self.sensorTabEvent.connect(parent.selectEcu, Qt.DirectConnection)
+                self.sensorTestsEvent.connect(parent.refreshTests, Qt.DirectConnection)
 
             def disconnectSlots(self):
                 self.sensorOnEvent.disconnect()
                 self.sensorOffEvent.disconnect()
                 self.sensorAllOffEvent.disconnect()
                 self.sensorTabEvent.disconnect()
+                self.sensorTestsEvent.disconnect()
 
         def __init__(self,_notify_window):
+            super().__init__ ()
             self._notify_window=_notify_window
+            self.focusShare = _notify_window.FOCUSSHARE
             self.active = {}
-            super().__init__ ()
+            self.ecu = None
+            self.pollList = ()
+            self.jobs = collections.deque()
+            self.userJobs = collections.deque()
+            self.port = None
+            self.vinList = []
+            self.connectStart = None
+            self.firstSampleTime = None
+            self.recorder = None
+            self.triggers = _notify_window.makeTriggers()
+            self.stopRequested = threading.Event()  #Ends connection attempts
+            self.mutex = QMutex()
+            self.workAvailable = QWaitCondition()
+            self.signals = self.CustomSlots()
+            self.signals.connectSlots(self)
 
         def run(self):
+            self.connectStart = time.monotonic()
 
-            self.signals = self.CustomSlots()
-            
-            self.ecu = None
+            #Stage 1: connection and discovery of supported PIDs
+            if self._notify_window.initCommunication(self.stopRequested) != 'OK':
+                if not self.isInterruptionRequested():
+                    self._notify_window.StatusEvent.emit([0,1,"Connection Failed!!!!"])
+                self.signals.disconnectSlots()
+                return
 
-            self.signals.connectSlots(self)
+            port = self._notify_window.port
+            self._notify_window.StatusEvent.emit([0,1,"Connected"])
+
+            #Stage 2: live polling.  Readiness tests, VIN and other mode $09
+            #information are fetched lazily in background slots between
+            #sensor requests.
+            self.mutex.lock()
+            self.port = port
+            for ecu in port.ecu_addresses:
+                self.jobs.append(functools.partial(self.getTests, port, ecu))
+            for ecu in port.ecu_addresses:
+                self.jobs.append(functools.partial(self.getVin, port, ecu))
+            self.mutex.unlock()
 
             #Thread is ready to take events
             self._notify_window.SensorProducerReady.emit()
+            self._notify_window.logger.info('Live data available %.3f s after connect',
+                                            time.monotonic() - self.connectStart)
+
+            pollList = ()
+            requestsSinceJob = BACKGROUND_JOB_INTERVAL
+            recorder = None
+            triggers = None
+
+            while True:
+                self.mutex.lock()
+                #Sleep until there is something to poll or we are told to
+                #stop, or until dtc triggers need PID $01 polled
+                while len(self.pollList) == 0 and len(self.jobs) == 0 and len(self.userJobs) == 0 \
+                        and self.recorder is recorder and self.triggers is triggers \
+                        and (triggers is None or not triggers.capturing()) \
+                        and not self.isInterruptionRequested():
+                    timeout = None
+                    if triggers is not None:
+                        timeout = triggers.timeout(port.ecu_addresses, time.monotonic())
+                    if timeout is None:
+                        self.workAvailable.wait(self.mutex)
+                    elif not self.workAvailable.wait(self.mutex, int(timeout * 1000) + 1):
+                        break
+                if pollList is not self.pollList:
+                    pollList = self.pollList
+                    credit = [0] * len(pollList)
+                finished = None
+                if recorder is not self.recorder:
+                    finished = recorder
+                    recorder = self.recorder
+                    if recorder is not None:
+                        #VIN and DTCs for the trip file footer are read in
+                        #the next background job slot, not all at once here
+                        self.jobs.appendleft(functools.partial(self.addVehicleInfo, port, recorder))
+                replaced = None
+                if triggers is not self.triggers:
+                    replaced = triggers
+                    triggers = self.triggers
+
+                #Jobs the user asked for take the next slot.  Background
+                #jobs get every BACKGROUND_JOB_INTERVAL'th slot while
+                #sensors are polled, and every slot otherwise.  Both wait
+                #while a trigger capture polls at full rate.
+                job = None
+                if triggers is None or not triggers.capturing():
+                    if len(self.userJobs) > 0:
+                        job = self.userJobs.popleft()
+                    elif len(self.jobs) > 0 and \
+                            (len(pollList) == 0 or requestsSinceJob >= BACKGROUND_JOB_INTERVAL):
+                        job = self.jobs.popleft()
+                self.mutex.unlock()
+
+                if finished is not None:
+                    finished.close()
+                if replaced is not None:
+                    replaced.close()
+
+                if self.isInterruptionRequested():
+                    break
 
-            port = self._notify_window.port
+                if job is not None:
+                    job()
+                    requestsSinceJob = 0
+                    continue
+
+                #A running capture, or PID $01 for dtc triggers, takes
+                #the place of the normal schedule.
+                request = None
+                if triggers is not None:
+                    request = triggers.request(port.ecu_addresses, time.monotonic())
+                if request is None:
+                    if len(pollList) == 0:
+                        continue
+                    request = self.nextRequest(pollList, credit)
+
+                ecu, pids = request
+                results = port.get_sensors(pids, ecu)
+                requestsSinceJob += 1
+                now = time.monotonic()
+                self._notify_window.sensorSnapshot.update(ecu, results)
+                self._notify_window.sensorHistory.add_results(ecu, results, now)
+                self._notify_window.sensorStats.add_results(ecu, results)
+                self._notify_window.operatingMaps.add_results(ecu, results, now)
+                if triggers is not None:
+                    triggers.check(ecu, results, now)
+                if recorder is not None:
+                    recorder.add_results(ecu, results)
+
+                if self.firstSampleTime is None and len(results) > 0:
+                    self.firstSampleTime = time.monotonic() - self.connectStart
+                    self._notify_window.logger.info('Time to first sample: %.3f s',
+                                                    self.firstSampleTime)
+                    self._notify_window.StatusEvent.emit([5,1,'%.3f s' % self.firstSampleTime])
+
+            self.mutex.lock()
+            if self.recorder is not recorder and self.recorder is not None:
+                self.recorder.close()
+            self.recorder = None
+            if self.triggers is not triggers and self.triggers is not None:
+                self.triggers.close()
+            self.mutex.unlock()
+            if recorder is not None:
+                recorder.close()
+            if triggers is not None:
+                triggers.close()
+            self.signals.disconnectSlots()
+
+        def addVehicleInfo(self, port, recorder):
+            """Stores VIN and DTCs in the footer of recorder, unless
+            recording has stopped meanwhile."""
+            if recorder is self.recorder:
+                recorder.add_vehicle_info(port)
+
+        def getTests(self, port, ecu):
+            res = port.get_tests(ecu)
+            if isinstance(res, dict):
+                self._notify_window.TestEvent.emit(res)
+
+        def getVin(self, port, ecu):
+            vin = port.get_vin(ecu)
+            if vin != '':
+                self.vinList.append(vin)
+                self._notify_window.StatusEvent.emit([4,1,','.join(self.vinList)])
+
+        def refreshTests(self):
+            """Fetch readiness tests ahead of other background jobs."""
+            locker = QMutexLocker(self.mutex)
+            if self.port is not None:
+                for ecu in reversed(self.port.ecu_addresses):
+                    self.jobs.appendleft(functools.partial(self.getTests, self.port, ecu))
+                self.workAvailable.wakeAll()
+
+        def getDTC(self):
+            """Reads DTCs in the next request slot, so the exchange does not
+            interleave with polling.  The result is passed to the GUI with
+            DTCReadEvent."""
+            self.addUserJob(self.readDTC)
+
+        def clearDTC(self):
+            """Clears DTCs in the next request slot; DTCClearedEvent is
+            emitted when done."""
+            self.addUserJob(self.eraseDTC)
+
+        def addUserJob(self, job):
+            locker = QMutexLocker(self.mutex)
+            if self.port is not None:
+                self.userJobs.append(functools.partial(job, self.port))
+                self.workAvailable.wakeAll()
+
+        def readDTC(self, port):
+            self._notify_window.DTCReadEvent.emit(port.get_dtc())
+
+        def eraseDTC(self, port):
+            port.clear_dtc()
+            self._notify_window.DTCClearedEvent.emit()
+
+        def setRecorder(self, recorder):
+            """Starts recording polled values to a TripWriter, or stops if
+            recorder is None.  The polling loop closes the previous
+            recorder."""
+            self.mutex.lock()
+            self.recorder = recorder
+            self.workAvailable.wakeAll()
+            self.mutex.unlock()
+
+        def setTriggers(self, triggers):
+            """Replaces the obd_trigger.Triggers checked against polled
+            values (None for none).  The polling loop writes any capture
+            the previous one has in progress."""
+            self.mutex.lock()
+            self.triggers = triggers
+            self.workAvailable.wakeAll()
+            self.mutex.unlock()
+
+        def stop(self):
+            self.requestInterruption()
+            self.stopRequested.set()
+            self.mutex.lock()
+            self.workAvailable.wakeAll()
+            self.mutex.unlock()
+
+        @staticmethod
+        def nextRequest(pollList, credit):
+            """Smooth weighted round robin: returns (ecu, pids) of the
+            entry in pollList that is furthest behind its share."""
+            total = 0
+            best = 0
+            for i, (ecu, pids, weight) in enumerate(pollList):
+                credit[i] += weight
+                total += weight
+                if credit[i] > credit[best]:
+                    best = i
+            credit[best] -= total
+            return pollList[best][:2]
+
+        #Must be called with self.mutex locked.
+        def updatePollList(self):
+            """Rebuild list of (ecu, pids, weight) for every ECU with active
+            PIDs.  The focused ECU gets focusShare percent of requests and
+            the rest is split evenly among the background ECUs."""
+            ecus = [ecu for ecu in sorted(self.active) if len(self.active[ecu]) > 0]
+            background = len(ecus) - 1
+            pollList = []
+            for ecu in ecus:
+                if self.ecu not in ecus or background == 0:
+                    weight = 1
+                elif ecu == self.ecu:
+                    weight = self.focusShare * background
+                else:
+                    weight = 100 - self.focusShare
+                pollList.append((ecu, tuple(self.active[ecu]), weight))
 
-            while not self.isInterruptionRequested():
-                QCoreApplication.processEvents()
-                ecu = self.ecu
-                if ecu is not None and len(self.active[ecu]) > 0:
-                    results = port.get_sensors(self.active[ecu], ecu)
-                    for pid,s in results.items():
-                        self._notify_window.ResultEvent.emit(ecu,pid,4,"%s (%s)" % (s[1], s[2]))
+            #Always poll something, even if the configured share starves it
+            if len(pollList) > 0 and sum(entry[2] for entry in pollList) == 0:
+                pollList = [(ecu, pids, 1) for ecu, pids, weight in pollList]
 
-            self.signals.disconnectSlots()
+            self.pollList = tuple(pollList)
+            self.workAvailable.wakeAll()
 
         def off(self, pid, ecu):
+            locker = QMutexLocker(self.mutex)
             if ecu not in self.active:
                 self.active[ecu] = []
 
             if pid in self.active[ecu]:
                 self.active[ecu].remove(pid)
+            self.updatePollList()
 
         def on(self, pid, ecu):
+            locker = QMutexLocker(self.mutex)
             if ecu not in self.active:
                 self.active[ecu] = []
 
             if pid not in self.active[ecu]:
                 self.active[ecu].append(pid)
+            self.updatePollList()
 
         def all_off(self, ecu):
+            locker = QMutexLocker(self.mutex)
             self.active[ecu] = []
+            self.updatePollList()
 
         def selectEcu(self, ecu):
+            locker = QMutexLocker(self.mutex)
             if ecu == 'None':
                 self.ecu = None
             else:
                 if ecu not in self.active:
                     self.active[ecu] = []
                 self.ecu = ecu
+            self.updatePollList()
 
   #class producer end
+    class SensorSnapshot:
+        """Latest sensor values, written by the sensor producer and
+        drained by the GUI at the display refresh rate."""
+        def __init__(self):
+            self.mutex = QMutex()
+            self.lastValues = {}
+            self.pending = {}
+
+        def update(self, ecu, results):
+            locker = QMutexLocker(self.mutex)
+            for pid,s in results.items():
+                value = "%s (%s)" % (s[1], s[2])
+                key = (ecu, pid)
+                if self.lastValues.get(key) != value: #Skip unchanged values
+                    self.lastValues[key] = value
+                    self.pending[key] = value
+
+        def take(self):
+            """Returns dictionary of values changed since the last call,
+            keyed by (ECU, PID)"""
+            locker = QMutexLocker(self.mutex)
+            pending = self.pending
+            self.pending = {}
+            return pending
+
+    class PlotView(QWidget):
+        """Plots the recent history of selected sensors, one lane per
+        sensor, each scaled to the range shown.  Samples are reduced to
+        the min and max of each pixel column by obd_history.Decimator,
+        so a redraw costs the same whatever the number of samples."""
+
+        COLORS = [Qt.blue, Qt.red, Qt.darkGreen, Qt.magenta, Qt.darkCyan, Qt.darkYellow]
+        GAP = 5.0 #seconds without samples that break a trace
+        TICKS = 5 #time grid lines
+
+        def __init__(self, history):
+            super().__init__()
+            self.history = history
+            self.span = 300.0
+            self.end = time.monotonic()
+            self.traces = [] #[ecu, pid, decimator]
+            self.setMinimumSize(200, 100)
+            self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+        def setTraces(self, keys):
+            """Plot list of (ecu, pid); decimators of traces kept are reused."""
+            old = {(ecu, pid): decimator for ecu, pid, decimator in self.traces}
+            self.traces = [[ecu, pid, old.get((ecu, pid))] for ecu, pid in keys]
+            self.refresh()
+
+        def setSpan(self, seconds):
+            self.span = float(seconds)
+            self.resetDecimators()
+            self.refresh()
+
+        def resetDecimators(self):
+            for trace in self.traces:
+                trace[2] = None
+
+        def resizeEvent(self, event):
+            #Buckets are one pixel wide
+            if event.oldSize().width() != event.size().width():
+                self.resetDecimators()
+                self.refresh()
+
+        def refresh(self):
+            """Folds in samples added since the last refresh and schedules
+            a repaint."""
+            self.end = time.monotonic()
+            width = self.span / max(self.width(), 1)
+            for trace in self.traces:
+                if trace[2] is None:
+                    series = self.history.buffer(trace[0], trace[1])
+                    if series is None:
+                        continue
+                    trace[2] = obd_history.Decimator(series, width)
+                trace[2].update(self.end - self.span)
+            self.update()
+
+        def paintEvent(self, event):
+            painter = QPainter(self)
+            painter.fillRect(self.rect(), Qt.white)
+            w = self.width()
+            h = self.height()
+            start = self.end - self.span
+
+            painter.setPen(QPen(Qt.lightGray, 1, Qt.DotLine))
+            for i in range(1, self.TICKS):
+                x = w * i / self.TICKS
+                painter.drawLine(QLineF(x, 0, x, h))
+
+            if len(self.traces) == 0:
+                painter.setPen(Qt.darkGray)
+                painter.drawText(self.rect(), Qt.AlignCenter, 'Select sensors to plot')
+                return
+
+            laneHeight = h / len(self.traces)
+            textHeight = painter.fontMetrics().height()
+            for n, (ecu, pid, decimator) in enumerate(self.traces):
+                top = n * laneHeight
+                color = self.COLORS[n % len(self.COLORS)]
+                sensor = obd_io.obd_sensors.SENSORS[pid]
+                if n > 0:
+                    painter.setPen(Qt.gray)
+                    painter.drawLine(QLineF(0, top, w, top))
+
+                buckets = () if decimator is None else decimator.buckets
+                label = '%s $%02X %s' % (ecu, pid, sensor.name.strip())
+                if len(buckets) > 0:
+                    lo = min(b[1] for b in buckets)
+                    hi = max(b[2] for b in buckets)
+                    label += ': %.6g %s  (%.6g .. %.6g)' % (buckets[-1][4], sensor.unit.strip(), lo, hi)
+                    if hi == lo:
+                        lo -= 1
+                        hi += 1
+                    y0 = top + textHeight + 2
+                    scale = (laneHeight - textHeight - 6) / (hi - lo)
+                    width = decimator.width
+                    painter.setPen(QPen(color, 1))
+                    #Each bucket is a vertical stroke between its min and
+                    #max, drawn in the direction the values moved.
+                    points = []
+                    previous = None
+                    for b in buckets:
+                        if previous is not None and (b[0] - previous) * width > self.GAP:
+                            painter.drawPolyline(QPolygonF(points))
+                            points = []
+                        previous = b[0]
+                        x = (b[0] * width - start) * w / self.span
+                        low = QPointF(x, y0 + (hi - b[1]) * scale)
+                        high = QPointF(x, y0 + (hi - b[2]) * scale)
+                        points += (low, high) if b[3] <= b[4] else (high, low)
+                    painter.drawPolyline(QPolygonF(points))
+
+                painter.setPen(color)
+                painter.drawText(QPointF(4, top + textHeight - 2), label)
+
+            painter.setPen(Qt.darkGray)
+            for i in range(1, self.TICKS):
+                x = w * i / self.TICKS
+                painter.drawText(QPointF(x + 2, h - 2), '-%d s' % round(self.span * (self.TICKS - i) / self.TICKS))
+
+    class MapView(QWidget):
+        """Draws an obd_histogram.Histogram2D as a heat map, cells shaded
+        by the log of the time spent in them."""
+
+        def __init__(self):
+            super().__init__()
+            self.histogram = None
+            self.setMinimumSize(200, 150)
+            self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+        def setHistogram(self, histogram):
+            self.histogram = histogram
+            self.update()
+
+        @staticmethod
+        def shade(fraction):
+            #Pale yellow for little time through to dark red for the most
+            return QColor.fromHsvF(0.16 * (1 - fraction), 0.25 + 0.75 * fraction, 1 - 0.45 * fraction)
+
+        def paintEvent(self, event):
+            painter = QPainter(self)
+            painter.fillRect(self.rect(), Qt.white)
+            histogram = self.histogram
+            if histogram is None:
+                painter.setPen(Qt.darkGray)
+                painter.drawText(self.rect(), Qt.AlignCenter,
+                                 'Poll both sensors of a map on the Live Data tab')
+                return
+
+            xpid, xmin, xmax, xcells = histogram.x
+            ypid, ymin, ymax, ycells = histogram.y
+            metrics = painter.fontMetrics()
+            textHeight = metrics.height()
+            ylabels = ('%.6g' % ymin, '%.6g' % ymax)
+            #Room for the rotated y axis title and the y range labels
+            left = textHeight + 6 + max(metrics.width(text) for text in ylabels)
+            top = textHeight + 4
+            right = self.width() - 4
+            bottom = self.height() - 2 * textHeight - 4
+            #Cell edges on whole pixels, so neighbouring cells meet
+            xedges = [round(left + (right - left) * i / xcells) for i in range(xcells + 1)]
+            yedges = [round(bottom - (bottom - top) * j / ycells) for j in range(ycells + 1)]
+            counts = histogram.counts
+            scale = math.log1p(max(counts)) or 1.0
+            for n, ms in enumerate(counts):
+                if ms:
+                    i = n % xcells
+                    j = n // xcells
+                    painter.fillRect(QRect(xedges[i], yedges[j + 1], xedges[i + 1] - xedges[i],
+                                           yedges[j] - yedges[j + 1]), self.shade(math.log1p(ms) / scale))
+            painter.setPen(Qt.gray)
+            painter.drawRect(QRect(left, top, right - left, bottom - top))
+
+            painter.setPen(Qt.black)
+            painter.drawText(QPointF(4, textHeight), '%s %s: %.1f s' %
+                             (histogram.ecu, histogram.name, histogram.total() / 1000.0))
+            painter.drawText(QPointF(left, bottom + textHeight), '%.6g' % xmin)
+            text = '%.6g' % xmax
+            painter.drawText(QPointF(right - metrics.width(text), bottom + textHeight), text)
+            painter.drawText(QRectF(left, bottom, right - left, 2 * textHeight + 2),
+                             Qt.AlignHCenter | Qt.AlignBottom, self.axisTitle(xpid))
+            painter.drawText(QRectF(0, bottom - textHeight, left - 2, textHeight), Qt.AlignRight, ylabels[0])
+            painter.drawText(QRectF(0, top, left - 2, textHeight), Qt.AlignRight, ylabels[1])
+            painter.save()
+            painter.translate(0, bottom)
+            painter.rotate(-90)
+            painter.drawText(QRectF(0, 0, bottom - top, textHeight), Qt.AlignHCenter, self.axisTitle(ypid))
+            painter.restore()
+
+        @staticmethod
+        def axisTitle(pid):
+            sensor = obd_io.obd_sensors.SENSORS[pid]
+            unit = sensor.unit.strip()
+            return '$%02X %s%s' % (pid, sensor.name.strip(), ' (%s)' % unit if unit else '')
+
+    class CodeTreeModel(QAbstractItemModel):
+        """Tree of DTC groups, codes and descriptions backed by a
+        DTCStore.  Children of a node are only created when the node is
+        first expanded."""
+
+        class Node:
+            __slots__ = ('parent', 'row', 'text', 'key', 'children')
+
+            def __init__(self, parent, row, text, key=None):
+                self.parent = parent
+                self.row = row
+                self.text = text
+                self.key = key
+                self.children = None #Not fetched yet
+
+        TOP, GROUP, CODE, TEXT = range(4)
+
+        def __init__(self, store):
+            super().__init__()
+            self.store = store
+            self.setFilter('')
+
+        def setFilter(self, text):
+            """Show only codes matching text (see DTCStore.search).
+            An empty string shows all codes."""
+            self.beginResetModel()
+            if text.strip() == '':
+                self.matches = None
+            else:
+                self.matches = {}
+                for code, description in self.store.search(text):
+                    group = code[:3]
+                    if group not in self.matches:
+                        self.matches[group] = []
+                    self.matches[group].append((code, description))
+            self.root = self.Node(None, 0, '')
+            self.root.children = [self.Node(self.root, 0, 'Code Reference', self.TOP)]
+            self.endResetModel()
+
+        def matchCount(self):
+            if self.matches is None:
+                return len(self.store)
+            return sum(len(codes) for codes in self.matches.values())
+
+        def nodeLevel(self, node):
+            level = -1
+            while node is not self.root:
+                node = node.parent
+                level += 1
+            return level
+
+        def createChildren(self, node):
+            level = self.nodeLevel(node)
+            if level == self.TOP:
+                if self.matches is None:
+                    groups = self.store.groups()
+                else:
+                    groups = sorted(self.matches)
+                return [self.Node(node, i, group + 'XX', group) for i, group in enumerate(groups)]
+            elif level == self.GROUP:
+                if self.matches is None:
+                    codes = self.store.prefix(node.key)
+                else:
+                    codes = self.matches[node.key]
+                return [self.Node(node, i, code, description) for i, (code, description) in enumerate(codes)]
+            elif level == self.CODE:
+                return [self.Node(node, 0, node.key)]
+            return []
+
+        def nodeFromIndex(self, index):
+            return index.internalPointer() if index.isValid() else self.root
+
+        def index(self, row, column, parent=QModelIndex()):
+            node = self.nodeFromIndex(parent)
+            if node.children is None or row < 0 or row >= len(node.children) or column != 0:
+                return QModelIndex()
+            return self.createIndex(row, column, node.children[row])
+
+        def parent(self, index):
+            if not index.isValid():
+                return QModelIndex()
+            parent = index.internalPointer().parent
+            if parent is self.root:
+                return QModelIndex()
+            return self.createIndex(parent.row, 0, parent)
+
+        def rowCount(self, parent=QModelIndex()):
+            node = self.nodeFromIndex(parent)
+            return 0 if node.children is None else len(node.children)
+
+        def columnCount(self, parent=QModelIndex()):
+            return 1
+
+        def hasChildren(self, parent=QModelIndex()):
+            node = self.nodeFromIndex(parent)
+            if node.children is None:
+                return self.nodeLevel(node) < self.TEXT
+            return len(node.children) > 0
+
+        def canFetchMore(self, parent):
+            return self.nodeFromIndex(parent).children is None
+
+        def fetchMore(self, parent):
+            node = self.nodeFromIndex(parent)
+            if node.children is not None:
+                return
+            children = self.createChildren(node)
+            if len(children) == 0:
+                node.children = []
+                return
+            self.beginInsertRows(parent, 0, len(children) - 1)
+            node.children = children
+            self.endInsertRows()
+
+        def data(self, index, role=Qt.DisplayRole):
+            if role == Qt.DisplayRole and index.isValid():
+                return index.internalPointer().text
+            return None
+
     class LogHandler(logging.Handler):
         def __init__(self,logDisplay):
             super().__init__()
             self.logDisplay = logDisplay
 
         def emit(self,record):
-            record = self.format(record)
-            self.logDisplay.append(record)
+            #Records may come from any thread; the display picks them up
+            #on its next refresh.
+            self.logDisplay.pending.append(self.format(record))
 
-    class LogDisplay(QTextEdit):
-        def __init__(self):
+    class LogDisplay(QPlainTextEdit):
+        """Trace view holding at most maxLines lines.  Records are queued
+        by LogHandler and appended in batches by a timer."""
+
+        REFRESH_INTERVAL = 100 #ms
+
+        def __init__(self, maxLines):
             super().__init__()
             self.setReadOnly(True)
-            self.setLineWrapMode(QTextEdit.NoWrap)
+            self.setLineWrapMode(QPlainTextEdit.NoWrap)
+            self.pending = collections.deque()
+            self.setMaxLines(maxLines)
+            self.refreshTimer = QTimer(self)
+            self.refreshTimer.timeout.connect(self.appendPending)
+            self.refreshTimer.start(self.REFRESH_INTERVAL)
+
+        def setMaxLines(self, maxLines):
+            self.maxLines = maxLines
+            self.setMaximumBlockCount(maxLines)
+            #Ring of displayed lines, used for export
+            self.lines = collections.deque(getattr(self, 'lines', ()), maxlen=maxLines)
+
+        def appendPending(self):
+            if len(self.pending) == 0:
+                return
+            batch = []
+            pending = self.pending
+            for i in range(len(pending)):
+                batch.append(pending.popleft())
+            #Records may span lines; anything older than the cap is dropped
+            batch = '\n'.join(batch).split('\n')[-self.maxLines:]
+            self.lines.extend(batch)
+            self.appendPlainText('\n'.join(batch))
+
+        def writeLines(self, fh):
+            for line in self.lines:
+                fh.write(line)
+                fh.write('\n')
 
     def stop(self):
+        self.displayTimer.stop()
+        if self.senprod is not None:
+            self.senprod.stop()
+            self.senprod.wait()
+        self.recordTripAction.setChecked(False)
         if self.port != None: #if stop is called before any connection port is not defined (and not connected )
             self.port.close()
         self.StatusEvent.emit([0,1,"Disconnected"])
         self.StatusEvent.emit([2,1,"----"])
+        self.StatusEvent.emit([5,1,"---"])
 
-    def initCommunication(self):
+    def initCommunication(self, stop = None):
+        """Opens the port and discovers ECUs and their supported PIDs.
+        Runs in the sensor producer thread; results are passed to the GUI
+        through signals as they arrive.  Setting the threading.Event stop
+        ends connection attempts."""
         self.StatusEvent.emit([0,1,"Connecting...."])
-        self.port = obd_io.OBDPort(self.COMPORT,self.BAUDRATE,self,self.SERTIMEOUT,self.RECONNATTEMPTS)
+
+        def connectProgress(event, value):
+            if event == 'port':
+                self.StatusEvent.emit([0,1,"Port %s opened" % value])
+            elif event == 'attempt':
+                self.StatusEvent.emit([0,1,"Reconnecting (attempt %d)...." % value])
+            elif event == 'elm':
+                self.StatusEvent.emit([2,1,value])
+            elif event == 'protocol':
+                self.StatusEvent.emit([1,1,value])
+            elif event == 'ecu':
+                self.StatusEvent.emit([0,1,"Found ECU at %s" % value])
+
+        self.port = obd_io.OBDPort(self.COMPORT,self.BAUDRATE,self,self.SERTIMEOUT,self.RECONNATTEMPTS,connectProgress,
+                                   self.TRANSCRIPT, stop = stop)
 
         if self.port.State==0: #Cant open serial port
             return None
 
         self.logger.info("Communication initialized...")
 
-        vinList = []
-
-        if len(self.port.ecu_addresses) > 0:
-            for ecu in self.port.ecu_addresses:
-                self.updateTestTable(ecu)
-                supp = self.port.get_supported(ecu) #read supported mode $01
-                                                    #PIDS of each ECU that responds
-                ecuName = 'ECU' + str(self.port.getEcuNum(ecu))
-                self.add_sensor_table(ecuName, ecu, supp)
-                vin = self.port.get_vin(ecu)
-                if vin != '':
-                    vinList.append(vin)
-
-            self.StatusEvent.emit([4,1,','.join(vinList)])
+        for ecu in self.port.ecu_addresses:
+            supp = self.port.get_supported(ecu) #read supported mode $01
+                                                #PIDS of each ECU that responds
+            self.EcuSupportedEvent.emit(ecu, supp)
 
         return "OK"
 
@@ -390,7 +1108,7 @@ class MyApp(QApplication):
         self.ClearDTCButton.setEnabled(True)
 
         for sensorTable in self.sensorTables.values():
-           sensorTable.cellClicked.connect(sensorTable.sensor_toggle)
+           sensorTable.clicked.connect(sensorTable.sensor_toggle)
 
     def sensor_control_off(self): #after disconnect disable fer buttons
         self.getDTCAction.setEnabled(False)
@@ -401,33 +1119,26 @@ class MyApp(QApplication):
         self.GetDTCButton.setEnabled(False)
         self.ClearDTCButton.setEnabled(False)
         for sensorTable in self.sensorTables.values():
-            sensorTable.cellClicked.disconnect()
+            sensorTable.clicked.disconnect()
+
+    def OnEcuSupported(self, ecu, supp):
+        ecuName = 'ECU' + str(self.port.getEcuNum(ecu))
+        self.add_sensor_table(ecuName, ecu, supp)
+        self.sensorTables[ecu].setSensorThread(self.senprod)
 
     def add_sensor_table(self, title, ecu, supp):
-        sensorTable = self.SensorList(ecu)
+        #Create entry in table for each supported PID (excluding PID $01)
+        #Decode of PID $01 is on Test tab
+        pids = [i for i, supported in enumerate(supp[1:],2) if supported == '1']
+        sensorTable = self.SensorList(ecu, pids)
         self.sensorTables[ecu] = sensorTable
-        pid_column = 2
-        sensorTable.setColumnCount(5,pid_column)
-        sensorTable.setHorizontalHeaderLabels(['Active','PID', 'PID','Sensor','Value'])
         sensorTable.setColumnWidth(0,55)
         sensorTable.setColumnWidth(1,40)
-        sensorTable.setColumnWidth(3,250)
-        #Create entry in table for each supported PID (excluding PID $01)
-        #Decode of PID $01 is on Test tab
-        for i, supported in enumerate(supp[1:],2):
-            if supported == '1':
-                obd_sensor = obd_io.obd_sensors.SENSORS[i]
-                s = obd_sensor.name
-                pid_hex = obd_sensor.cmd[-2:]
-                pid_dec = int(pid_hex,16)
-                row = sensorTable.rowCount()
-                sensorTable.addTableRow(6, ['','$' + pid_hex, str(pid_dec), s, '',''])
-                sensorTable.item(row,3).setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        sensorTable.setColumnWidth(2,250)
 
         self.sensorTabs.addTab(sensorTable, title)
 
-    def updateTestTable(self,ecu):
-        res = self.port.get_tests(ecu)
+    def updateTestTable(self,res):
         for test in ptest:
             if test == ptest[0]:
                 self.OBDTests.setNumDTCs(res[test])
@@ -448,6 +1159,213 @@ class MyApp(QApplication):
         sensorPage = self.MyPanel(self.sensorTabs)
         self.nb.addTab(sensorPage, "Live Data")
 
+    def build_plot_page(self):
+        self.plotView = self.PlotView(self.sensorHistory)
+
+        #Sensors with history, checked to plot
+        self.plotSensors = QListWidget()
+        self.plotSensors.setMaximumWidth(220)
+        self.plotSensors.itemChanged.connect(self.plotSelectionChanged)
+
+        plotSpan = QComboBox()
+        for text, seconds in (('1 min', 60), ('5 min', 300), ('15 min', 900), ('1 hour', 3600)):
+            plotSpan.addItem(text, seconds)
+        plotSpan.setCurrentIndex(1)
+        plotSpan.currentIndexChanged.connect(lambda i: self.plotView.setSpan(plotSpan.itemData(i)))
+
+        sideLayout = QVBoxLayout()
+        sideLayout.addWidget(QLabel('Time span:'))
+        sideLayout.addWidget(plotSpan)
+        sideLayout.addWidget(self.plotSensors)
+        plotLayout = QHBoxLayout()
+        plotLayout.addLayout(sideLayout)
+        plotLayout.addWidget(self.plotView)
+        self.plotPage = QWidget()
+        self.plotPage.setLayout(plotLayout)
+        self.nb.addTab(self.plotPage, "Plot")
+
+        #Redrawn at its own rate, and only while the tab is shown
+        self.plotTimer = QTimer()
+        self.plotTimer.setInterval(1000 // PLOT_REFRESH_HZ)
+        self.plotTimer.timeout.connect(self.refreshPlot)
+        self.nb.currentChanged.connect(self.plotTabChanged)
+
+    STATS_HEADERS = ['ECU', 'PID', 'Sensor', 'Count', 'Min', 'Max', 'Mean', 'Std Dev',
+                     'p50', 'p95', 'p99', 'Unit']
+
+    def build_stats_page(self):
+        self.statsTable = self.MyListCtrl(sortable=False)
+        self.statsTable.setColumnCount(len(self.STATS_HEADERS))
+        self.statsTable.setHorizontalHeaderLabels(self.STATS_HEADERS)
+
+        resetButton = QPushButton('Reset')
+        resetButton.clicked.connect(self.resetStats)
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addStretch()
+        buttonLayout.addWidget(resetButton)
+        statsLayout = QVBoxLayout()
+        statsLayout.addWidget(self.statsTable)
+        statsLayout.addLayout(buttonLayout)
+        self.statsPage = QWidget()
+        self.statsPage.setLayout(statsLayout)
+        self.nb.addTab(self.statsPage, "Statistics")
+
+        self.statsTimer = QTimer()
+        self.statsTimer.setInterval(1000 // STATS_REFRESH_HZ)
+        self.statsTimer.timeout.connect(self.refreshStats)
+        self.nb.currentChanged.connect(self.statsTabChanged)
+
+    def statsTabChanged(self, tabNum):
+        if self.nb.widget(tabNum) is self.statsPage:
+            self.refreshStats()
+            self.statsTimer.start()
+        else:
+            self.statsTimer.stop()
+
+    def refreshStats(self):
+        #The producer may be adding values, or the statistics may have
+        #been cleared, since keys() was read
+        rows = []
+        for ecu, pid in sorted(self.sensorStats.keys()):
+            stats = self.sensorStats.get(ecu, pid)
+            if stats is None:
+                continue
+            summary = stats.summary()
+            if summary['count'] == 0:
+                continue
+            p = summary['percentiles']
+            if any(p.get(n) is None for n in obd_stats.QUANTILES):
+                continue
+            rows.append((ecu, pid, summary))
+        table = self.statsTable
+        resize = table.rowCount() != len(rows)
+        table.setRowCount(len(rows))
+        for row, (ecu, pid, summary) in enumerate(rows):
+            sensor = obd_io.obd_sensors.SENSORS[pid]
+            p = summary['percentiles']
+            cells = [ecu, '$%02X' % pid, sensor.name.strip(), str(summary['count'])]
+            cells += ['%.6g' % summary[key] for key in ('min', 'max', 'mean', 'stddev')]
+            cells += ['%.6g' % p[n] for n in obd_stats.QUANTILES]
+            cells.append(sensor.unit.strip())
+            for column, text in enumerate(cells):
+                item = table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                    table.setItem(row, column, item)
+                if item.text() != text:
+                    item.setText(text)
+        if resize:
+            table.resizeColumnsToContents()
+
+    def resetStats(self):
+        self.sensorStats.clear()
+        self.refreshStats()
+
+    def build_map_page(self):
+        self.mapView = self.MapView()
+        self.mapSelect = QComboBox()
+        self.mapSelect.currentIndexChanged.connect(lambda i: self.refreshMap())
+
+        resetButton = QPushButton('Reset')
+        resetButton.clicked.connect(self.resetMaps)
+        saveButton = QPushButton('Save...')
+        saveButton.clicked.connect(self.saveMaps)
+        controlLayout = QHBoxLayout()
+        controlLayout.addWidget(QLabel('Map:'))
+        controlLayout.addWidget(self.mapSelect)
+        controlLayout.addStretch()
+        controlLayout.addWidget(resetButton)
+        controlLayout.addWidget(saveButton)
+        mapLayout = QVBoxLayout()
+        mapLayout.addLayout(controlLayout)
+        mapLayout.addWidget(self.mapView)
+        self.mapPage = QWidget()
+        self.mapPage.setLayout(mapLayout)
+        self.nb.addTab(self.mapPage, "Maps")
+
+        self.mapTimer = QTimer()
+        self.mapTimer.setInterval(1000 // MAP_REFRESH_HZ)
+        self.mapTimer.timeout.connect(self.refreshMap)
+        self.nb.currentChanged.connect(self.mapTabChanged)
+
+    def mapTabChanged(self, tabNum):
+        if self.nb.widget(tabNum) is self.mapPage:
+            self.refreshMap()
+            self.mapTimer.start()
+        else:
+            self.mapTimer.stop()
+
+    def refreshMap(self):
+        #Add maps created since the last refresh
+        keys = sorted(self.operatingMaps.keys())
+        if len(keys) != self.mapSelect.count():
+            self.mapSelect.blockSignals(True)
+            current = self.mapSelect.currentData()
+            self.mapSelect.clear()
+            for ecu, name in keys:
+                self.mapSelect.addItem('%s %s' % (ecu, name), (ecu, name))
+            self.mapSelect.setCurrentIndex(max(self.mapSelect.findData(current), 0))
+            self.mapSelect.blockSignals(False)
+        key = self.mapSelect.currentData()
+        self.mapView.setHistogram(None if key is None else self.operatingMaps.get(*key))
+
+    def resetMaps(self):
+        self.operatingMaps.clear()
+        self.refreshMap()
+
+    def saveMaps(self):
+        filename = QFileDialog.getSaveFileName(caption='Save Operating Maps...',
+                                               filter='Maps (*%s);;CSV files (*.csv)' % obd_histogram.MAP_EXTENSION)[0]
+        if filename == '':
+            return
+        try:
+            if filename.lower().endswith('.csv'):
+                self.operatingMaps.write_csv(filename)
+            else:
+                if not filename.endswith(obd_histogram.MAP_EXTENSION):
+                    filename += obd_histogram.MAP_EXTENSION
+                self.operatingMaps.save(filename)
+        except OSError as e:
+            self.logger.warning('Error saving operating maps: %s', str(e))
+            return
+        self.logger.info('Operating maps saved to %s', filename)
+
+    def plotTabChanged(self, tabNum):
+        if self.nb.widget(tabNum) is self.plotPage:
+            self.refreshPlot()
+            self.plotTimer.start()
+        else:
+            self.plotTimer.stop()
+
+    def refreshPlot(self):
+        #Add sensors that got history since the last refresh
+        keys = self.sensorHistory.keys()
+        if len(keys) != self.plotSensors.count():
+            listed = set(self.plotKeys())
+            for ecu, pid in sorted(keys):
+                if (ecu, pid) not in listed:
+                    item = QListWidgetItem('%s $%02X %s' % (ecu, pid, obd_io.obd_sensors.SENSORS[pid].name.strip()))
+                    item.setData(Qt.UserRole, ecu)
+                    item.setData(Qt.UserRole + 1, pid)
+                    item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                    item.setCheckState(Qt.Unchecked)
+                    self.plotSensors.addItem(item)
+            self.plotSensors.sortItems()
+        self.plotView.refresh()
+
+    def plotKeys(self, checkedOnly=False):
+        """Returns list of (ecu, pid) in the plot sensor list."""
+        keys = []
+        for row in range(self.plotSensors.count()):
+            item = self.plotSensors.item(row)
+            if not checkedOnly or item.checkState() == Qt.Checked:
+                keys.append((item.data(Qt.UserRole), item.data(Qt.UserRole + 1)))
+        return keys
+
+    def plotSelectionChanged(self, item):
+        self.plotView.setTraces(self.plotKeys(checkedOnly=True))
+
     def build_DTC_page(self):
         self.DTCpanel = QWidget()
         self.GetDTCButton  = QPushButton('Get DTC')
@@ -474,10 +1392,12 @@ class MyApp(QApplication):
 
     def exportLog(self):
         filename = QFileDialog.getSaveFileName(caption='Export Log to File...')
+        if filename[0] == '':
+            return
         try:
-            fh = open(filename[0],'w')
-            logdata = self.logDisplay.toPlainText()
-            fh.write(logdata)
+            self.logDisplay.appendPending()
+            with open(filename[0],'w') as fh:
+                self.logDisplay.writeLines(fh)
         except Exception as e:
             self.logger.error('Error exporting log file!!!')
             self.logger.error('%s',str(e))
@@ -486,9 +1406,20 @@ class MyApp(QApplication):
         with open(self.configfilepath, 'w') as f:
             self.config.write(f)
 
+    def openLogFile(self, filename, rotate, maxSize, backups, compress):
+        """Starts writing log records to filename from a background thread.
+        maxSize is in MB.  Returns None if the file could not be opened."""
+        try:
+            fileLog = obd_logging.FileLog(filename, rotate, maxSize << 20, backups, compress)
+        except Exception as e:
+            self.logger.warning('Error opening log file: %s', str(e))
+            return None
+        fileLog.start(self.logger)
+        return fileLog
+
     def build_log_page(self):
         tracePanel = QWidget()
-        self.logDisplay = self.LogDisplay()
+        self.logDisplay = self.LogDisplay(self.logLines)
         logHandlers = [self.LogHandler(self.logDisplay)]
 
         def removeLogFile(self):
@@ -503,15 +1434,12 @@ class MyApp(QApplication):
 
         self.logger = logging.getLogger('PyOBD')
 
+        self.fileLog = None
         if self.logToFile:
-            try:
-                logFileHandler = logging.FileHandler(self.logFile,'w')
-            except Exception as e:
-                self.logger.warning('Error opening log file: %s', str(e))
+            self.fileLog = self.openLogFile(self.logFile, self.logRotate, self.logMaxSize,
+                                            self.logBackups, self.logCompress)
+            if self.fileLog is None:
                 removeLogFile(self)
-            else:
-                self.logFileHandler = logFileHandler
-                self.logger.addHandler(self.logFileHandler)
 
         LogExportButton  = QPushButton('Export Log')
         LogExportButton.clicked.connect(self.exportLog)
@@ -531,6 +1459,7 @@ class MyApp(QApplication):
         self.DEBUGLEVEL = 0 #debug everthing
         self.sensorTables = {}
         self.port = None
+        self.codeLookupDialog = None
 
         icon_path = os.path.dirname(__file__) + '/icons_free'
         self.completeIcon = QPixmap(icon_path + '/check-icon2.png')
@@ -561,27 +1490,65 @@ class MyApp(QApplication):
             self.RECONNATTEMPTS=5
             self.SERTIMEOUT=5
             self.BAUDRATE='9600'
+            self.FOCUSSHARE=75
+            self.TRANSCRIPT=''
+            self.HISTORYSAMPLES=obd_history.HISTORY_CAPACITY
+            self.TRIGGERS=''
+            self.TRIGGERPRE=obd_trigger.TRIGGER_PRE
+            self.TRIGGERPOST=obd_trigger.TRIGGER_POST
+            self.TRIGGERDIR=os.path.expanduser('~')
             self.logLevel=logging.WARNING
             self.logToFile = False
             self.logFile = ''
+            self.logLines = 5000
+            self.logRotate = obd_logging.ROTATE_NEVER
+            self.logMaxSize = 10
+            self.logBackups = 5
+            self.logCompress = False
         else:
             self.COMPORT=self.config.get("pyOBD","COMPORT",fallback='/dev/ttyACM0')
             self.BAUDRATE=self.config.get("pyOBD","BAUDRATE",fallback='9600')
             self.RECONNATTEMPTS=self.config.getint("pyOBD","RECONNATTEMPTS",fallback=5)
             self.SERTIMEOUT=self.config.getint("pyOBD","SERTIMEOUT",fallback=5)
+            self.FOCUSSHARE=self.config.getint("pyOBD","FOCUSSHARE",fallback=75)
+            self.TRANSCRIPT=self.config.get("pyOBD","TRANSCRIPT",fallback='')
+            self.HISTORYSAMPLES=self.config.getint("pyOBD","HISTORYSAMPLES",
+                                                   fallback=obd_history.HISTORY_CAPACITY)
+            self.TRIGGERS=self.config.get("pyOBD","TRIGGERS",fallback='')
+            self.TRIGGERPRE=self.config.getfloat("pyOBD","TRIGGERPRE",fallback=obd_trigger.TRIGGER_PRE)
+            self.TRIGGERPOST=self.config.getfloat("pyOBD","TRIGGERPOST",fallback=obd_trigger.TRIGGER_POST)
+            self.TRIGGERDIR=self.config.get("pyOBD","TRIGGERDIR",fallback=os.path.expanduser('~'))
             self.logLevel=self.config.getint('pyOBD','LOGLEVEL',fallback=logging.WARNING)
             self.logToFile=self.config.getboolean('pyOBD','LOGTOFILE',fallback=False)
             self.logFile=self.config.get('pyOBD','LOGFILE',fallback='')
+            self.logLines=self.config.getint('pyOBD','LOGLINES',fallback=5000)
+            self.logRotate=self.config.get('pyOBD','LOGROTATE',fallback=obd_logging.ROTATE_NEVER)
+            if self.logRotate not in obd_logging.ROTATE_MODES:
+                self.logRotate = obd_logging.ROTATE_NEVER
+            self.logMaxSize=self.config.getint('pyOBD','LOGMAXSIZE',fallback=10)
+            self.logBackups=self.config.getint('pyOBD','LOGBACKUPS',fallback=5)
+            self.logCompress=self.config.getboolean('pyOBD','LOGCOMPRESS',fallback=False)
 
         frame = QMainWindow()
         frame.setWindowTitle('pyOBD-II')
         self.frame=frame
 
-        self.ResultEvent.connect(self.OnResult)
+        self.sensorSnapshot = self.SensorSnapshot()
+        #Kept across reconnects; memory is fixed by HISTORYSAMPLES per PID
+        self.sensorHistory = obd_history.History(self.HISTORYSAMPLES)
+        self.sensorStats = obd_stats.Stats()
+        self.operatingMaps = obd_histogram.OperatingMaps()
+        self.displayTimer = QTimer()
+        self.displayTimer.setInterval(1000 // DISPLAY_REFRESH_HZ)
+        self.displayTimer.timeout.connect(self.OnResult)
         self.DTCEvent.connect(self.OnDtc)
         self.DTCClearEvent.connect(self.OnDtcClear)
+        self.DTCReadEvent.connect(self.OnDtcRead)
+        self.DTCClearedEvent.connect(self.OnDtcCleared)
         self.StatusEvent.connect(self.OnStatus)
-        self.TestEvent.connect(self.OnTests)
+        self.TestEvent.connect(self.updateTestTable)
+        self.EcuSupportedEvent.connect(self.OnEcuSupported)
+        self.SensorProducerReady.connect(self.sensor_control_on)
 
         # Main notebook frames
 
@@ -598,6 +1565,7 @@ class MyApp(QApplication):
         self.status.addTableRow(2, ['Cable Version', '---'])
         self.status.addTableRow(2, ['COM Port', self.COMPORT])
         self.status.addTableRow(2, ['Vehicle Identification Number', '-----------------'])
+        self.status.addTableRow(2, ['Time to First Sample', '---'])
 
         statusPanel  = self.MyPanel(self.status)
         self.nb.addTab(statusPanel, "Status")
@@ -609,6 +1577,12 @@ class MyApp(QApplication):
 
         self.build_sensor_page()
 
+        self.build_plot_page()
+
+        self.build_stats_page()
+
+        self.build_map_page()
+
         self.build_DTC_page()
 
         self.build_log_page()
@@ -627,7 +1601,10 @@ class MyApp(QApplication):
 
         # Setting up the menu.
 
+        self.recordTripAction = CreateMenuItem("Record Trip..."," Record live sensor values to a trip file", self.RecordTrip)
+        self.recordTripAction.setCheckable(True)
         self.exitAction = CreateMenuItem("E&xit"," Terminate the program", self.OnExit)
+        self.filemenu.addAction(self.recordTripAction)
         self.filemenu.addAction(self.exitAction)
         self.aboutToQuit.connect(self.exitCleanup)
 
@@ -650,6 +1627,8 @@ class MyApp(QApplication):
 
         self.logoptionsAction = CreateMenuItem("Logging Options","",self.setLoggingOptions)
         self.optionsmenu.addAction(self.logoptionsAction)
+        self.triggerAction = CreateMenuItem("Capture Triggers"," Capture live data around events",self.setTriggerOptions)
+        self.optionsmenu.addAction(self.triggerAction)
 
         self.aboutAction = CreateMenuItem("About this program","",self.OnHelpAbout)
         self.visitAction = CreateMenuItem("Visit program homepage","",self.OnHelpVisit)
@@ -670,6 +1649,8 @@ class MyApp(QApplication):
                 self.sensorTabClicked(self.sensorTabs.currentIndex())
             else:
                 self.senprod.signals.sensorTabEvent.emit('None')
+                if self.OBDTests in self.nb.widget(tabNum).children():
+                    self.senprod.signals.sensorTestsEvent.emit()
 
     def sensorTabClicked(self, tabNum):
         for sensorTable in self.sensorTables.values():
@@ -702,6 +1683,15 @@ class MyApp(QApplication):
         loglevelgroup.setLayout(loglevel_layout)
         layout.addWidget(loglevelgroup)
 
+        loglineslayout = QHBoxLayout()
+        loglineslayout.addWidget(QLabel('Trace Lines Kept:'))
+        loglines = QSpinBox()
+        loglines.setRange(100, 1000000)
+        loglines.setSingleStep(1000)
+        loglines.setValue(self.logLines)
+        loglineslayout.addWidget(loglines)
+        layout.addLayout(loglineslayout)
+
         def browseClick():
             filename = QFileDialog.getSaveFileName(caption='Select Log File...')[0]
             logfilename.setText(filename) 
@@ -716,7 +1706,39 @@ class MyApp(QApplication):
         logfilebrowse.clicked.connect(browseClick)
         logfilelayout.addWidget(logfilename)
         logfilelayout.addWidget(logfilebrowse,alignment=Qt.AlignRight)
-        logfilegroup.setLayout(logfilelayout)
+
+        rotatelayout = QHBoxLayout()
+        rotatelayout.addWidget(QLabel('Rotate:'))
+        logrotate = QComboBox()
+        for mode in obd_logging.ROTATE_MODES:
+            logrotate.addItem(mode.capitalize(), mode)
+        logrotate.setCurrentIndex(obd_logging.ROTATE_MODES.index(self.logRotate))
+        rotatelayout.addWidget(logrotate)
+        rotatelayout.addWidget(QLabel('Size (MB):'))
+        logmaxsize = QSpinBox()
+        logmaxsize.setRange(1, 4096)
+        logmaxsize.setValue(self.logMaxSize)
+        rotatelayout.addWidget(logmaxsize)
+        rotatelayout.addWidget(QLabel('Keep:'))
+        logbackups = QSpinBox()
+        logbackups.setRange(1, 1000)
+        logbackups.setValue(self.logBackups)
+        rotatelayout.addWidget(logbackups)
+        logcompress = QCheckBox('Compress')
+        logcompress.setChecked(self.logCompress)
+        rotatelayout.addWidget(logcompress)
+
+        def rotateChanged(index):
+            logmaxsize.setEnabled(logrotate.itemData(index) == obd_logging.ROTATE_SIZE)
+            logbackups.setEnabled(index != 0)
+            logcompress.setEnabled(index != 0)
+        logrotate.currentIndexChanged.connect(rotateChanged)
+        rotateChanged(logrotate.currentIndex())
+
+        filegrouplayout = QVBoxLayout()
+        filegrouplayout.addLayout(logfilelayout)
+        filegrouplayout.addLayout(rotatelayout)
+        logfilegroup.setLayout(filegrouplayout)
         layout.addWidget(logfilegroup)
 
         okButton = QPushButton('OK')
@@ -738,32 +1760,125 @@ class MyApp(QApplication):
                     self.logger.setLevel(self.logLevel)
                     break
 
+            if loglines.value() != self.logLines:
+                self.logLines = loglines.value()
+                self.logDisplay.setMaxLines(self.logLines)
+                self.config.set('pyOBD','LOGLINES',self.logLines)
+
             newfilename = logfilename.text()
+            newsettings = (logrotate.currentData(), logmaxsize.value(),
+                           logbackups.value(), logcompress.isChecked())
+            oldsettings = (self.logRotate, self.logMaxSize, self.logBackups, self.logCompress)
 
             if logfilegroup.isChecked():
-                if not self.logToFile or self.logFile != newfilename:
-                    try:
-                        logFileHandler = logging.FileHandler(newfilename,'w')
-                    except Exception as e:
-                        self.logger.warning('Error opening log file: %s', str(e))
-                    else:
-                        if self.logToFile:
-                            self.logger.removeHandler(self.logFileHandler)
-                        self.logToFile = True
+                if not self.logToFile or self.logFile != newfilename or newsettings != oldsettings:
+                    #Close the old file first, it may be the one being reopened
+                    if self.logToFile:
+                        self.fileLog.stop()
+                    self.fileLog = self.openLogFile(newfilename, *newsettings)
+                    self.logToFile = self.fileLog is not None
+                    if self.logToFile:
                         self.logFile = newfilename
-                        self.logger.addHandler(logFileHandler)
-                        self.logFileHandler = logFileHandler
-                        self.config.set('pyOBD','LOGTOFILE',self.logToFile)
+                        self.logRotate, self.logMaxSize, self.logBackups, self.logCompress = newsettings
                         self.config.set('pyOBD','LOGFILE',self.logFile)
+                        self.config.set('pyOBD','LOGROTATE',self.logRotate)
+                        self.config.set('pyOBD','LOGMAXSIZE',self.logMaxSize)
+                        self.config.set('pyOBD','LOGBACKUPS',self.logBackups)
+                        self.config.set('pyOBD','LOGCOMPRESS',self.logCompress)
+                    self.config.set('pyOBD','LOGTOFILE',self.logToFile)
             else:
                 if self.logToFile:
                     self.logger.debug('Removing log to file.')
-                    self.logger.removeHandler(self.logFileHandler)
+                    self.fileLog.stop()
+                    self.fileLog = None
                     self.logToFile = False
                     self.config.set('pyOBD','LOGTOFILE',self.logToFile)
 
             self.write_config()
 
+    def makeTriggers(self, specs = None):
+        """Returns obd_trigger.Triggers for the ';' separated trigger specs
+        (TRIGGERS if None), or None if there are none.  Specs that cannot
+        be parsed are logged and skipped."""
+        if specs is None:
+            specs = self.TRIGGERS
+        triggers = []
+        for spec in specs.split(';'):
+            if spec.strip() == '':
+                continue
+            try:
+                triggers.append(obd_trigger.parse_trigger(spec))
+            except ValueError as e:
+                self.logger.warning('Ignoring trigger: %s', str(e))
+        if len(triggers) == 0:
+            return None
+        return obd_trigger.Triggers(self.sensorHistory, triggers, self.TRIGGERDIR,
+                                    self.TRIGGERPRE, self.TRIGGERPOST)
+
+    def setTriggerOptions(self):
+        dialog = QDialog(self.frame)
+        dialog.setWindowTitle('Capture Triggers')
+        dialog.setMinimumWidth(500)
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel('One trigger per line, e.g. 0C>4000, 7E8:05<70, rate:0D<-5 or dtc'))
+        specs = QPlainTextEdit()
+        specs.setPlainText('\n'.join(spec.strip() for spec in self.TRIGGERS.split(';') if spec.strip() != ''))
+        layout.addWidget(specs)
+
+        timelayout = QHBoxLayout()
+        timelayout.addWidget(QLabel('Seconds before:'))
+        pre = QDoubleSpinBox()
+        pre.setRange(0, 3600)
+        pre.setValue(self.TRIGGERPRE)
+        timelayout.addWidget(pre)
+        timelayout.addWidget(QLabel('Seconds after:'))
+        post = QDoubleSpinBox()
+        post.setRange(0.1, 3600)
+        post.setValue(self.TRIGGERPOST)
+        timelayout.addWidget(post)
+        layout.addLayout(timelayout)
+
+        def browseClick():
+            directory = QFileDialog.getExistingDirectory(caption='Select Capture Directory...')
+            if directory != '':
+                dirname.setText(directory)
+
+        dirlayout = QHBoxLayout()
+        dirlayout.addWidget(QLabel('Directory:'))
+        dirname = QLineEdit()
+        dirname.setText(self.TRIGGERDIR)
+        dirbrowse = QPushButton('...')
+        dirbrowse.clicked.connect(browseClick)
+        dirlayout.addWidget(dirname)
+        dirlayout.addWidget(dirbrowse,alignment=Qt.AlignRight)
+        layout.addLayout(dirlayout)
+
+        okButton = QPushButton('OK')
+        cancelButton = QPushButton('Cancel')
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addWidget(okButton)
+        buttonLayout.addWidget(cancelButton)
+        okButton.clicked.connect(dialog.accept)
+        cancelButton.clicked.connect(dialog.reject)
+        layout.addLayout(buttonLayout)
+
+        dialog.setLayout(layout)
+        r = dialog.exec()
+        if r == QDialog.Accepted:
+            self.TRIGGERS = ';'.join(line.strip() for line in specs.toPlainText().splitlines()
+                                     if line.strip() != '')
+            self.TRIGGERPRE = pre.value()
+            self.TRIGGERPOST = post.value()
+            self.TRIGGERDIR = dirname.text()
+            self.config.set('pyOBD','TRIGGERS',self.TRIGGERS)
+            self.config.set('pyOBD','TRIGGERPRE',self.TRIGGERPRE)
+            self.config.set('pyOBD','TRIGGERPOST',self.TRIGGERPOST)
+            self.config.set('pyOBD','TRIGGERDIR',self.TRIGGERDIR)
+            self.write_config()
+            if self.senprod is not None:
+                self.senprod.setTriggers(self.makeTriggers())
+
     def OnHelpVisit(self):
         webbrowser.open("http://www.obdtester.com/pyobd")
 
@@ -795,11 +1910,18 @@ See the GNU General Public License for more details.</p>
         HelpAboutDlg.setTextFormat(Qt.RichText)
         HelpAboutDlg.exec()
 
-    def OnResult(self,ecu,pid,column,data):
-        if ecu in self.sensorTables:
-            sensorTable = self.sensorTables[ecu]
-            row = sensorTable.pid_lookup[str(pid)]
-            sensorTable.item(row, column).setText(data)
+    def OnResult(self):
+        #Apply all values that changed since the last display refresh,
+        #one batch per ECU table
+        updates = {}
+        for (ecu, pid), data in self.sensorSnapshot.take().items():
+            if ecu not in updates:
+                updates[ecu] = {}
+            updates[ecu][pid] = data
+
+        for ecu, values in updates.items():
+            if ecu in self.sensorTables:
+                self.sensorTables[ecu].sensorModel.setValues(values)
 
     def OnStatus(self,event):
         if event[0] == 666: #signal, that connection falied
@@ -807,9 +1929,6 @@ See the GNU General Public License for more details.</p>
         else:
             self.status.item(event[0],event[1]).setText(event[2])
 
-    def OnTests(self,event):
-        self.OBDTests.addTableRow(3, event)
-
     def OnDtcClear(self, event):
         if event == 0:
             self.dtc.setRowCount(0)
@@ -827,32 +1946,49 @@ See the GNU General Public License for more details.</p>
 
     def OnDisconnect(self): #disconnect connection to ECU
         self.ThreadControl=666
+        self.stop() #ends polling and closes the port
         self.sensor_control_off()
 
     def OpenPort(self):
         self.nb.setCurrentWidget(self.status.parentWidget())
         self.OnStatus([0,1,"Connecting....."])
-        self.setOverrideCursor(Qt.WaitCursor)
-        QApplication.processEvents()
         self.stop()
-        if self.senprod is not None:
-            self.senprod.requestInterruption()
-            self.senprod.wait()
         self.sensorTables = {}
         self.sensorTabs.clear()
-        self.SensorProducerReady.connect(self.sensor_control_on)
-        if self.initCommunication() == 'OK':
-            self.senprod = self.sensorProducer(self)
-            self.StatusEvent.emit([0,1,"Connected"])
-            self.StatusEvent.emit([2,1,self.port.ELMver])
-            self.StatusEvent.emit([1,1,self.port.protocol])
-            for sensorTable in self.sensorTables.values():
-                sensorTable.setSensorThread(self.senprod)
-            self.senprod.start()
-        else:
-            self.StatusEvent.emit([0,1,"Connection Failed!!!!"])
+        self.sensorSnapshot = self.SensorSnapshot()
+        self.senprod = self.sensorProducer(self)
+        self.senprod.start()
+        self.displayTimer.start()
+
+    def RecordTrip(self, checked):
+        if not checked:
+            if self.senprod is not None:
+                self.senprod.setRecorder(None)
+                self.logger.info('Trip recording stopped')
+            return
+
+        if self.senprod is None or self.senprod.port is None:
+            self.logger.warning('Connect before recording a trip')
+            self.recordTripAction.setChecked(False)
+            return
+
+        filename = QFileDialog.getSaveFileName(caption='Record Trip to File...',
+                                               filter='Trip files (*%s)' % obd_trip.TRIP_EXTENSION)[0]
+        if filename == '':
+            self.recordTripAction.setChecked(False)
+            return
+        if not filename.endswith(obd_trip.TRIP_EXTENSION):
+            filename += obd_trip.TRIP_EXTENSION
+
+        try:
+            recorder = obd_trip.TripWriter(filename)
+        except OSError as e:
+            self.logger.warning('Error opening trip file: %s', str(e))
+            self.recordTripAction.setChecked(False)
+            return
 
-        self.restoreOverrideCursor()
+        self.senprod.setRecorder(recorder)
+        self.logger.info('Recording trip to %s', filename)
 
     def onTestDTC(self):
         self.DTCClearEvent.emit(0) #clear list
@@ -860,53 +1996,67 @@ See the GNU General Public License for more details.</p>
         self.DTCEvent.emit(['P0001', 'Active', 'Test DTC'])
 
     def GetDTC(self):
+        #The sensor producer owns the port while connected
+        if self.senprod is not None:
+            self.senprod.getDTC()
+
+    def OnDtcRead(self, DTCCodes):
         self.DTCClearEvent.emit(0) #clear list
-        DTCCodes=self.port.get_dtc()
 
         if DTCCodes is None: #Communication Issue
             self.OnDisconnect()
+            return
 
         for ecu in DTCCodes:
             self.DTCEvent.emit(['DTCs from ECU%d' % self.port.getEcuNum(ecu)])
             if len(DTCCodes[ecu]) == 0:
                 self.DTCEvent.emit(["No DTC codes (codes cleared)"])
             for code in DTCCodes[ecu]:
-                self.DTCEvent.emit([code[1],code[0],pcodes[code[1]]])
+                self.DTCEvent.emit([code[1],code[0],dtc_store.describe(code[1])])
 
         self.nb.setCurrentWidget(self.DTCpanel.parentWidget())
 
     def CodeLookup(self):
-        id = 0
-        diag = QDialog(self.frame)
-        diag.setWindowTitle('Diagnostic Trouble Codes')
-
-        tree = QTreeWidget(diag)
-
-        root = QTreeWidgetItem(tree)
-        root.setText(0,"Code Reference")
-        proot = root; # tree.AppendItem(root,"Powertrain (P) Codes")
-        codes = sorted(pcodes.keys())
-        group = ''
-        for c in codes:
-            if c[:3] != group:
-                group_root = QTreeWidgetItem(proot)
-                group_root.setText(0,c[:3]+"XX")
-                proot.addChild(group_root)
-                group = c[:3]
-            leaf = QTreeWidgetItem(group_root)
-            leaf.setText(0,c)
-            group_root.addChild(leaf)
-            codeText = QTreeWidgetItem(leaf)
-            codeText.setText(0,pcodes[c])
-            leaf.addChild(codeText)
-
-        layout = QHBoxLayout(diag)
-        layout.addWidget(tree)
-        tree.header().hide()
-        diag.setLayout(layout)
-        diag.resize(400,500)
-        diag.show()
-
+        #The dialog is built once and reused, so opening it again costs
+        #nothing and does not grow memory.
+        if self.codeLookupDialog is None:
+            diag = QDialog(self.frame)
+            diag.setWindowTitle('Diagnostic Trouble Codes')
+
+            model = self.CodeTreeModel(dtc_store)
+            tree = QTreeView(diag)
+            tree.setModel(model)
+            tree.header().hide()
+            tree.setUniformRowHeights(True)
+
+            search = QLineEdit(diag)
+            search.setPlaceholderText('Search codes or descriptions')
+            searchTimer = QTimer(diag)
+            searchTimer.setSingleShot(True)
+            searchTimer.setInterval(150)
+
+            def applySearch():
+                model.setFilter(search.text())
+                top = model.index(0, 0)
+                tree.expand(top)
+                #Open up all groups when there are few matches
+                if model.matches is not None and model.matchCount() <= 50:
+                    for row in range(model.rowCount(top)):
+                        tree.expand(model.index(row, 0, top))
+
+            search.textChanged.connect(searchTimer.start)
+            searchTimer.timeout.connect(applySearch)
+
+            layout = QVBoxLayout(diag)
+            layout.addWidget(search)
+            layout.addWidget(tree)
+            diag.setLayout(layout)
+            diag.resize(400,500)
+            self.codeLookupDialog = diag
+
+        self.codeLookupDialog.show()
+        self.codeLookupDialog.raise_()
+        self.codeLookupDialog.activateWindow()
 
     def QueryClear(self):
         id = 0
@@ -919,7 +2069,10 @@ See the GNU General Public License for more details.</p>
             self.ClearDTC()
 
     def ClearDTC(self):
-        self.port.clear_dtc()
+        if self.senprod is not None:
+            self.senprod.clearDTC()
+
+    def OnDtcCleared(self):
         self.DTCClearEvent.emit(0) #clear list
         self.nb.setCurrentWidget(self.DTCpanel.parentWidget())
 
@@ -956,6 +2109,16 @@ See the GNU General Public License for more details.</p>
         reconnectCtrl = self.MyNumberInput(str(self.RECONNATTEMPTS))
         sizer.addRow('Reconnect attempts:', reconnectCtrl)
 
+        #share of polling bandwidth given to the ECU tab being viewed
+        focusShareCtrl = self.MyNumberInput(str(self.FOCUSSHARE), 30)
+        focusShareCtrl.validator().setTop(100)
+        sizer.addRow('Selected ECU share (%):', focusShareCtrl)
+
+        #raw serial transcript, blank to disable
+        transcriptCtrl = QLineEdit(self.TRANSCRIPT)
+        transcriptCtrl.setPlaceholderText('(off)')
+        sizer.addRow('Serial transcript file:', transcriptCtrl)
+
         #set actual serial port choice
         if (self.COMPORT != 0) and (self.COMPORT in ports):
             comportDropdown.setCurrentIndex(ports.index(self.COMPORT))
@@ -1022,11 +2185,29 @@ See the GNU General Public License for more details.</p>
 
             self.config.set("pyOBD","RECONNATTEMPTS",self.RECONNATTEMPTS)
 
+            #set and save FOCUSSHARE
+            try:
+                self.FOCUSSHARE = min(int(focusShareCtrl.text()), 100)
+            except ValueError:
+                pass
+
+            self.config.set("pyOBD","FOCUSSHARE",self.FOCUSSHARE)
+
+            self.TRANSCRIPT = transcriptCtrl.text().strip()
+            self.config.set("pyOBD","TRANSCRIPT",self.TRANSCRIPT)
+
             #write configuration to cfg file
             self.write_config()
 
     def exitCleanup(self):
         self.ThreadControl=666
+        if self.senprod is not None:
+            self.senprod.stop()
+            self.senprod.wait()
+        if self.port is not None: #finishes the serial transcript, if any
+            self.port.close()
+        if self.fileLog is not None:
+            self.fileLog.stop()
 
     def OnExit(self):
         self.quit()
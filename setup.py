@@ -25,7 +25,11 @@ setuptools.setup(
         'pyserial',
         'PyQt5'
     ],
+    extras_require={
+        'analysis': ['numpy'],
+    },
     scripts=[
-        'pyobd'
+        'pyobd',
+        'pyobd-cli'
     ],
 )
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd2_codes.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import json
+import hashlib
+import unittest
+
+from pyobd_beardedone55.obd2_codes import CodeTable, DTCStore, pcodes
+
+#Number and SHA-256 of the sorted (code, description) pairs of the
+#pcodes dictionary that obd2_codes.tsv replaced
+PCODES_COUNT = 2066
+PCODES_SHA256 = '39ec6e40c6cec7dec62f7ec38a9a0e051a874432e04a54a5d5f4093dacdaf19d'
+
+class CodeTableTest(unittest.TestCase):
+    def test_same_as_dictionary(self):
+        table = CodeTable(pcodes.filename)
+        self.assertIsNone(table.table)
+        self.assertEqual(len(table), PCODES_COUNT)
+        items = json.dumps(sorted(table.items())).encode('utf-8')
+        self.assertEqual(hashlib.sha256(items).hexdigest(), PCODES_SHA256)
+
+    def test_lookup(self):
+        table = CodeTable(pcodes.filename)
+        self.assertEqual(table['P0300'], 'Random/Multiple Cylinder Misfire Detected')
+        self.assertIsNotNone(table.table)
+        self.assertIn('U0431', table)
+        self.assertNotIn('P3FFF', table)
+        self.assertIsNone(table.get('P3FFF'))
+        with self.assertRaises(KeyError):
+            table['P3FFF']
+
+class DTCStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = DTCStore({
+            'P0300': 'Random/Multiple Cylinder Misfire Detected',
+            'P0301': 'Cylinder 1 Misfire Detected',
+            'P0420': 'Catalyst System Efficiency Below Threshold',
+            'P0171': 'System Too Lean',
+        })
+        self.store.add({'c1234': 'Brake Pressure Sensor Circuit', 'U0100': 'Lost Communication With ECM'})
+
+    def test_prefix(self):
+        self.assertEqual([code for code, text in self.store.prefix('p03')], ['P0300', 'P0301'])
+        self.assertEqual(self.store.prefix('P05'), [])
+        self.assertEqual(len(self.store.prefix('')), 6)
+
+    def test_groups(self):
+        self.assertEqual(self.store.groups('P'), ['P01', 'P03', 'P04'])
+        self.assertEqual(self.store.groups('', 1), ['C', 'P', 'U'])
+
+    def test_category(self):
+        self.assertEqual(self.store.category('p0300'), 'Ignition System or Misfire')
+        self.assertEqual(self.store.category('C1234'), 'Chassis - Manufacturer Specific')
+        self.assertEqual(self.store.category('P3000'), 'Powertrain - Manufacturer Specific')
+        self.assertEqual(self.store.category('B0001'), 'Body')
+        self.assertEqual(self.store.category('P2A00'), 'Fuel and Air Metering and Auxiliary Emission Controls')
+        self.assertEqual(self.store.category('P0B20'), 'Hybrid Propulsion')
+        self.assertEqual(self.store.category('P3400'), 'Cylinder Deactivation')
+        self.assertEqual(self.store.category('P3500'), 'Powertrain - ISO/SAE Reserved')
+        self.assertEqual(self.store.category('u0100'), 'Network Communication')
+        self.assertEqual(self.store.category('U1000'), 'Network - Manufacturer Specific')
+        self.assertEqual(self.store.category('C3000'), 'Chassis - ISO/SAE Reserved')
+        self.assertEqual(self.store.describe('U0401'), 'Unknown code (Network Data)')
+        self.assertEqual(self.store.category('X0001'), 'Unknown')
+
+    def test_describe(self):
+        self.assertEqual(self.store.describe('c1234'), 'Brake Pressure Sensor Circuit')
+        self.assertEqual(self.store.describe('U2000'), 'Unknown code (Network - Manufacturer Specific)')
+
+    def test_search(self):
+        search = lambda text, limit = None: [code for code, desc in self.store.search(text, limit)]
+        self.assertEqual(search('misfire'), ['P0300', 'P0301'])
+        self.assertEqual(search('MISF cyl 1'), ['P0301'])
+        self.assertEqual(search('misfire', 1), ['P0300'])
+        self.assertEqual(search('p04'), ['P0420'])
+        self.assertEqual(search('lean misfire'), [])
+        self.assertEqual(search('nothing'), [])
+        self.assertEqual(search(''), [])
+
+    def test_add_replaces(self):
+        self.assertIn('P0171', self.store)
+        self.store.add({'P0171': 'System Too Lean (Bank 1)'})
+        self.assertEqual(self.store.get('P0171'), 'System Too Lean (Bank 1)')
+        self.assertEqual(len(self.store), 6)
+
+    def test_search_matches_scan(self):
+        store = DTCStore(pcodes)
+        for text in ('sensor circuit', 'misfire', 'o2 heat', 'throttle pedal switch'):
+            words = text.split()
+            expected = [code for code in sorted(pcodes) if all(
+                any(w.startswith(word) for w in store.WORD.findall(pcodes[code].lower())) for word in words)]
+            self.assertEqual([code for code, desc in store.search(text)], expected, text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_cli.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import io
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+from contextlib import redirect_stdout
+
+from pyobd_beardedone55 import obd_io, obd_cli
+from pyobd_beardedone55.obd_trip import TripWriter
+
+from test_obd_transcript import FakeElm, Notify, session
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        #No configuration file
+        self.environ = mock.patch.dict(os.environ, {'HOME': self.directory})
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            obd_cli.main(list(argv))
+        return out.getvalue()
+
+    def test_imports(self):
+        #The console front end must start without PyQt5, and loads the
+        #modules of other commands only when they run
+        code = ('import sys; from pyobd_beardedone55 import obd_cli; '
+                'print(sorted(m for m in sys.modules if m.split(".")[0] in ("PyQt5", "numpy") or '
+                'm.split(".")[-1] in ("obd_trip", "obd_stats", "obd_trigger", "obd_logging", '
+                '"obd_datalog", "obd_summary", "obd2_codes")))')
+        result = subprocess.run([sys.executable, '-c', code], cwd = ROOT, check = True,
+                                stdout = subprocess.PIPE, universal_newlines = True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_parse_pids(self):
+        self.assertEqual(obd_cli.parse_pids('0c, $0D,0105'), [0x0C, 0x0D, 0x05])
+        with self.assertRaises(argparse.ArgumentTypeError):
+            obd_cli.parse_pids('1FF')
+
+    def test_format_stats(self):
+        stats = {'count': 2, 'min': 1.0, 'max': 3.0, 'mean': 2.0, 'stddev': 1.41421}
+        line = obd_cli.format_stats('7E8', 0x0C, 'Engine RPM', 'RPM', stats)
+        self.assertEqual(line.split(), ['7E8', '$0C', 'Engine', 'RPM', '2', 'min', '1', 'max', '3',
+                                        'mean', '2', 'sd', '1.41421', 'RPM'])
+        stats['percentiles'] = {50: 2.0, 95: 2.9}
+        line = obd_cli.format_stats('7E8', 0x0C, 'Engine RPM', 'RPM', stats)
+        self.assertIn(' p50 2 p95 2.9 ', line)
+
+    def test_replay(self):
+        #Commands run against a transcript of the fake ELM327
+        transcript = os.path.join(self.directory, 'session.ptr')
+        port = obd_io.OBDPort('fake', 0, Notify(), 1, 0, transcript = transcript,
+                              transport = FakeElm())
+        session(port)
+        port.close()
+
+        out = self.run_cli('--replay', transcript, 'connect')
+        self.assertIn('Protocol:   ISO 15765-4 (CAN 11/500)', out)
+        self.assertIn('ECU0:       7E8', out)
+        out = self.run_cli('--replay', transcript, 'dtc')
+        self.assertEqual(out.splitlines()[0], 'DTCs from ECU0 (7E8):')
+        self.assertIn('P0171', out)
+        self.assertIn('P0300', out)
+        out = self.run_cli('--replay', transcript, '-e', '7E8', 'live', '0C,0D', '-n', '2')
+        lines = out.splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].endswith('7E8 $0C Engine RPM: 1726.0 RPM'))
+
+    def test_summary(self):
+        #summary needs no interface
+        filename = os.path.join(self.directory, 'trip.trip')
+        writer = TripWriter(filename)
+        for i in range(10):
+            writer.add('7E8', 0x0C, 800.0 + i, writer.start + i, 'Engine RPM', 'RPM')
+        writer.close()
+        out = self.run_cli('summary', filename)
+        self.assertIn('trip.trip (trip)', out)
+        self.assertIn('7E8 $0C Engine RPM', out)
+        with self.assertRaises(SystemExit):
+            self.run_cli('summary', os.path.join(self.directory, 'missing.trip'))
+
+if __name__ == "__main__":
+    unittest.main()
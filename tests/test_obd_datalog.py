@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_datalog.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+from pyobd_beardedone55 import obd_io
+from pyobd_beardedone55.obd_datalog import DataLogger
+from pyobd_beardedone55.obd_trip import TripReader
+
+from test_obd_transcript import FakeElm, Notify
+
+class DataLoggerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.port = obd_io.OBDPort('fake', 0, Notify(), 1, 0, transport = FakeElm())
+        self.assertEqual(self.port.State, 1)
+
+    def tearDown(self):
+        self.port.close()
+        shutil.rmtree(self.directory)
+
+    def test_csv(self):
+        filename = os.path.join(self.directory, 'log.csv')
+        #ECUs with nothing to log are dropped
+        logger = DataLogger(self.port, {'7E8': [0x0C, 0x0D], '7E9': []}, filename)
+        self.assertEqual(list(logger.sensors), ['7E8'])
+        logger.open()
+        self.assertEqual(logger.poll_once(), 2)
+        self.assertEqual(logger.poll_once(), 2)
+        logger.close()
+        self.assertEqual((logger.samples, logger.requests), (4, 2))
+
+        with open(filename, newline = '') as f:
+            lines = f.readlines()
+        self.assertEqual(lines[0], '# pyOBD data log\n')
+        self.assertTrue(lines[1].startswith('# wall_clock_start: '))
+        self.assertTrue(lines[2].startswith('# monotonic_start: '))
+        rows = list(csv.reader(lines[3:]))
+        self.assertEqual(rows[0], DataLogger.COLUMNS)
+        self.assertEqual([row[1:] for row in rows[1:]],
+                         [['7E8', '0C', 'Engine RPM', '1726.0', 'RPM'],
+                          ['7E8', '0D', 'Vehicle Speed', '31.1', 'MPH']] * 2)
+        times = [float(row[0]) for row in rows[1:]]
+        self.assertEqual(times, sorted(times))
+        self.assertEqual(logger.stats.get('7E8', 0x0C).summary()['mean'], 1726.0)
+
+    def test_trip(self):
+        filename = os.path.join(self.directory, 'log.trip')
+        logger = DataLogger(self.port, {'7E8': [0x0C, 0x0D]}, filename)
+        logger.open()
+        for i in range(3):
+            self.assertEqual(logger.poll_once(), 2)
+        logger.close()
+
+        reader = TripReader(filename)
+        self.assertEqual(reader.info, {'vin': {'7E8': ''},
+                                       'dtc': {'7E8': [['Active', 'P0171'], ['Active', 'P0300']]}})
+        self.assertEqual(reader.columns, [('7E8', 0x0C, 'Engine RPM', 'RPM'),
+                                          ('7E8', 0x0D, 'Vehicle Speed', 'MPH')])
+        self.assertEqual(reader.read('7E8', 0x0C)[1].tolist(), [1726.0] * 3)
+        #The footer has the logger's percentiles
+        self.assertEqual(reader.columnStats[0]['percentiles'], {50: 1726.0, 95: 1726.0, 99: 1726.0})
+        self.assertEqual(logger.stats.get('7E8', 0x0D).count, 3)
+
+    def test_run(self):
+        filename = os.path.join(self.directory, 'log.csv')
+        logger = self.port.log(0x0C, filename, duration = 0.05)
+        self.assertFalse(logger.running)
+        self.assertIsNone(logger.file)
+        self.assertGreater(logger.samples, 0)
+        with open(filename) as f:
+            self.assertEqual(len(f.readlines()), 4 + logger.samples)
+        self.assertGreater(logger.rate(), 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_decode.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pyobd_beardedone55.obd_sensors import SENSORS, Scaling
+
+@unittest.skipIf(numpy is None, 'requires NumPy')
+class DecodeTest(unittest.TestCase):
+    def setUp(self):
+        from pyobd_beardedone55 import obd_decode
+        self.decode = obd_decode
+
+    def test_matches_scalar(self):
+        result = self.decode.check()
+        self.assertEqual({pid: n for pid, n in result.items() if n != 0}, {})
+
+    def test_sizes_match_sensors(self):
+        for pid, decoder in self.decode.DECODERS.items():
+            self.assertEqual(decoder.size, SENSORS[pid].length, '$%02X' % pid)
+            self.assertLessEqual(decoder.used, decoder.size, '$%02X' % pid)
+
+    def test_timing_advance(self):
+        payload = numpy.array([[0x90]], dtype = numpy.uint8)
+        self.assertEqual(self.decode.decode(0x0E, payload)[0], 8.0)
+        self.assertEqual(SENSORS[0x0E].value.number('90'), 8.0)
+        with self.assertRaises(ValueError):
+            self.decode.decode(0x0E, numpy.array([[0x90, 0x00]], dtype = numpy.uint8))
+
+class SensorTest(unittest.TestCase):
+    def test_scaling_fits_length(self):
+        for pid, sensor in enumerate(SENSORS):
+            if isinstance(sensor.value, Scaling):
+                self.assertLessEqual(sensor.value.size, sensor.length, '$%02X' % pid)
+
+if __name__ == "__main__":
+    unittest.main()
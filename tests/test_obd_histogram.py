@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_histogram.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import os
+import csv
+import tempfile
+import unittest
+
+from pyobd_beardedone55.obd_histogram import Histogram2D, OperatingMaps, MAPS
+from pyobd_beardedone55.obd_trip import TripWriter
+
+class Histogram2DTest(unittest.TestCase):
+    def test_cells(self):
+        h = Histogram2D('rpm_load', '7E8', *MAPS['rpm_load'])
+        h.add(0.0, 0.0, 5)
+        h.add(7999.0, 99.9, 7)
+        h.add(-100.0, 150.0, 11)    #Outside the range: edge cells
+        self.assertEqual(h.counts[0], 5)
+        self.assertEqual(h.counts[19 * 32 + 31], 7)
+        self.assertEqual(h.counts[19 * 32], 11)
+        self.assertEqual(h.total(), 23)
+        self.assertEqual(h.edges(h.y)[:3], [0.0, 5.0, 10.0])
+
+    def test_merge(self):
+        a = Histogram2D('rpm_load', '7E8', *MAPS['rpm_load'])
+        b = Histogram2D('rpm_load', '7E8', *MAPS['rpm_load'])
+        a.add(800.0, 20.0, 100)
+        b.add(800.0, 20.0, 50)
+        b.add(3000.0, 60.0, 25)
+        a.merge(b)
+        self.assertEqual(a.total(), 175)
+        self.assertEqual(a.counts[4 * 32 + 3], 150)
+        with self.assertRaises(ValueError):
+            a.merge(Histogram2D('speed_throttle', '7E8', *MAPS['speed_throttle']))
+
+class OperatingMapsTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def feed(self, maps, t0 = 0.0):
+        for i in range(100):
+            t = t0 + i * 0.1
+            maps.add_results('7E8', {0x0C: ('Engine RPM', str(1000.0 + 20 * i), 'RPM'),
+                                     0x04: ('Load', '40.0', ''),
+                                     0x0D: ('Speed', 'NODATA', 'MPH')}, t)
+
+    def test_time_credit(self):
+        maps = OperatingMaps()
+        self.feed(maps)
+        self.assertEqual(maps.keys(), [('7E8', 'rpm_load')])
+        self.assertEqual(maps.get('7E8', 'rpm_load').total(), 9900)
+        #A gap longer than MAP_GAP is not credited
+        self.feed(maps, 100.0)
+        self.assertEqual(maps.get('7E8', 'rpm_load').total(), 19800)
+
+    def test_save_load(self):
+        maps = OperatingMaps()
+        self.feed(maps)
+        maps.update('7E9', {0x0D: 50.0, 0x11: 20.0}, 0.0)
+        maps.update('7E9', {0x0D: 60.0}, 0.5)
+        maps.save(self.filename)
+        loaded = OperatingMaps.load(self.filename)
+        self.assertEqual(sorted(loaded.keys()), sorted(maps.keys()))
+        for key in maps.keys():
+            self.assertEqual(loaded.get(*key).to_dict(), maps.get(*key).to_dict())
+
+        loaded.merge(maps)
+        loaded.merge(OperatingMaps())
+        for key in maps.keys():
+            self.assertEqual(list(loaded.get(*key).counts), [2 * ms for ms in maps.get(*key).counts])
+
+    def test_csv(self):
+        maps = OperatingMaps()
+        self.feed(maps)
+        maps.write_csv(self.filename)
+        with open(self.filename, newline = '') as f:
+            rows = list(csv.DictReader(f))
+        self.assertGreater(len(rows), 1)
+        self.assertEqual({row['map'] for row in rows}, {'rpm_load'})
+        self.assertAlmostEqual(sum(float(row['seconds']) for row in rows), 9.9)
+
+    def test_trip_matches_live(self):
+        live = OperatingMaps()
+        writer = TripWriter(self.filename)
+        for i in range(300):
+            t = writer.start + i * 0.1
+            results = {0x0C: ('Engine RPM', str(800.0 + 10 * i), 'RPM'), 0x04: ('Load', str(i % 100), ''),
+                       0x0D: ('Speed', str(i % 120), 'MPH'), 0x11: ('Throttle', str(i % 90), '%')}
+            live.add_results('7E8', results, t)
+            writer.add_results('7E8', results, t)
+        writer.close()
+
+        maps = OperatingMaps()
+        maps.add_trip(self.filename)
+        self.assertEqual(sorted(maps.keys()), sorted(live.keys()))
+        for key in live.keys():
+            self.assertEqual(list(maps.get(*key).counts), list(live.get(*key).counts))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_history.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import math
+import random
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pyobd_beardedone55.obd_history import RingBuffer, History, Decimator, SLACK
+
+class RingBufferTest(unittest.TestCase):
+    def test_fill(self):
+        ring = RingBuffer(10)
+        self.assertIsNone(ring.last())
+        self.assertEqual(len(ring.window()[0]), 0)
+        for i in range(4):
+            ring.append(float(i), i * 10.0)
+        self.assertEqual(len(ring), 4)
+        self.assertEqual(ring.last(), (3.0, 30.0))
+        times, values = ring.window()
+        self.assertEqual((times.tolist(), values.tolist()), ([0.0, 1.0, 2.0, 3.0], [0.0, 10.0, 20.0, 30.0]))
+
+    def test_wrap(self):
+        ring = RingBuffer(10)
+        count = 3 * ring.size + 7
+        for i in range(count):
+            ring.append(float(i), -float(i))
+        self.assertEqual((len(ring), ring.total), (10, count))
+        self.assertEqual(ring.last(), (count - 1.0, 1.0 - count))
+        times, values = ring.window()
+        #The newest samples, oldest first, in one contiguous slice
+        self.assertEqual(times.tolist(), [float(i) for i in range(count - 10, count)])
+        self.assertEqual(values.tolist(), [-t for t in times.tolist()])
+        self.assertTrue(times.contiguous)
+        #Ranges are inclusive at both ends
+        times, values = ring.window(count - 5, count - 3)
+        self.assertEqual(times.tolist(), [count - 5.0, count - 4.0, count - 3.0])
+        self.assertEqual(len(ring.window(None, 0.0)[0]), 0)
+        ring.clear()
+        self.assertEqual(len(ring), 0)
+        self.assertIsNone(ring.last())
+
+    def test_view_lifetime(self):
+        #A view survives SLACK more appends, wherever the head is
+        for start in (0, 5, SLACK, SLACK + 9):
+            ring = RingBuffer(10)
+            for i in range(start + 10):
+                ring.append(float(i), float(i))
+            times, values = ring.window()
+            expected = times.tolist()
+            for i in range(SLACK):
+                ring.append(1e6 + i, 0.0)
+            self.assertEqual(times.tolist(), expected, msg = start)
+            self.assertEqual(values.tolist(), expected, msg = start)
+
+    @unittest.skipIf(numpy is None, 'requires NumPy')
+    def test_arrays(self):
+        ring = RingBuffer(10)
+        for i in range(25):
+            ring.append(float(i), i * 2.0)
+        times, values = ring.arrays(20.0)
+        self.assertEqual(times.tolist(), [20.0, 21.0, 22.0, 23.0, 24.0])
+        self.assertEqual(values.tolist(), [40.0, 42.0, 44.0, 46.0, 48.0])
+        self.assertFalse(values.flags.owndata)
+
+class HistoryTest(unittest.TestCase):
+    def test_add_results(self):
+        history = History(100)
+        results = {0x0C: ('Engine RPM', '1726.0', 'RPM'), 0x0D: ('Vehicle Speed', 'NODATA', 'MPH')}
+        self.assertEqual(history.add_results('7E8', results, 1.0), 1)
+        history.add('7E8', 0x0C, 1800.0, 2.0)
+        self.assertEqual(history.keys(), [('7E8', 0x0C)])
+        self.assertEqual(history.window('7E8', 0x0C)[1].tolist(), [1726.0, 1800.0])
+        self.assertEqual(len(history.window('7E9', 0x0C)[0]), 0)
+        self.assertIsNone(history.buffer('7E8', 0x0D))
+        self.assertEqual(history.memory(), 32 * (100 + SLACK))
+
+def buckets(times, values, width, start):
+    """Returns [bucket, min, max, first, last] of the samples from the
+    bucket holding start on, computed from scratch."""
+    result = {}
+    for t, v in zip(times, values):
+        i = math.floor(t / width)
+        if i < math.floor(start / width):
+            continue
+        if i in result:
+            bucket = result[i]
+            bucket[1] = min(bucket[1], v)
+            bucket[2] = max(bucket[2], v)
+            bucket[4] = v
+        else:
+            result[i] = [i, v, v, v, v]
+    return [result[i] for i in sorted(result)]
+
+class DecimatorTest(unittest.TestCase):
+    def test_incremental(self):
+        rand = random.Random(1)
+        ring = RingBuffer(5000)
+        decimator = Decimator(ring, 0.5)
+        times = []
+        values = []
+        t = 0.0
+        #Samples arrive between redraws of a 20 s plot
+        for redraw in range(60):
+            for i in range(rand.randrange(0, 40)):
+                t += rand.uniform(0.001, 0.2)
+                v = rand.uniform(0.0, 100.0)
+                ring.append(t, v)
+                times.append(t)
+                values.append(v)
+            start = max(0.0, t - 20.0)
+            self.assertEqual(list(map(list, decimator.update(start))),
+                             buckets(times, values, 0.5, start), msg = redraw)
+
+    def test_min_max(self):
+        ring = RingBuffer(100)
+        decimator = Decimator(ring, 1.0)
+        for t, v in ((0.2, 5.0), (0.5, 9.0), (0.9, 1.0), (1.0, 4.0), (2.5, 6.0)):
+            ring.append(t, v)
+        self.assertEqual(list(decimator.update(0.0)),
+                         [[0, 1.0, 9.0, 5.0, 1.0], [1, 4.0, 4.0, 4.0, 4.0], [2, 6.0, 6.0, 6.0, 6.0]])
+        #New samples extend the last bucket; buckets before start are dropped
+        ring.append(2.7, 8.0)
+        ring.append(2.8, 2.0)
+        self.assertEqual(list(decimator.update(1.5)),
+                         [[1, 4.0, 4.0, 4.0, 4.0], [2, 2.0, 8.0, 6.0, 2.0]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_stats.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import random
+import statistics
+import threading
+import unittest
+
+from pyobd_beardedone55.obd_stats import P2Quantile, RunningStats, Stats
+
+def percentile(values, p):
+    """Exact percentile, interpolating between closest ranks."""
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    i = int(k)
+    if i + 1 >= len(values):
+        return values[-1]
+    return values[i] + (values[i + 1] - values[i]) * (k - i)
+
+class RunningStatsTest(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(1)
+        self.samples = {
+            'uniform': [rand.uniform(0.0, 8000.0) for i in range(20000)],
+            'normal': [rand.gauss(90.0, 4.0) for i in range(20000)],
+            'offset': [1e9 + rand.uniform(0.0, 1.0) for i in range(5000)],
+        }
+
+    def test_exact_moments(self):
+        for name, values in self.samples.items():
+            stats = RunningStats()
+            for x in values:
+                stats.add(x)
+            self.assertEqual(stats.count, len(values))
+            self.assertEqual((stats.min, stats.max), (min(values), max(values)))
+            self.assertAlmostEqual(stats.mean, statistics.fmean(values), delta = 1e-9 * abs(stats.mean))
+            self.assertAlmostEqual(stats.variance(), statistics.variance(values),
+                                   delta = 1e-6 * statistics.variance(values), msg = name)
+
+    def test_extend_matches_add(self):
+        for name, values in self.samples.items():
+            one = RunningStats()
+            for x in values:
+                one.add(x)
+            batches = RunningStats()
+            for i in range(0, len(values), 4096):
+                batches.extend(values[i:i + 4096])
+            batches.extend([])
+            self.assertEqual(batches.count, one.count)
+            self.assertEqual((batches.min, batches.max), (one.min, one.max))
+            self.assertAlmostEqual(batches.mean, one.mean, delta = 1e-9 * abs(one.mean))
+            self.assertAlmostEqual(batches.variance(), one.variance(), delta = 1e-6 * one.variance())
+            self.assertEqual(batches.percentiles(), one.percentiles())
+
+    def test_percentile_estimates(self):
+        for name, values in self.samples.items():
+            stats = RunningStats()
+            stats.extend(values)
+            spread = max(values) - min(values)
+            for p, estimate in stats.percentiles().items():
+                self.assertAlmostEqual(estimate, percentile(values, p), delta = 0.01 * spread,
+                                       msg = '%s p%d' % (name, p))
+
+    def test_few_values(self):
+        values = [5.0, 1.0, 4.0]
+        for p in (0, 25, 50, 95, 100):
+            q = P2Quantile(p)
+            for x in values:
+                q.add(x)
+            self.assertEqual(q.value(), percentile(values, p))
+        self.assertIsNone(P2Quantile(50).value())
+        stats = RunningStats()
+        self.assertEqual(stats.summary(), {'count': 0})
+        stats.add(3.0)
+        self.assertEqual(stats.variance(), 0.0)
+        self.assertEqual(stats.summary()['percentiles'], {50: 3.0, 95: 3.0, 99: 3.0})
+
+    def test_constant(self):
+        stats = RunningStats()
+        stats.extend([70.0] * 1000)
+        self.assertEqual(stats.variance(), 0.0)
+        self.assertEqual(set(stats.percentiles().values()), {70.0})
+
+class StatsTest(unittest.TestCase):
+    def test_add_results(self):
+        stats = Stats()
+        results = {0x0C: ('Engine RPM', '1726.0', 'RPM'), 0x01: ('Status', {'MIL': 0}, ''),
+                   0x0D: ('Vehicle Speed', 'NODATA', 'MPH')}
+        self.assertEqual(stats.add_results('7E8', results), 1)
+        self.assertEqual(stats.add_results('7E8', {0x0C: ('Engine RPM', '1800.0', 'RPM')}), 1)
+        self.assertEqual(stats.keys(), [('7E8', 0x0C)])
+        self.assertEqual(stats.get('7E8', 0x0C).mean, 1763.0)
+        self.assertIsNone(stats.get('7E9', 0x0C))
+        stats.clear()
+        self.assertEqual(stats.keys(), [])
+
+    def test_extend(self):
+        stats = Stats(quantiles = ())
+        stats.extend('7E8', 0x0C, [])
+        self.assertEqual(stats.keys(), [])
+        stats.extend('7E8', 0x0C, [1.0, 2.0])
+        stats.extend('7E8', 0x0C, [3.0])
+        self.assertEqual(stats.get('7E8', 0x0C).summary(),
+                         {'count': 3, 'min': 1.0, 'max': 3.0, 'mean': 2.0, 'variance': 1.0,
+                          'stddev': 1.0, 'percentiles': {}})
+
+    def test_concurrent_reader(self):
+        #A reader, like the GUI statistics table, must only see complete
+        #statistics while the producer adds values
+        stats = Stats()
+        done = threading.Event()
+        errors = []
+        def read():
+            while not done.is_set():
+                for ecu, pid in stats.keys():
+                    series = stats.get(ecu, pid)
+                    if series is None:  #cleared since keys()
+                        continue
+                    summary = series.summary()
+                    if summary['count'] == 0 or summary['min'] is None or \
+                       None in summary['percentiles'].values():
+                        errors.append(summary)
+        reader = threading.Thread(target = read)
+        reader.start()
+        try:
+            for i in range(200):
+                for pid in range(0x04, 0x20):
+                    stats.add('7E8', pid, float(i))
+                stats.clear()
+        finally:
+            done.set()
+            reader.join()
+        self.assertEqual(errors, [])
+
+if __name__ == "__main__":
+    unittest.main()
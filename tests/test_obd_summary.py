@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_summary.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import os
+import json
+import struct
+import shutil
+import logging
+import tempfile
+import unittest
+
+from pyobd_beardedone55 import obd_io, obd_trip
+from pyobd_beardedone55.obd_io import data_bytes, decode_vin, parse_dtc_data
+from pyobd_beardedone55.obd_summary import (summarize_files, summarize_transcript, trip_tasks,
+                                            TRIP, TRANSCRIPT)
+
+from test_obd_transcript import FakeElm, Notify, session
+from test_obd_trip import make_columns, write_trip
+
+LOGGER = logging.getLogger('PyOBD')
+
+def remove_footer_stats(filename):
+    """Rewrites the footer of a trip file without column statistics, as
+    files were written before they were kept."""
+    with open(filename, 'r+b') as f:
+        f.seek(-obd_trip.TRAILER.size, 2)
+        footer, count, end = obd_trip.TRAILER.unpack(f.read(obd_trip.TRAILER.size))
+        f.seek(footer)
+        length = struct.unpack('<I', f.read(4))[0]
+        table = json.loads(f.read(length).decode())
+        entries = f.read(obd_trip.CHUNK_ENTRY.size * count)
+        del table['stats']
+        table = json.dumps(table).encode()
+        f.seek(footer)
+        f.write(struct.pack('<I', len(table)) + table + entries)
+        f.write(obd_trip.TRAILER.pack(footer, count, end))
+        f.truncate()
+
+class ParseTest(unittest.TestCase):
+    VIN = '1G1JC5444R7252367'
+
+    def test_vin_can(self):
+        lines = ['7E8 10 14 49 02 01 31 47 31', '7E8 21 4A 43 35 34 34 34 52',
+                 '7E8 22 37 32 35 32 33 36 37']
+        self.assertEqual(decode_vin(data_bytes(lines, True)['7E8'], True, LOGGER), self.VIN)
+        #Frames out of order
+        self.assertEqual(decode_vin(data_bytes(lines[::-1], True)['7E8'], True, LOGGER), self.VIN)
+        with self.assertLogs('PyOBD', 'WARNING'):
+            self.assertEqual(decode_vin(data_bytes(['7E8 03 7F 09 12'], True)['7E8'], True, LOGGER), '')
+
+    def test_vin_iso(self):
+        #Five messages of mode, PID, message number and four bytes; the
+        #first is padded to hold one character
+        text = self.VIN.encode().hex().upper()
+        chars = [text[i:i + 2] for i in range(0, len(text), 2)]
+        res = ['49', '02', '01', '00', '00', '00', chars[0]]
+        for n in range(4):
+            res += ['49', '02', '%02X' % (n + 2)] + chars[1 + 4 * n:5 + 4 * n]
+        self.assertEqual(decode_vin(res, False, LOGGER), self.VIN)
+        res[9] = '03'
+        with self.assertLogs('PyOBD', 'WARNING'):
+            self.assertEqual(decode_vin(res, False, LOGGER), '')
+
+    def test_dtc_can(self):
+        res = data_bytes(['7E8 06 43 02 01 71 03 00', '7E9 02 43 00'], True)
+        codes = parse_dtc_data(res, {}, 'Active', True, LOGGER)
+        self.assertEqual(codes, {'7E8': [['Active', 'P0171'], ['Active', 'P0300']], '7E9': []})
+        #Chassis, body and network codes; pending codes are added to the list
+        res = {'7E8': ['47', '03', '41', '23', 'A0', '01', 'C1', '00']}
+        codes = parse_dtc_data(res, codes, 'Passive', True, LOGGER, {'7E8': 3})
+        self.assertEqual(codes['7E8'][2:], [['Passive', 'C0123'], ['Passive', 'B2001'], ['Passive', 'U0100']])
+
+    def test_dtc_iso(self):
+        #Three codes per message, zero filled
+        res = {'10': ['43', '01', '71', '03', '00', '04', '20', '43', '01', '33', '00', '00', '00', '00']}
+        self.assertEqual(parse_dtc_data(res, {}, 'Active', False, LOGGER),
+                         {'10': [['Active', 'P0171'], ['Active', 'P0300'], ['Active', 'P0420'],
+                                 ['Active', 'P0133']]})
+        with self.assertLogs('PyOBD', 'WARNING'):
+            self.assertEqual(parse_dtc_data({'10': ['41', '00']}, {}, 'Active', False, LOGGER), {'10': []})
+
+class SummaryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.columns = make_columns()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_trip_footer_and_fallback(self):
+        write_trip(self.path('new.trip'), self.columns)
+        write_trip(self.path('old.trip'), self.columns)
+        remove_footer_stats(self.path('old.trip'))
+        self.assertIsNone(obd_trip.TripReader(self.path('old.trip')).columnStats)
+        #Small tasks, so the old file is summarized by several workers
+        reader = obd_trip.TripReader(self.path('old.trip'))
+        self.assertEqual(trip_tasks(reader, 5000), [[0], [1, 2]])
+
+        new, old = summarize_files([self.path('new.trip'), self.path('old.trip')], 2, 5000)
+        self.assertEqual((new['type'], old['type']), (TRIP, TRIP))
+        self.assertEqual(new['samples'], sum(len(times) for times, values in self.columns.values()))
+        self.assertEqual(new['vin'], {'7E8': 'WDB1234567F123456'})
+        for key in ('duration', 'samples', 'vin', 'dtc', 'errors'):
+            self.assertEqual(new[key], old[key])
+        self.assertEqual([(s['ecu'], s['pid']) for s in new['pids']],
+                         [('7E8', 0x0C), ('7E8', 0x0D), ('7E9', 0x05)])
+        for a, b in zip(new['pids'], old['pids']):
+            #The footer has exact moments only; the workers estimate
+            #percentiles too
+            self.assertNotIn('percentiles', a)
+            self.assertEqual(set(b['percentiles']), {50, 95, 99})
+            self.assertEqual((a['count'], a['min'], a['max']), (b['count'], b['min'], b['max']))
+            self.assertAlmostEqual(a['mean'], b['mean'], delta = 1e-9 * abs(a['mean']))
+            self.assertAlmostEqual(a['stddev'], b['stddev'], delta = 1e-6 * a['stddev'])
+
+    def test_transcript(self):
+        filename = self.path('session.ptr')
+        port = obd_io.OBDPort('fake', 0, Notify(), 1, 0, transcript = filename, transport = FakeElm())
+        session(port)
+        port.close()
+        summary = summarize_transcript(filename)
+        self.assertEqual(summary['type'], TRANSCRIPT)
+        self.assertEqual(summary['dtc'], {'7E8': [['Active', 'P0171'], ['Active', 'P0300']]})
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual([(s['ecu'], s['pid'], s['count'], s['mean']) for s in summary['pids']],
+                         [('7E8', 0x0C, 2, 1726.0), ('7E8', 0x0D, 1, 31.1)])
+        self.assertEqual(list(summarize_files([filename], 1)), [summary])
+
+    def test_errors(self):
+        with open(self.path('text.trip'), 'w') as f:
+            f.write('not a trip file')
+        write_trip(self.path('good.trip'), self.columns)
+        summaries = list(summarize_files([self.path('missing.trip'), self.path('text.trip'),
+                                          self.path('good.trip')], 1))
+        self.assertEqual([s['file'] for s in summaries],
+                         [self.path(name) for name in ('missing.trip', 'text.trip', 'good.trip')])
+        self.assertIn('FileNotFoundError', summaries[0]['error'])
+        self.assertIn('ValueError', summaries[1]['error'])
+        self.assertNotIn('error', summaries[2])
+
+if __name__ == "__main__":
+    unittest.main()
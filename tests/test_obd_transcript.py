@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_transcript.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import os
+import logging
+import tempfile
+import unittest
+
+from pyobd_beardedone55 import obd_io
+from pyobd_beardedone55.obd_transcript import (TranscriptWriter, TranscriptReader, ReplaySerial,
+                                               TX, RX)
+
+RESPONSES = {
+    b'ATZ': b'\r\rELM327 v1.5\r\r>',
+    b'ATE0': b'ATE0\rOK\r\r>',
+    b'ATDP': b'ISO 15765-4 (CAN 11/500)\r\r>',
+    b'ATH1': b'OK\r\r>',
+    b'0100': b'7E8 06 41 00 BE 3F B8 13\r7E9 06 41 00 98 18 00 01\r\r>',
+    b'010C': b'7E8 04 41 0C 1A F8\r\r>',
+    b'010C0D': b'7E8 06 41 0C 1A F8 0D 32\r\r>',
+    b'0101': b'7E8 06 41 01 82 07 E5 00\r\r>',
+    b'03': b'7E8 06 43 02 01 71 03 00\r\r>',
+}
+
+class FakeElm:
+    """Stands in for a serial port with an ELM327 that answers from
+    RESPONSES, and NO DATA to anything else."""
+    portstr = 'fake'
+
+    def __init__(self):
+        self.response = b''
+
+    def write(self, data):
+        cmd = data.strip().upper().replace(b' ', b'')
+        self.response = RESPONSES.get(cmd, b'NO DATA\r\r>')
+        return len(data)
+
+    def read(self, size = 1):
+        data = self.response[:size]
+        self.response = self.response[size:]
+        return data
+
+    def flush(self):
+        pass
+
+    def flushInput(self):
+        self.response = b''
+
+    def flushOutput(self):
+        pass
+
+    def close(self):
+        pass
+
+class Notify:
+    logger = logging.getLogger('PyOBD')
+
+def session(port):
+    """Runs a short session and returns the decoded results."""
+    return [port.ecu_addresses, port.protocol,
+            port.get_sensors([0x0C], '7E8'),
+            port.get_sensors([0x0C, 0x0D], '7E8'),
+            port.get_dtc()]
+
+class TranscriptTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix = '.ptr')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_record(self):
+        port = obd_io.OBDPort('fake', 0, Notify(), 1, 0, transcript = self.filename,
+                              transport = FakeElm())
+        self.assertEqual(port.State, 1)
+        session(port)
+        port.close()
+
+        exchanges = [(cmd.strip(), response) for t, cmd, rt, response in
+                     TranscriptReader(self.filename).exchanges()]
+        self.assertEqual(exchanges[0], (b'atz', RESPONSES[b'ATZ']))
+        #close() resets the interface without reading the reply
+        self.assertEqual(exchanges[-1], (b'atz', b''))
+        for cmd, response in exchanges[:-1]:
+            self.assertEqual(response, RESPONSES.get(cmd.upper(), b'NO DATA\r\r>'))
+        self.assertIn((b'010C0D', RESPONSES[b'010C0D']), exchanges)
+
+    def test_record_and_replay(self):
+        port = obd_io.OBDPort('fake', 0, Notify(), 1, 0, transcript = self.filename,
+                              transport = FakeElm())
+        self.assertEqual(port.State, 1)
+        recorded = session(port)
+        port.close()
+
+        replay = ReplaySerial(self.filename, strict = True)
+        port = obd_io.OBDPort(self.filename, 0, Notify(), 1, 0, transport = replay)
+        self.assertEqual(session(port), recorded)
+        port.close()
+        self.assertTrue(replay.finished())
+        self.assertEqual(replay.mismatches, [])
+
+    def test_replay_lookup(self):
+        writer = TranscriptWriter(self.filename)
+        for cmd in (b'010C', b'010D', b'010C'):
+            writer.record(TX, cmd + b'\r\n')
+            writer.record(RX, cmd + b' reply\r\r>')
+        writer.close()
+
+        replay = ReplaySerial(self.filename)
+        replay.write(b'010D\r\n')
+        self.assertEqual(replay.read(100), b'010D reply\r\r>')
+        replay.write(b'0105\r\n')
+        self.assertEqual(replay.read(100), ReplaySerial.NO_DATA)
+        self.assertEqual(len(replay.mismatches), 2)
+        self.assertFalse(replay.finished())
+
+        #Strict replay does not answer commands out of order
+        replay = ReplaySerial(self.filename, strict = True)
+        replay.write(b'010D\r\n')
+        self.assertEqual(replay.read(100), b'')
+        replay.write(b'010C\r\n')
+        self.assertEqual(replay.read(100), b'010C reply\r\r>')
+        self.assertEqual(replay.mismatches, [(0, b'010C', b'010D')])
+
+    def test_index_and_seek(self):
+        writer = TranscriptWriter(self.filename, index_interval = 4)
+        for i in range(50):
+            writer.record(TX if i % 2 == 0 else RX, b'%d' % i, writer.start + i)
+        writer.close()
+
+        reader = TranscriptReader(self.filename)
+        self.assertEqual(len(reader.blocks()), 13)
+        records = list(reader.records())
+        self.assertEqual([data for kind, t, data in records], [b'%d' % i for i in range(50)])
+        self.assertEqual([t for kind, t, data in reader.records(20.5)], [float(i) for i in range(21, 50)])
+        self.assertEqual(len(list(reader.exchanges())), 25)
+
+        #Without END, blocks are found by scanning
+        with open(self.filename, 'r+b') as f:
+            f.truncate(os.path.getsize(self.filename) - 5)
+        reader = TranscriptReader(self.filename)
+        self.assertEqual(len(reader.blocks()), 13)
+        self.assertEqual(len(list(reader.records())), 50)
+
+    def test_not_transcript(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'not a transcript file')
+        with self.assertRaises(ValueError):
+            TranscriptReader(self.filename)
+
+if __name__ == "__main__":
+    unittest.main()
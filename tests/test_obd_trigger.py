@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_trigger.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyobd_beardedone55.obd_trigger import (LevelTrigger, DtcTrigger, Triggers, parse_trigger,
+                                            DTC_INTERVAL, MONITOR_STATUS_PID)
+from pyobd_beardedone55.obd_history import History
+from pyobd_beardedone55.obd_trip import TripReader
+from pyobd_beardedone55.obd2_tests import ptest
+
+def status(dtcs, mil):
+    """Returns a decoded PID $01 value."""
+    return {ptest[0]: dtcs, ptest[1]: mil}
+
+class TriggerTest(unittest.TestCase):
+    def test_level(self):
+        trigger = parse_trigger('0C>4000')
+        self.assertEqual((trigger.ecu, trigger.pid, trigger.level, trigger.rising, trigger.rate),
+                         (None, 0x0C, 4000.0, True, False))
+        #Already beyond at the first sample: no crossing seen
+        self.assertIsNone(trigger.check('7E8', '4500', 0.0))
+        self.assertIsNone(trigger.check('7E8', '3000', 1.0))
+        self.assertEqual(trigger.check('7E8', '4100', 2.0), '0C>4000: 4100')
+        #Stays beyond, then crosses again
+        self.assertIsNone(trigger.check('7E8', '4200', 3.0))
+        self.assertIsNone(trigger.check('7E8', '3900', 4.0))
+        self.assertIsNotNone(trigger.check('7E8', '4001', 5.0))
+        #Other ECUs are tracked separately; non-numeric values are ignored
+        self.assertIsNone(trigger.check('7E9', '4500', 5.0))
+        self.assertIsNone(trigger.check('7E8', 'NODATA', 6.0))
+
+    def test_falling(self):
+        trigger = parse_trigger(' 7e8:$05 < 70 ')
+        self.assertEqual((trigger.ecu, trigger.pid, trigger.rising), ('7E8', 0x05, False))
+        self.assertIsNone(trigger.check('7E8', 80.0, 0.0))
+        self.assertEqual(trigger.check('7E8', 69.5, 1.0), '7E8:05<70: 69.5')
+
+    def test_rate(self):
+        trigger = parse_trigger('rate:0D<-5')
+        self.assertTrue(trigger.rate)
+        self.assertIsNone(trigger.check('7E8', 60.0, 0.0))
+        self.assertIsNone(trigger.check('7E8', 59.0, 1.0))     #-1/s
+        self.assertIsNone(trigger.check('7E8', 59.0, 1.0))     #same time, no rate
+        self.assertEqual(trigger.check('7E8', 50.0, 2.0), 'rate:0D<-5: -9')
+        self.assertIsNone(trigger.check('7E8', 40.0, 3.0))     #still braking
+
+    def test_dtc(self):
+        trigger = parse_trigger('dtc')
+        self.assertIsInstance(trigger, DtcTrigger)
+        self.assertEqual(parse_trigger('dtc:7e9').ecu, '7E9')
+        self.assertIsNone(trigger.check('7E8', 'NODATA', 0.0))
+        self.assertIsNone(trigger.check('7E8', status(0, 0), 0.0))
+        self.assertIsNone(trigger.check('7E8', status(0, 0), 1.0))
+        self.assertEqual(trigger.check('7E8', status(1, 1), 2.0),
+                         'dtc: 7E8 DTCs 0 -> 1, MIL off -> on')
+
+    def test_bad(self):
+        for text in ('0C=4000', '0C>fast', 'XY>1', '7E8:0C:1>2'):
+            with self.assertRaises(ValueError, msg = text):
+                parse_trigger(text)
+
+class TriggersTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.history = History()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def poll(self, triggers, ecu, results, t):
+        self.history.add_results(ecu, results, t)
+        return triggers.check(ecu, results, t)
+
+    def test_capture(self):
+        triggers = Triggers(self.history, [parse_trigger('0C>4000')], self.directory,
+                            pre = 2.0, post = 1.0, capture_pids = [0x0C, 0x0D])
+        #10 Hz of RPM and speed, RPM crossing 4000 at 5 s
+        t = 0.0
+        started = None
+        while started is None:
+            results = {0x0C: ('RPM', 3000.0 + t * 200, 'RPM'), 0x0D: ('Speed', t, 'km/h')}
+            started = self.poll(triggers, '7E8', results, t)
+            t = round(t + 0.1, 1)
+        self.assertEqual(started.time, 5.1)
+        self.assertTrue(triggers.capturing())
+        #The capture's PIDs replace the normal schedule until it ends
+        while True:
+            request = triggers.request(['7E8'], t)
+            if request is None:
+                break
+            self.assertEqual(request, ('7E8', (0x0C, 0x0D)))
+            self.poll(triggers, '7E8', {0x0C: ('RPM', 5000.0, 'RPM'), 0x0D: ('Speed', t, 'km/h')}, t)
+            t = round(t + 0.1, 1)
+        self.assertFalse(triggers.capturing())
+        self.assertEqual(triggers.captured, 1)
+        #Samples after the capture ended are not in it
+        self.poll(triggers, '7E8', {0x0C: ('RPM', 9999.0, 'RPM'), 0x0D: ('Speed', 0.0, 'km/h')}, t)
+        triggers.close(wait = True)
+
+        self.assertEqual(len(triggers.written), 1)
+        reader = TripReader(triggers.written[0])
+        self.assertEqual(reader.info['trigger'], '0C>4000: 4020')
+        self.assertEqual(reader.info['ecu'], '7E8')
+        self.assertEqual(reader.info['trigger_time'], 2.0)
+        self.assertEqual(reader.pids(), [('7E8', 0x0C), ('7E8', 0x0D)])
+        times, values = reader.read('7E8', 0x0D)
+        #Speed is the time of each sample: from 2 s before the trigger to
+        #the last poll before the capture ended 1 s after it
+        self.assertEqual(values[0], 3.1)
+        self.assertEqual(values[-1], 6.0)
+        self.assertEqual(len(values), 30)
+        for t, v in zip(times, values):
+            self.assertAlmostEqual(t, v - 3.1)
+        times, values = reader.read('7E8', 0x0C)
+        self.assertNotIn(9999.0, values)
+
+    def test_dtc_capture(self):
+        #No capture_pids: every PID of the ECU with history is captured
+        triggers = Triggers(self.history, [parse_trigger('dtc')], self.directory, pre = 1.0, post = 0.5)
+        self.assertEqual(triggers.request(['7E8'], 10.0), ('7E8', (MONITOR_STATUS_PID,)))
+        self.assertIsNone(triggers.request(['7E8'], 10.5))
+        self.poll(triggers, '7E8', {0x0C: ('RPM', 800.0, 'RPM')}, 10.0)
+        self.poll(triggers, '7E8', {MONITOR_STATUS_PID: ('Status', status(0, 0), '')}, 10.1)
+        started = self.poll(triggers, '7E8', {MONITOR_STATUS_PID: ('Status', status(2, 1), '')}, 10.2)
+        self.assertEqual(started.pids, (0x0C,))
+        self.assertEqual(triggers.request(['7E8'], 10.3), ('7E8', (0x0C,)))
+        filename = triggers.finish()
+        triggers.close(wait = True)
+        self.assertEqual(triggers.written, [filename])
+        self.assertEqual(TripReader(filename).read('7E8', 0x0C)[1].tolist(), [800.0])
+
+    def test_timeout(self):
+        triggers = Triggers(self.history, [parse_trigger('0C>4000')], self.directory)
+        self.assertIsNone(triggers.timeout(['7E8'], 0.0))
+        triggers = Triggers(self.history, [parse_trigger('dtc:7E9')], self.directory)
+        self.assertIsNone(triggers.timeout(['7E8'], 0.0))
+        self.assertEqual(triggers.timeout(['7E8', '7E9'], 100.0), 0.0)
+        triggers.request(['7E8', '7E9'], 100.0)
+        self.assertAlmostEqual(triggers.timeout(['7E8', '7E9'], 100.25), DTC_INTERVAL - 0.25)
+
+    def test_write_error(self):
+        triggers = Triggers(self.history, [parse_trigger('0C>4000')],
+                            os.path.join(self.directory, 'missing'), capture_pids = [0x0C])
+        self.poll(triggers, '7E8', {0x0C: ('RPM', 800.0, 'RPM')}, 0.0)
+        self.poll(triggers, '7E8', {0x0C: ('RPM', 4800.0, 'RPM')}, 0.1)
+        with self.assertLogs('PyOBD', 'ERROR'):
+            triggers.close(wait = True)
+        self.assertEqual((triggers.captured, triggers.written), (1, []))
+
+if __name__ == "__main__":
+    unittest.main()
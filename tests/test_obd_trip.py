@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_obd_trip.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import os
+import random
+import tempfile
+import unittest
+from array import array
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pyobd_beardedone55 import obd_trip
+from pyobd_beardedone55.obd_trip import TripWriter, TripReader, CODECS
+from pyobd_beardedone55.obd_stats import RunningStats, Stats
+
+def make_columns(seed = 1):
+    """Returns dictionary of (ecu, pid) -> (times, values) with columns
+    of different lengths and overlapping times."""
+    rand = random.Random(seed)
+    columns = {}
+    for ecu, pid, count in (('7E8', 0x0C, 10000), ('7E8', 0x0D, 3), ('7E9', 0x05, 4096)):
+        t = 0.0
+        times = array('d')
+        values = array('d')
+        for i in range(count):
+            t += rand.uniform(0.01, 0.2)
+            times.append(t)
+            values.append(rand.uniform(-50.0, 8000.0))
+        columns[(ecu, pid)] = (times, values)
+    return columns
+
+def write_trip(filename, columns, codec = 'zlib', chunk_size = 1000):
+    writer = TripWriter(filename, codec, chunk_size)
+    for (ecu, pid), (times, values) in columns.items():
+        for t, v in zip(times, values):
+            writer.add(ecu, pid, v, writer.start + t, 'Sensor %02X' % pid, 'unit')
+    writer.info = {'vin': {'7E8': 'WDB1234567F123456'}}
+    writer.close()
+    return writer
+
+class TripTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix = '.trip')
+        os.close(fd)
+        self.columns = make_columns()
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def assertColumn(self, actual, expected):
+        #Times pass through 't - start' and back, so allow rounding
+        self.assertEqual(len(actual[0]), len(expected[0]))
+        for a, b in zip(actual[0], expected[0]):
+            self.assertAlmostEqual(a, b, places = 9)
+        self.assertEqual(list(actual[1]), list(expected[1]))
+
+    def test_round_trip(self):
+        for codec in CODECS:
+            write_trip(self.filename, self.columns, codec)
+            reader = TripReader(self.filename)
+            self.assertEqual(sorted(reader.pids()), sorted(self.columns))
+            self.assertEqual(reader.pids('7E9'), [('7E9', 0x05)])
+            self.assertEqual(reader.columns[0][2:], ('Sensor 0C', 'unit'))
+            self.assertEqual(reader.info, {'vin': {'7E8': 'WDB1234567F123456'}})
+            for key, column in self.columns.items():
+                self.assertColumn(reader.read(*key), column)
+            self.assertEqual(reader.read('7E8', 0x05), (array('d'), array('d')))
+
+    def test_time_range(self):
+        write_trip(self.filename, self.columns)
+        reader = TripReader(self.filename)
+        times, values = self.columns[('7E8', 0x0C)]
+        start, end = times[2500] - 1e-6, times[7400] + 1e-6
+        self.assertLess(len(reader.select('7E8', 0x0C, start, end)), len(reader.select('7E8', 0x0C)))
+        self.assertColumn(reader.read('7E8', 0x0C, start, end), (times[2500:7401], values[2500:7401]))
+        self.assertColumn(reader.read('7E8', 0x0C, None, start), (times[:2500], values[:2500]))
+
+    def test_index_stats(self):
+        write_trip(self.filename, self.columns)
+        reader = TripReader(self.filename)
+        for key, (times, values) in self.columns.items():
+            count, low, high, mean = reader.stats(*key)
+            self.assertEqual((count, low, high), (len(values), min(values), max(values)))
+            self.assertAlmostEqual(mean, sum(values) / len(values))
+        self.assertEqual(reader.stats('7E8', 0x05), (0, None, None, None))
+
+    def test_footer_stats(self):
+        write_trip(self.filename, self.columns)
+        reader = TripReader(self.filename)
+        self.assertEqual(len(reader.columnStats), len(reader.columns))
+        for (ecu, pid, name, unit), stats in zip(reader.columns, reader.columnStats):
+            #The writer adds each chunk of values as it is written, and
+            #estimates no percentiles
+            values = self.columns[(ecu, pid)][1]
+            expected = RunningStats(())
+            for i in range(0, len(values), 1000):
+                expected.extend(values[i:i + 1000])
+            expected = expected.summary()
+            del expected['percentiles']
+            self.assertEqual(stats, expected)
+
+    def test_footer_percentiles(self):
+        live = Stats()
+        writer = TripWriter(self.filename)
+        writer.quantiles = live
+        for (ecu, pid), (times, values) in self.columns.items():
+            for t, v in zip(times, values):
+                writer.add(ecu, pid, v, writer.start + t)
+                live.add(ecu, pid, v)
+        writer.close()
+        reader = TripReader(self.filename)
+        for (ecu, pid, name, unit), stats in zip(reader.columns, reader.columnStats):
+            self.assertEqual(stats['percentiles'], live.get(ecu, pid).percentiles())
+
+    def test_add_column(self):
+        writer = TripWriter(self.filename, 'none')
+        for (ecu, pid), (times, values) in self.columns.items():
+            writer.add_column(ecu, pid, times, values)
+        writer.close()
+        reader = TripReader(self.filename)
+        for key, column in self.columns.items():
+            self.assertEqual(reader.read(*key), column)
+        #Columns longer than chunk_size are split
+        self.assertEqual([c.count for c in reader.select('7E8', 0x0C)], [4096, 4096, 1808])
+        self.assertEqual([c.count for c in reader.select('7E9', 0x05)], [4096])
+
+    def test_chunk_size(self):
+        for size in (0, obd_trip.MAX_CHUNK_SIZE + 1):
+            with self.assertRaises(ValueError):
+                TripWriter(self.filename, chunk_size = size)
+
+    def test_unpack_limit(self):
+        write_trip(self.filename, self.columns)
+        dest = self.filename + '.unpacked'
+        try:
+            with mock.patch.object(obd_trip, 'MAX_CHUNK_SIZE', 3000):
+                obd_trip.unpack_trip(self.filename, dest)
+            source = TripReader(self.filename)
+            reader = TripReader(dest)
+            self.assertEqual([c.count for c in reader.select('7E8', 0x0C)], [3000, 3000, 3000, 1000])
+            for key in self.columns:
+                self.assertEqual(reader.read(*key), source.read(*key))
+        finally:
+            os.remove(dest)
+
+    def test_not_closed(self):
+        writer = TripWriter(self.filename)
+        writer.add('7E8', 0x0C, 800.0)
+        writer.file.flush()
+        with self.assertRaises(ValueError):
+            TripReader(self.filename)
+        writer.close()
+        self.assertEqual(TripReader(self.filename).read('7E8', 0x0C)[1], array('d', [800.0]))
+
+@unittest.skipIf(numpy is None, 'requires NumPy')
+class MappedTripTest(unittest.TestCase):
+    def setUp(self):
+        self.filenames = []
+        for i in range(2):
+            fd, filename = tempfile.mkstemp(suffix = '.trip')
+            os.close(fd)
+            self.filenames.append(filename)
+        self.columns = make_columns()
+
+    def tearDown(self):
+        for filename in self.filenames:
+            os.remove(filename)
+
+    def test_same_as_reader(self):
+        from pyobd_beardedone55.obd_trip import MappedTripReader
+        for codec in ('none', 'zlib'):
+            write_trip(self.filenames[0], self.columns, codec)
+            reader = TripReader(self.filenames[0])
+            with MappedTripReader(self.filenames[0]) as mapped:
+                for key in self.columns:
+                    for start, end in ((None, None), (100.0, 400.0)):
+                        times, values = reader.read(*key, start, end)
+                        t, v = mapped.arrays(*key, start, end)
+                        self.assertEqual(t.tolist(), times.tolist())
+                        self.assertEqual(v.tolist(), values.tolist())
+                        del t, v
+                self.assertEqual(len(mapped.arrays('7E8', 0x05)[0]), 0)
+
+    def test_unpack(self):
+        from pyobd_beardedone55.obd_trip import MappedTripReader, unpack_trip
+        write_trip(self.filenames[0], self.columns)
+        unpack_trip(*self.filenames)
+        reader = TripReader(self.filenames[0])
+        with MappedTripReader(self.filenames[1]) as mapped:
+            self.assertEqual(mapped.info, reader.info)
+            for key in self.columns:
+                self.assertEqual(len(mapped.select(*key)), 1)
+                times, values = mapped.arrays(*key)
+                #A whole column of an unpacked file is a view of the mapping
+                self.assertFalse(values.flags.owndata)
+                self.assertEqual(values.tolist(), reader.read(*key)[1].tolist())
+                del times, values
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# vim: shiftwidth=4:tabstop=4:expandtab
+###########################################################################
+# test_pyobdGUI.py
+#
+# Copyright 2019 Brian LePage (github.com/beardedone55/)
+#
+# This file is part of pyOBD.
+#
+# pyOBD is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pyOBD is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD; if not, see https://www.gnu.org/licenses/.
+############################################################################
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+try:
+    from PyQt5.QtCore import QObject, pyqtSignal
+    from PyQt5.QtWidgets import QApplication
+except ImportError:
+    QApplication = None
+else:
+    from pyobd_beardedone55 import pyobdGUI
+
+from pyobd_beardedone55 import obd_trigger, obd_history, obd_stats, obd_histogram, obd_trip
+from pyobd_beardedone55.obd2_codes import DTCStore
+from pyobd_beardedone55.obd2_tests import ptest
+
+class FakePort:
+    """Connected port of one ECU that reports no DTCs in PID $01."""
+    ecu_addresses = ['7E8']
+
+    def __init__(self):
+        self.requests = []
+
+    def get_sensors(self, pids, ecu):
+        self.requests.append((ecu, tuple(pids)))
+        return {pid: ('Status', {ptest[0]: 0, ptest[1]: 0}, '') for pid in pids}
+
+    def get_tests(self, ecu):
+        return None
+
+    def get_vin(self, ecu):
+        self.requests.append((ecu, 'VIN'))
+        return 'WDB1234567F123456'
+
+    def get_dtc(self):
+        self.requests.append((None, 'DTC'))
+        return {'7E8': [['Active', 'P0171']]}
+
+if QApplication is not None:
+    class Window(QObject):
+        """What the sensor producer uses of the main window."""
+        StatusEvent = pyqtSignal(list)
+        TestEvent = pyqtSignal(dict)
+        SensorProducerReady = pyqtSignal()
+        FOCUSSHARE = 0.5
+        logger = logging.getLogger('PyOBD')
+
+        def __init__(self, triggers):
+            super().__init__()
+            self.port = FakePort()
+            self.triggers = triggers
+            self.sensorSnapshot = pyobdGUI.MyApp.SensorSnapshot()
+            self.sensorHistory = obd_history.History()
+            self.sensorStats = obd_stats.Stats()
+            self.operatingMaps = obd_histogram.OperatingMaps()
+
+        def initCommunication(self, stop = None):
+            return 'OK'
+
+        def makeTriggers(self):
+            return self.triggers
+
+@unittest.skipIf(QApplication is None, 'requires PyQt5')
+class SensorProducerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_dtc_trigger_without_sensors(self):
+        #A dtc trigger must poll PID $01 even when no sensor is on
+        history = obd_history.History()
+        triggers = obd_trigger.Triggers(history, [obd_trigger.parse_trigger('dtc')])
+        window = Window(triggers)
+        producer = pyobdGUI.MyApp.sensorProducer(window)
+        with mock.patch.object(obd_trigger, 'DTC_INTERVAL', 0.05):
+            producer.start()
+            time.sleep(0.5)
+            producer.stop()
+            self.assertTrue(producer.wait(5000))
+        status = [r for r in window.port.requests if r == ('7E8', (obd_trigger.MONITOR_STATUS_PID,))]
+        self.assertGreaterEqual(len(status), 4)
+        #Besides the VIN read by the connection's background jobs
+        self.assertEqual(len(status) + 1, len(window.port.requests))
+
+    def test_recorder_vehicle_info(self):
+        #VIN and DTCs for the trip footer are read as a background job
+        directory = tempfile.mkdtemp()
+        try:
+            window = Window(None)
+            producer = pyobdGUI.MyApp.sensorProducer(window)
+            producer.start()
+            time.sleep(0.1)
+            first = len(window.port.requests)
+            filename = os.path.join(directory, 'trip.trip')
+            producer.setRecorder(obd_trip.TripWriter(filename))
+            time.sleep(0.1)
+            producer.stop()
+            self.assertTrue(producer.wait(5000))
+            self.assertEqual(window.port.requests[first:], [('7E8', 'VIN'), (None, 'DTC')])
+            info = obd_trip.TripReader(filename).info
+            self.assertEqual(info, {'vin': {'7E8': 'WDB1234567F123456'},
+                                    'dtc': {'7E8': [['Active', 'P0171']]}})
+        finally:
+            shutil.rmtree(directory)
+
+@unittest.skipIf(QApplication is None, 'requires PyQt5')
+class CodeTreeModelTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        store = DTCStore({
+            'P0300': 'Random/Multiple Cylinder Misfire Detected',
+            'P0301': 'Cylinder 1 Misfire Detected',
+            'P0420': 'Catalyst System Efficiency Below Threshold',
+        })
+        self.model = pyobdGUI.MyApp.CodeTreeModel(store)
+        self.inserted = []
+        self.model.rowsInserted.connect(
+            lambda parent, first, last: self.inserted.append((self.model.data(parent), first, last)))
+
+    def expand(self, parent):
+        """Fetches the children of parent, as a view does when it is
+        expanded, and returns their text."""
+        model = self.model
+        self.assertTrue(model.hasChildren(parent))
+        self.assertEqual(model.rowCount(parent), 0)
+        self.assertTrue(model.canFetchMore(parent))
+        model.fetchMore(parent)
+        self.assertFalse(model.canFetchMore(parent))
+        return [model.data(model.index(row, 0, parent)) for row in range(model.rowCount(parent))]
+
+    def test_fetch(self):
+        model = self.model
+        self.assertEqual(model.rowCount(), 1)
+        top = model.index(0, 0)
+        self.assertEqual(model.data(top), 'Code Reference')
+        self.assertFalse(model.parent(top).isValid())
+        self.assertEqual(self.expand(top), ['P03XX', 'P04XX'])
+        group = model.index(0, 0, top)
+        self.assertEqual(self.expand(group), ['P0300', 'P0301'])
+        code = model.index(1, 0, group)
+        self.assertEqual(model.parent(code), group)
+        self.assertEqual(self.expand(code), ['Cylinder 1 Misfire Detected'])
+        text = model.index(0, 0, code)
+        self.assertFalse(model.hasChildren(text))
+        #Fetching again adds nothing
+        model.fetchMore(group)
+        self.assertEqual(self.inserted, [('Code Reference', 0, 1), ('P03XX', 0, 1), ('P0301', 0, 0)])
+        self.assertEqual(model.matchCount(), 3)
+
+    def test_filter(self):
+        model = self.model
+        model.setFilter('misfire')
+        self.assertEqual(model.matchCount(), 2)
+        top = model.index(0, 0)
+        self.assertEqual(self.expand(top), ['P03XX'])
+        self.assertEqual(self.expand(model.index(0, 0, top)), ['P0300', 'P0301'])
+        model.setFilter('evaporative')
+        self.assertEqual(model.matchCount(), 0)
+        top = model.index(0, 0)
+        model.fetchMore(top)
+        self.assertEqual(model.rowCount(top), 0)
+        self.assertFalse(model.hasChildren(top))
+
+if __name__ == "__main__":
+    unittest.main()